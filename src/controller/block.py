@@ -1,3 +1,4 @@
+from controller.live import LiveUpdate
 from model.block import BlockModel
 from view.block import BlockView
 
@@ -9,6 +10,7 @@ class BlockController:
     Atributos:
         model (BlockModel): modelo de gestión de modelos de bloques
         view (BlockView): vista del menú de bloques
+        live (LiveUpdate): actualización agrupada de la visualización en vivo
     '''
 
     def __init__(self, model: BlockModel, view: BlockView):
@@ -16,6 +18,7 @@ class BlockController:
         # Inicializar modelo y vista:
         self.model = model
         self.view = view
+        self.live = LiveUpdate(self.plot_live)
 
         # Enlazar eventos a los elementos de la vista:
         self.bind()
@@ -29,15 +32,23 @@ class BlockController:
 
         # Enlazar funciones a los botones:
         self.view.button_update.on_click(self.set_names)
+        self.view.button_header.on_click(self.read_header)
         self.view.button_save.on_click(self.save_name)
         self.view.button_plot.on_click(self.plot_model)
 
         # Enlazar funciones a los menús desplegables:
+        self.view.drop_name.observe_(self.clear_columns, names='value')
         self.view.drop_variable.observe_(self.set_vrange, names='value')
         self.view.drop_xcoord.observe_(self.set_xrange, names='value')
         self.view.drop_ycoord.observe_(self.set_yrange, names='value')
         self.view.drop_zcoord.observe_(self.set_zrange, names='value')
 
+        # Visualización en vivo al mover los deslizadores:
+        self.view.check_live.observe(self.live_changed, names='value')
+        for slider in [self.view.slider_variable, self.view.slider_xcoord,
+                       self.view.slider_ycoord, self.view.slider_zcoord]:
+            slider.observe_(self.live_changed, names='value')
+
 
     def set_names(self, *event):
         '''Actualiza la lista de archivos en el menú desplegable'''
@@ -45,6 +56,42 @@ class BlockController:
         self.view.update_names(list_files)
 
 
+    def read_header(self, event):
+        '''Lee el encabezado del archivo para elegir las columnas a cargar'''
+        self.view.clear_outputs()
+        try:
+            cols = self.model.read_columns(
+                name=self.view.drop_name.value,
+                sep=self.view.drop_sep.value,
+                header=self.view.radio_header.value
+            )
+        except:
+            self.view.update_columns([])
+            self.view.show_header_error()
+            return
+
+        self.view.update_columns(cols)
+
+
+    def clear_columns(self, change):
+        '''Vacía la lista de columnas al cambiar de archivo'''
+        self.view.update_columns([])
+
+
+    def selected_columns(self):
+        '''
+        Devuelve las columnas elegidas para la importación
+
+        Retorna:
+            list: columnas a leer (None si se leen todas o no se eligieron)
+        '''
+        options = [col for _, col in self.view.select_columns.options]
+        selected = self.view.select_columns.value
+        if not selected or len(selected) == len(options):
+            return None
+        return [col for col in options if col in selected]
+
+
     def load_file(self):
         '''Carga un archivo seleccionado como modelo de bloques. Este método
         se llama desde el controlador principal de la aplicación para conectar
@@ -59,9 +106,18 @@ class BlockController:
             self.model.read_file(
                 name=self.view.drop_name.value,
                 sep=self.view.drop_sep.value,
-                header=self.view.radio_header.value
+                header=self.view.radio_header.value,
+                single=self.view.check_single.value,
+                usecols=self.selected_columns(),
+                query=self.view.text_query.value.strip() or None,
+                progress=self.view.show_progress,
+                out_of_core=self.view.check_tiled.value
+            )
+            self.view.show_progress(1.0)
+            self.view.show_import_info(
+                self.model.memory, self.model.cached,
+                self.model.source is not None
             )
-            self.view.show_import_info()
         except:
             self.view.update_variables([])
             self.view.show_import_error()
@@ -91,9 +147,12 @@ class BlockController:
         if not variable:
             return
 
-        # Recuperar mínimo y máximo de la variable:
-        min_value = self.model.data[variable].min()
-        max_value = self.model.data[variable].max()
+        # Recuperar mínimo y máximo de la variable (el modelo fuera de
+        # memoria no tiene datos hasta construir la grilla):
+        bounds = self.model.value_range(variable)
+        if bounds is None:
+            return
+        min_value, max_value = bounds
 
         # Establecer el rango del deslizador:
         try:
@@ -144,6 +203,28 @@ class BlockController:
             'z': self.view.drop_zcoord.value
         })
 
+        # Memoria máxima de cada tile del modelo fuera de memoria:
+        try:
+            self.model.set_budget(self.view.text_budget.value)
+        except:
+            pass
+
+        # Construir la grilla (i, j, k) compartida por todos los menús:
+        try:
+            self.model.build_grid(progress=self.view.show_progress)
+        except ValueError:
+            self.model.names.clear()
+            self.view.show_grid_error()
+            return
+
+        # Con el modelo fuera de memoria los datos recién están disponibles:
+        if self.model.source is not None:
+            self.view.show_stats(self.model.describe())
+            self.set_vrange({'new': self.view.drop_variable.value})
+            self.set_xrange({'new': xname})
+            self.set_yrange({'new': yname})
+            self.set_zrange({'new': zname})
+
         self.view.show_save_info()
 
 
@@ -158,6 +239,11 @@ class BlockController:
         vname = self.view.drop_variable.value
         if not vname:
             return
+
+        # Graficar la variable como campo denso de la grilla:
+        if self.view.drop_render.value != 'points':
+            self.plot_field(vname)
+            return
         
         # Recuperar datos a graficar:
         plot_data = self.model.get_plot_data(
@@ -168,6 +254,99 @@ class BlockController:
             zrange=self.view.slider_zcoord.value
         )
 
+        # Reducir los bloques al máximo de puntos de la visualización:
+        try:
+            points = self.view.text_points.value
+        except:
+            points = 200_000
+        plot_data = self.model.reduce_plot_data(
+            plot_data, vname, points, self.view.drop_aggregate.value
+        )
+        detail = self.model.detail
+        self.view.detail_status.show(detail.shown, detail.total, detail.factor)
+
         # Generar la visualización:
         self.view.plot_blocks(vname, plot_data, None)
-        
\ No newline at end of file
+        
+
+
+    def live_changed(self, change):
+        '''Programa la actualización en vivo si está activada'''
+        if self.view.check_live.value:
+            self.live()
+
+
+    def plot_live(self):
+        '''
+        Actualiza la visualización con los deslizadores actuales. Solo se
+        calculan los bloques que entran o salen de la selección anterior y la
+        figura no se modifica si la selección no cambió. Se ejecuta en el
+        hilo del temporizador de LiveUpdate, por lo que la figura se
+        actualiza con FigureOutput.show, que no depende de la celda activa.
+        '''
+        vname = self.view.drop_variable.value
+        if not self.model.names or not vname:
+            return
+
+        # El campo denso no depende del número de bloques seleccionados:
+        if self.view.drop_render.value != 'points':
+            self.plot_field(vname)
+            return
+
+        try:
+            plot_data, entering, leaving = self.model.live_plot_data(
+                vname=vname,
+                vrange=self.view.slider_variable.value,
+                xrange=self.view.slider_xcoord.value,
+                yrange=self.view.slider_ycoord.value,
+                zrange=self.view.slider_zcoord.value
+            )
+        except (TypeError, ValueError):
+            # Variable no numérica (por ejemplo, categórica):
+            self.view.show_live_error()
+            return
+
+        total = len(plot_data[vname])
+        self.view.show_live(entering, leaving, total)
+        if not entering and not leaving and self.view.output_plot.shown:
+            return
+
+        # Reducir los bloques al máximo de puntos de la visualización:
+        try:
+            points = self.view.text_points.value
+        except:
+            points = 200_000
+        plot_data = self.model.reduce_plot_data(
+            plot_data, vname, points, self.view.drop_aggregate.value
+        )
+        detail = self.model.detail
+        self.view.detail_status.show(detail.shown, detail.total, detail.factor)
+
+        self.view.plot_blocks(vname, plot_data, None)
+
+
+    def plot_field(self, vname):
+        '''
+        Grafica la variable como volumen o isosuperficies sobre la grilla
+
+        Argumentos:
+            vname (str): nombre de la variable a graficar
+        '''
+        try:
+            points = self.view.text_points.value
+        except:
+            points = 200_000
+
+        data = self.model.get_volume_data(
+            vname=vname,
+            vrange=self.view.slider_variable.value,
+            xrange=self.view.slider_xcoord.value,
+            yrange=self.view.slider_ycoord.value,
+            zrange=self.view.slider_zcoord.value,
+            points=points,
+            agg=self.view.drop_aggregate.value
+        )
+        detail = self.model.detail
+        self.view.detail_status.show(detail.shown, detail.total, detail.factor)
+
+        self.view.plot_volume(vname, data, self.view.drop_render.value)
@@ -1,3 +1,5 @@
+import threading
+
 from model.envelope import EnvelopeModel
 from view.envelope import EnvelopeView
 
@@ -10,102 +12,167 @@ class EnvelopeController:
     Atributos:
         model (EnvelopeModel): modelo del menú de envolvente económica
         view (EnvelopeView): vista del menú de envolvente económica
+        task (threading.Thread): cálculo de la envolvente en segundo plano
+        cancel (threading.Event): solicitud de cancelación del cálculo
+        partial (tuple): última envolvente calculada (parcial si se canceló)
     '''
 
     def __init__(self, model: EnvelopeModel, view: EnvelopeView):
         self.model = model
         self.view = view
+        self.task = None
+        self.cancel = threading.Event()
+        self.partial = None
+
+        # Enlazar eventos de la vista:
+        self.bind()
+
+
+    def bind(self):
+        '''Enlaza los eventos de la vista con las funciones del controlador'''
+        self.view.button_cancel.on_click(self.cancel_envelope)
 
 
     def calculate_envelope(self, level, profit_name):
-        '''Genera la envolvente económica'''
+        '''
+        Genera la envolvente económica en segundo plano, para que el cuaderno
+        siga respondiendo (y se pueda cancelar) mientras se calcula
+        '''
 
         # Recuperar parámetros geométricos:
         min_height = self.view.text_min_height.value
         max_height = self.view.text_max_height.value
         slope = self.view.text_slope.value
-
-        # Filtrar los datos entre la cota óptima y la altura:
-        data = self.model.data[
-            (self.model.data[self.model.names['z']] >= level) &
-            (self.model.data[self.model.names['z']] <= level + max_height)
-        ]
-        data = data.sort_values('z', ascending = True)
-
-        # Inicializar vectores de coordenadas:
-        xcoord = np.array(data[self.model.names['x']])
-        ycoord = np.array(data[self.model.names['y']])
-        zcoord = np.array(data[self.model.names['z']])
-        profit = np.array(data[profit_name])
-
-        # Vectores que almacenan la envolvente:
-        x_cave = np.array([])
-        y_cave = np.array([])
-        z_cave = np.array([])
-        v_cave = np.array([])
-
-        # Recorrer cada cota del modelo de bloques:
-        for z in np.unique(zcoord):
-
-            # Recorrer cada punto del plano Z = Z0:
-            cond1 = (zcoord == z) & (profit > 0)
-
-            for x, y in zip(xcoord[cond1], ycoord[cond1]):
-
-                # Comprobar que el punto sea parte del footprint:
-                cond = (self.model.fp_x == x) & (self.model.fp_y == y)
-                if not any(cond):
-                    continue
-
-                # Calcular el ángulo de los bloques:
-                dx2 = np.power(xcoord - x, 2)
-                dy2 = np.power(ycoord - y, 2)
-                ang = np.arctan2(np.abs(zcoord - z), np.sqrt(dx2 + dy2))
-                ang = np.degrees(ang)
-
-                # Definir el cono con aquellos bloques que cumplan con la condición de ángulo:
-                cond2 = np.logical_and(ang >= slope, zcoord <= z)
-
-                # Calcular el valor del cono:
-                cone_value = np.sum(profit[cond2])
-
-                # Continuar la próxima iteración del algoritmo si el valor es negativo:
-                if cone_value <= 0:
-                    continue
-
-                # Guardar las bloques del pit:
-                x_cave = np.append(x_cave, xcoord[cond2])
-                y_cave = np.append(y_cave, ycoord[cond2])
-                z_cave = np.append(z_cave, zcoord[cond2])
-                v_cave = np.append(v_cave, profit[cond2])
-
-                # Quitar los bloques del modelo:
-                xcoord = np.delete(xcoord, cond2)
-                ycoord = np.delete(ycoord, cond2)
-                zcoord = np.delete(zcoord, cond2)
-                profit = np.delete(profit, cond2)
-
-        # Eliminar las columnas por debajo del mínimo:
-        for x, y in zip(x_cave, y_cave):
-
-            # Condición:
-            cond3 = (x_cave == x) & (y_cave == y)
-
-            # Filtrar vector Z:
-            z = z_cave[cond3]
-            try:
-                zmax = z.max()
-            except:
-                continue
-
-            # Calcular altura de columna:
-            height = zmax - level
-
-            if height < min_height:
-                x_cave = np.delete(x_cave, cond3)
-                y_cave = np.delete(y_cave, cond3)
-                z_cave = np.delete(z_cave, cond3)
-                v_cave = np.delete(v_cave, cond3)
-
-        self.view.show_info(v_cave.sum())
-        self.view.plot_envelope(x_cave, y_cave, z_cave, v_cave, data)
\ No newline at end of file
+        method = self.view.drop_method.value
+        detail = (self.view.text_points.value, self.view.drop_aggregate.value,
+                  self.view.drop_render.value)
+
+        # Iniciar el cálculo:
+        self.cancel.clear()
+        self.view.set_running(True)
+        self.task = threading.Thread(
+            target=self.run_envelope,
+            args=(level, profit_name, min_height, max_height, slope, method,
+                  detail),
+            daemon=True
+        )
+        self.task.start()
+
+
+    def cancel_envelope(self, event):
+        '''Solicita detener el cálculo de la envolvente'''
+        self.cancel.set()
+
+
+    def run_envelope(self, level, profit_name, min_height, max_height, slope,
+                     method, detail=(200_000, 'mean', 'points')):
+        '''Calcula la envolvente informando el avance de cada cota'''
+        try:
+            # Generar la envolvente con el método del cono flotante, cota a
+            # cota, hasta terminar o hasta que se cancele:
+            height = level
+            cancelled = False
+            if method != 'closure':
+                steps = self.model.floating_cone_steps(
+                    level=level,
+                    profit_name=profit_name,
+                    max_height=max_height,
+                    slope=slope
+                )
+                cone = (np.array([]),) * 4
+                for height, step, total, cone in steps:
+                    self.view.show_progress(
+                        step / total, height, cone[3].sum(), len(cone[3])
+                    )
+                    if self.cancel.is_set():
+                        cancelled = step < total
+                        break
+                x_cave, y_cave, z_cave, v_cave = cone
+
+            # Generar la envolvente óptima por clausura máxima:
+            if method != 'cone' and not cancelled:
+                x_cave, y_cave, z_cave, v_cave = self.model.max_closure(
+                    level=level,
+                    profit_name=profit_name,
+                    max_height=max_height,
+                    slope=slope
+                )
+                self.view.show_progress(1, height, v_cave.sum(), len(v_cave))
+
+            # Eliminar las columnas por debajo del mínimo:
+            envelope = self.model.filter_min_height(
+                level, min_height, x_cave, y_cave, z_cave, v_cave
+            )
+            self.partial = envelope
+
+            # Mostrar el valor de la envolvente (y la comparación de métodos):
+            if cancelled:
+                self.view.show_cancelled(height, envelope[3].sum())
+            elif method == 'compare':
+                cone = self.model.filter_min_height(level, min_height, *cone)
+                self.view.show_comparison(cone[3].sum(), envelope[3].sum())
+            else:
+                self.view.show_info(envelope[3].sum())
+
+            # Superficie de altura de extracción (triangulada y reducida):
+            points, agg, render = detail
+            surface = self.model.draw_surface(*envelope[:3], points)
+
+            # Graficar la envolvente como volumen sobre la grilla o como
+            # puntos reducidos al máximo permitido:
+            if render == 'volume':
+                field = self.model.envelope_volume(*envelope[:4], points, agg)
+                shown = None
+            else:
+                shown = self.model.reduce_envelope(*envelope, points, agg)
+            self.view.detail_status.show(
+                self.model.detail.shown, self.model.detail.total,
+                self.model.detail.factor
+            )
+
+            if shown is None:
+                self.view.plot_envelope_volume(field, surface)
+            else:
+                self.view.plot_envelope(*shown, surface)
+
+        # Informar el error en la vista (el hilo no tiene otra salida):
+        except Exception as error:
+            self.view.show_calculation_error(error)
+
+        finally:
+            self.view.set_running(False)
+
+
+    def calculate_levels(self, levels, profit_name, discount, velocity,
+                         inv_cost):
+        '''Evalúa la envolvente económica en varias cotas de footprint'''
+
+        # Recuperar parámetros geométricos (la densidad solo se usa si el
+        # modelo no tiene columna de tonelaje):
+        tonnage_name = self.view.drop_tonnage.value
+        try:
+            min_height = self.view.text_min_height.value
+            max_height = self.view.text_max_height.value
+            slope = self.view.text_slope.value
+            density = None
+            if tonnage_name is None:
+                density = self.view.text_density.value
+        except:
+            self.view.show_error()
+            return
+
+        # Calcular la envolvente de cada cota en paralelo:
+        table = self.model.evaluate_levels(
+            levels=levels,
+            profit_name=profit_name,
+            discount=discount,
+            rate=velocity,
+            inv_cost=inv_cost,
+            min_height=min_height,
+            max_height=max_height,
+            slope=slope,
+            density=density,
+            tonnage_name=tonnage_name
+        )
+
+        self.view.plot_levels(table)
@@ -35,7 +35,7 @@ class FootprintController:
         # Calcular valores económicos para cada cota:
         zname = self.model.names['z']
         height = self.view.text_height.value
-        x, y, v = self.model.get_footprint(
+        x, y, v, outline = self.model.get_footprint(
             height=height,
             discount=discount,
             rate=velocity,
@@ -43,4 +43,4 @@ class FootprintController:
         )
 
         # Graficar valores por cota:
-        self.view.plot_footprint(x, y, v, height)
\ No newline at end of file
+        self.view.plot_footprint(x, y, v, outline, height)
\ No newline at end of file
@@ -15,6 +15,11 @@ class HeightController:
         self.model = model
         self.view = view
 
+        # Mostrar los motores de cálculo disponibles:
+        backends, active = self.model.backends()
+        self.view.update_backends(backends)
+        self.view.show_backend(active)
+
         # Enlazar eventos de la vista:
         self.bind()
 
@@ -22,6 +27,14 @@ class HeightController:
     def bind(self):
         '''Enlaza los eventos de la vista con las funciones del controlador'''
         self.view.button_calculate.on_click(self.calculate_height)
+        self.view.button_sensitivity.on_click(self.calculate_sensitivity)
+        self.view.drop_backend.observe_(self.select_backend, names='value')
+
+
+    def select_backend(self, change):
+        '''Selecciona el motor de cálculo de los núcleos'''
+        backend = self.model.set_backend(change['new'])
+        self.view.show_backend(backend)
 
 
     def calculate_height(self, event):
@@ -41,23 +54,67 @@ class HeightController:
         inv_cost = dp_area * dp_cost
         
         # Calcular valores económicos para cada cota:
-        zname = self.model.names['z']
-        heights = self.model.data[zname].unique()
-        values = self.model.value_by_height(
-            heights=heights,
-            discount=discount,
-            rate=velocity,
-            inv_cost=inv_cost
-        )
+        heights = self.model.levels()
+
+        # Buscar la cota óptima evaluando solo una parte de las cotas:
+        if self.view.drop_search.value == 'multiresolution':
+            opt_height, opt_value, heights, values, bound = \
+                self.model.search_optimum(
+                    heights=heights,
+                    discount=discount,
+                    rate=velocity,
+                    inv_cost=inv_cost
+                )
+            self.view.show_info(opt_height, opt_value, bound)
 
-        # Hallar valores óptimos:
-        opt_height, opt_value = self.model.find_optimum(heights, values)
+        else:
+            values = self.model.value_by_height(
+                heights=heights,
+                discount=discount,
+                rate=velocity,
+                inv_cost=inv_cost,
+                mode=self.view.drop_mode.value
+            )
 
-        # Entregar resultados óptimos:
-        self.view.show_info(opt_height, opt_value)
+            # Hallar valores óptimos:
+            opt_height, opt_value = self.model.find_optimum(heights, values)
+
+            # Entregar resultados óptimos:
+            self.view.show_info(opt_height, opt_value)
 
         # Graficar valores por cota:
-        with self.view.output_plot:
-            self.view.plot_height_vs_value(
-                heights, values, opt_height, opt_value
-            )
\ No newline at end of file
+        self.view.plot_height_vs_value(heights, values, opt_height, opt_value)
+
+
+    def calculate_sensitivity(self, event):
+        '''Calcula la cota óptima para cada caso de sensibilidad'''
+
+        # Recuperar parámetros de cálculo:
+        try:
+            discounts = [d / 100 for d in self.view.text_discounts.value]
+            velocities = self.view.text_velocities.value
+            dp_area = self.view.text_dp_area.value
+            dp_costs = self.view.text_dp_costs.value
+        except:
+            self.view.show_get_error()
+            return
+
+        if not (discounts and velocities and dp_costs):
+            self.view.show_get_error()
+            return
+
+        # Calcular costos de inversión del PE:
+        inv_costs = [dp_area * dp_cost for dp_cost in dp_costs]
+
+        # Evaluar todos los casos en conjunto:
+        heights = self.model.levels()
+        cube = self.model.sensitivity(
+            heights=heights,
+            discounts=discounts,
+            rates=velocities,
+            inv_costs=inv_costs
+        )
+
+        # Graficar la superficie de cotas óptimas:
+        surface = self.model.optimum_surface(cube)
+        self.view.plot_optimum_surface(surface)
@@ -0,0 +1,71 @@
+import threading
+import time
+
+
+class LiveUpdate:
+    '''
+    Agrupa cambios rápidos de la interfaz (por ejemplo, al arrastrar un
+    deslizador) en pocas ejecuciones de una función. Cada cambio reinicia la
+    espera (debounce), pero mientras los cambios continúan la función se
+    ejecuta al menos una vez por intervalo (throttle). Las ejecuciones nunca
+    se superponen: los cambios que llegan durante una ejecución se agrupan en
+    la siguiente.
+
+    Argumentos:
+        callback (function): función a ejecutar, sin argumentos
+        wait (float): segundos sin cambios antes de ejecutar la función
+        interval (float): máximo de segundos entre ejecuciones mientras los
+            cambios continúan
+
+    Atributos:
+        timer (threading.Timer): ejecución pendiente (None si no hay)
+        first (float): instante del primer cambio pendiente
+        lock (threading.Lock): bloqueo que protege timer y first, ya que se
+            modifican desde la interfaz y desde el hilo del temporizador
+        busy (threading.Lock): bloqueo que impide ejecuciones superpuestas
+    '''
+
+    def __init__(self, callback, wait=0.15, interval=0.5):
+        self.callback = callback
+        self.wait = wait
+        self.interval = interval
+        self.timer = None
+        self.first = None
+        self.lock = threading.Lock()
+        self.busy = threading.Lock()
+
+
+    def __call__(self, *args):
+        '''Registra un cambio y programa la ejecución de la función'''
+        with self.lock:
+            now = time.monotonic()
+            if self.first is None:
+                self.first = now
+
+            # Esperar el debounce sin exceder el intervalo máximo:
+            delay = min(self.wait, max(0.0, self.first + self.interval - now))
+
+            if self.timer is not None:
+                self.timer.cancel()
+            self.timer = threading.Timer(delay, self.run)
+            self.timer.daemon = True
+            self.timer.start()
+
+
+    def run(self):
+        '''Ejecuta la función con los cambios acumulados'''
+        with self.lock:
+            self.timer = None
+            self.first = None
+
+        with self.busy:
+            self.callback()
+
+
+    def flush(self):
+        '''Ejecuta de inmediato la ejecución pendiente (si hay)'''
+        with self.lock:
+            timer, self.timer = self.timer, None
+        if timer is not None:
+            timer.cancel()
+            self.run()
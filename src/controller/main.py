@@ -43,12 +43,14 @@ class MainController:
         self.view.block.button_import.on_click(self.load_file)
         self.view.footprint.button_create.on_click(self.generate_footprint)
         self.view.envelope.button_calculate.on_click(self.generate_envelope)
+        self.view.envelope.button_levels.on_click(self.generate_envelope_levels)
 
 
     def load_file(self, event):
         '''Carga un archivo seleccionado como modelo de bloques'''
         cols = self.block.load_file()
         self.view.height.update_profit(cols)
+        self.view.envelope.update_tonnage(cols or [])
 
 
     def generate_footprint(self, event):
@@ -78,3 +80,36 @@ class MainController:
         profit_name = self.view.height.drop_profit.value
 
         self.envelope.calculate_envelope(level, profit_name)
+
+
+    def generate_envelope_levels(self, event):
+        '''Evalúa la envolvente en las cotas de mayor valor económico'''
+
+        # Recuperar parámetros de cálculo:
+        try:
+            discount = self.view.height.text_discount.value / 100
+            velocity = self.view.height.text_velocity.value
+            dp_area = self.view.height.text_dp_area.value
+            dp_cost = self.view.height.text_dp_cost.value
+            count = self.view.envelope.text_level_count.value
+        except:
+            self.view.envelope.show_error()
+            return
+
+        # Buscar las mejores cotas de extracción:
+        inv_cost = dp_area * dp_cost
+        heights = self.model.height.levels()
+        levels = self.model.height.best_levels(
+            heights=heights,
+            discount=discount,
+            rate=velocity,
+            inv_cost=inv_cost,
+            count=count,
+            mode=self.view.height.drop_mode.value
+        )
+
+        # Calcular la envolvente de cada cota:
+        profit_name = self.view.height.drop_profit.value
+        self.envelope.calculate_levels(
+            levels, profit_name, discount, velocity, inv_cost
+        )
@@ -0,0 +1,178 @@
+import multiprocessing
+import os
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+import pandas as pd
+
+from model import kernels
+from model.discount import DiscountTable
+from model.parallel import SharedArrays
+from model.sweep import LevelSweep
+
+
+def envelope_level(specs, geometry, backend, level, discount, rate, inv_cost,
+                   min_height, max_height, stencil):
+    '''
+    Tarea de un proceso de trabajo: calcula el footprint de una cota y la
+    envolvente del cono flotante sobre él, leyendo el modelo publicado en
+    memoria compartida
+
+    Argumentos:
+        specs (dict): especificación de los arreglos compartidos
+        geometry (tuple): dimensión de la grilla y origen, altura de bloque y
+            niveles de la tabla de descuento
+        backend (str): motor de cálculo de los núcleos
+        level (float): cota del footprint
+        discount (float): tasa de descuento
+        rate (float): tasa de extracción anual en m/año
+        inv_cost (float): costo de inversión del PE
+        min_height (float): altura mínima de columna
+        max_height (float): altura máxima de columna
+        stencil (tuple): plantilla del cono
+
+    Retorna:
+        tuple: cota, valor de la envolvente, número de bloques, tonelaje de
+            los bloques (0 sin columna de tonelaje) y número de columnas
+    '''
+    kernels.set_backend(backend)
+    arrays = SharedArrays.attach(specs)
+    shape, table = geometry
+
+    # 1. Footprint: columnas cuyo máximo acumulado paga la inversión:
+    sweep = LevelSweep(
+        arrays['column'], arrays['sweep_z'], arrays['sweep_profit'],
+        offset=arrays['offset'], table=DiscountTable(*table), ordered=True
+    )
+    _, column, value = sweep.column_values([level], discount, rate)
+    footprint = np.zeros(shape[0] * shape[1], dtype=bool)
+    footprint[column[value > inv_cost]] = True
+
+    # 2. Bloques entre la cota y la altura máxima, ordenados por cota:
+    z = arrays['z']
+    rows = np.flatnonzero((z >= level) & (z <= level + max_height))
+    rows = rows[np.argsort(z[rows], kind='quicksort')]
+    zcoord = z[rows]
+    profit = arrays['profit'][rows]
+    i, j, k = arrays['index'][rows].T.astype(np.int64)
+
+    if len(rows) == 0:
+        return level, 0.0, 0, 0.0, 0
+
+    # 3. Índice espacial de los bloques y conos del cono flotante:
+    k0 = k.min()
+    lookup = np.full((shape[0], shape[1], k.max() - k0 + 1), -1, dtype=np.int64)
+    lookup[i, j, k - k0] = np.arange(len(rows))
+    eligible = (profit > 0) & footprint[i * shape[1] + j]
+    bounds = np.r_[np.flatnonzero(np.r_[True, zcoord[1:] != zcoord[:-1]]),
+                   len(zcoord)]
+    mined = kernels.cone_mining(
+        bounds, eligible, i, j, k - k0, lookup, *stencil, profit
+    )
+
+    # 4. Eliminar las columnas por debajo de la altura mínima:
+    columns = i[mined] * shape[1] + j[mined]
+    top = pd.Series(zcoord[mined]).groupby(columns).transform('max').values
+    keep = ~(top - level < min_height)
+
+    # Tonelaje de los bloques extraídos:
+    tonnage = 0.0
+    if 'tonnage' in arrays:
+        tonnage = np.nansum(arrays['tonnage'][rows][mined][keep])
+
+    return (level, profit[mined][keep].sum(), int(keep.sum()), tonnage,
+            len(np.unique(columns[keep])))
+
+
+class EnvelopeBatch:
+    '''
+    Evaluación de la envolvente en varias cotas de footprint. Cada cota se
+    calcula (footprint y cono flotante) en un proceso de trabajo; el modelo
+    se publica una sola vez en memoria compartida de solo lectura.
+
+    Argumentos:
+        data (pd.DataFrame): datos del modelo de bloques
+        names (dict): nombres de las variables espaciales
+        grid (GridModel): grilla del modelo de bloques
+        profit_name (str): nombre de la columna de beneficio de la envolvente
+        tonnage_name (str): nombre de la columna de tonelaje de cada bloque
+            (None si el modelo no la tiene)
+        workers (int): número de procesos (por defecto, todos los núcleos)
+
+    Atributos:
+        sweep (LevelSweep): motor de barrido usado para el footprint
+        profit_name (str): columna de beneficio publicada
+        tonnage_name (str): columna de tonelaje publicada
+        workers (int): número de procesos
+        shared (SharedArrays): arreglos publicados en memoria compartida
+        geometry (tuple): dimensión de la grilla y tabla de descuento
+    '''
+
+    def __init__(self, data, names, grid, profit_name, tonnage_name=None,
+                 workers=None):
+        self.sweep = grid.sweep('profit')
+        self.profit_name = profit_name
+        self.tonnage_name = tonnage_name
+        self.workers = workers or os.cpu_count() or 1
+        self.executor = None
+
+        # Publicar el barrido del footprint y los bloques de la envolvente:
+        arrays = {
+            'column': self.sweep.column,
+            'sweep_z': self.sweep.z,
+            'sweep_profit': self.sweep.profit,
+            'offset': self.sweep.offset,
+            'z': data[names['z']].values,
+            'profit': data[profit_name].values,
+            'index': grid.index
+        }
+        if tonnage_name is not None:
+            arrays['tonnage'] = data[tonnage_name].values
+        self.shared = SharedArrays(arrays)
+        table = self.sweep.table
+        self.geometry = (grid.shape, (table.origin, table.size, table.levels))
+
+
+    def evaluate(self, levels, discount, rate, inv_cost, min_height,
+                 max_height, stencil):
+        '''
+        Calcula la envolvente de cada cota en paralelo
+
+        Argumentos:
+            levels (list): cotas de footprint a evaluar
+            discount (float): tasa de descuento
+            rate (float): tasa de extracción anual en m/año
+            inv_cost (float): costo de inversión del PE
+            min_height (float): altura mínima de columna
+            max_height (float): altura máxima de columna
+            stencil (tuple): plantilla del cono
+
+        Retorna:
+            list: cota, valor, número de bloques, tonelaje y número de
+                columnas de la envolvente de cada cota
+        '''
+
+        # Iniciar los procesos de trabajo la primera vez:
+        if self.executor is None:
+            self.executor = ProcessPoolExecutor(
+                max_workers=self.workers,
+                mp_context=multiprocessing.get_context('spawn')
+            )
+
+        futures = [
+            self.executor.submit(
+                envelope_level, self.shared.specs, self.geometry,
+                kernels.active_backend(), level, discount, rate, inv_cost,
+                min_height, max_height, stencil
+            )
+            for level in levels
+        ]
+        return [future.result() for future in futures]
+
+
+    def close(self):
+        '''Detiene los procesos y libera la memoria compartida'''
+        if self.executor is not None:
+            self.executor.shutdown()
+            self.executor = None
+        self.shared.close()
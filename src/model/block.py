@@ -1,6 +1,12 @@
+import numpy as np
 import pandas as pd
 import os
 
+from model.detail import LevelOfDetail
+from model.reader import BlockReader
+from model.store import BlockCache
+from model.tiles import TiledGrid
+
 
 class BlockModel:
     '''
@@ -9,11 +15,35 @@ class BlockModel:
     Atributos:
         data (pd.DataFrame): datos del modelo de bloques
         names (dict): nombres de las variables espaciales
+        grid (GridModel): representación del modelo en una grilla regular
+        memory (tuple): memoria del modelo leído antes y después de compactar
+            los tipos de datos, en bytes
+        store (BlockCache): caché binaria de los modelos importados
+        cached (bool): indica si el último modelo se abrió desde la caché
+        source (dict): opciones de lectura del modelo fuera de memoria (None
+            si el modelo se carga en el DataFrame)
+        budget (int): memoria máxima de cada tile del modelo fuera de
+            memoria, en bytes
+        detail (LevelOfDetail): reducción de puntos de la última
+            visualización
+        selection (tuple): índice, variable, rangos y bloques de la última
+            selección de la visualización en vivo
+        single (bool): pasar las variables con decimales (salvo las
+            coordenadas) a float32 al guardar las variables espaciales
     '''
 
-    def __init__(self, data, names):
+    def __init__(self, data, names, grid):
         self.data = data
         self.names = names
+        self.grid = grid
+        self.memory = (0, 0)
+        self.store = BlockCache()
+        self.cached = False
+        self.source = None
+        self.budget = 256 * 2**20
+        self.detail = None
+        self.selection = None
+        self.single = False
 
 
     def list_files(self):
@@ -26,26 +56,172 @@ class BlockModel:
         return [_file for _file in os.listdir() if os.path.isfile(_file)]
     
         
-    def read_file(self, name, sep, header):
+    def read_columns(self, name, sep, header):
         '''
-        Lee un archivo y lo carga en el modelo de bloques
-        
+        Lee el encabezado de un archivo sin cargar sus datos
+
         Argumentos:
             name (str): nombre del archivo
             sep (str): separador de columnas
             header (int or None): fila del encabezado
+
+        Retorna:
+            list: nombres de las columnas del archivo
+        '''
+        return BlockReader(name, sep, header).columns()
+
+
+    def read_file(self, name, sep, header, single=False, usecols=None,
+                  query=None, progress=None, out_of_core=False):
         '''
+        Lee un archivo y lo carga en el modelo de bloques. El archivo se lee
+        por bloques de filas, solo con las columnas seleccionadas, y el filtro
+        de filas se aplica durante la lectura. Los tipos de datos se compactan
+        sin perder precisión y los nuevos datos reemplazan a los anteriores
+        sin copiar columna por columna. Después de la primera lectura el
+        modelo se guarda en una caché binaria y las lecturas siguientes del
+        mismo archivo (con las mismas opciones) la abren con memoria mapeada.
         
-        # Leer los nuevos datos:
-        new_data = pd.read_csv(name, sep=sep, header=header)
+        Argumentos:
+            name (str): nombre del archivo
+            sep (str): separador de columnas
+            header (int or None): fila del encabezado
+            single (bool): guardar las variables con decimales en precisión
+                simple (float32), aunque se pierda precisión; se aplica al
+                guardar las variables espaciales, que conservan su precisión
+            usecols (list): columnas a leer (por defecto, todas)
+            query (str): filtro de filas, por ejemplo "z >= 100"
+            progress (function): función que recibe la fracción del archivo
+                leída
+            out_of_core (bool): no cargar los datos en memoria; la grilla en
+                disco se construye al guardar las variables espaciales
+        '''
+        self.source = None
+        self.single = single
+
+        # Modelo fuera de memoria: solo se leen los nombres y tipos de las
+        # columnas numéricas:
+        if out_of_core:
+            reader = BlockReader(name, sep, header)
+            dtypes = reader.dtypes(usecols)
+            self.source = dict(
+                name=name, sep=sep, header=header, usecols=usecols, query=query
+            )
+            self.replace_data(pd.DataFrame({
+                col: pd.Series(dtype=np.float64)
+                for col, dtype in dtypes.items() if dtype is np.float64
+            }))
+            self.memory = (0, 0)
+            self.cached = False
+            self.grid.clear()
+            return
+
+        # Abrir el modelo desde la caché si el archivo no cambió:
+        key = self.store.key(
+            name, sep=sep, header=header, usecols=usecols, query=query
+        )
+        new_data = self.store.load(name, key)
+        self.cached = new_data is not None
+
+        if self.cached:
+            before = new_data.memory_usage(deep=True).sum()
+
+        else:
+            # Leer los nuevos datos por bloques, compactando cada bloque:
+            reader = BlockReader(name, sep, header)
+            new_data, before = reader.read(usecols, query, progress)
+
+            # Guardar la caché (se omite si la carpeta no admite escritura):
+            try:
+                self.store.save(name, key, new_data)
+            except OSError:
+                pass
 
-        # Vaciar el contenido del dataframe actual:
-        self.data.drop(self.data.index, inplace=True)
-        self.data.drop(self.data.columns, axis=1, inplace=True)
+        # Reemplazar el contenido del dataframe compartido por los nuevos
+        # datos, sin copiarlos (los demás modelos conservan la referencia):
+        self.replace_data(new_data)
+        del new_data
+        self.memory = (before, self.data.memory_usage(deep=True).sum())
 
-        # Agregar los nuevos datos:
+        # Descartar la grilla del modelo anterior:
+        self.grid.clear()
+
+
+    def replace_data(self, new_data):
+        '''
+        Reemplaza el contenido del DataFrame compartido por los demás
+        modelos. Se quitan las filas y columnas anteriores y se asignan las
+        columnas nuevas, que no se copian.
+
+        Argumentos:
+            new_data (pd.DataFrame): nuevos datos del modelo de bloques
+        '''
+        self.data.drop(
+            index=self.data.index, columns=self.data.columns, inplace=True
+        )
         for col in new_data.columns:
             self.data[col] = new_data[col]
+
+
+    def apply_single(self):
+        '''
+        Pasa a float32 las variables con decimales del modelo, salvo las
+        coordenadas, si se pidió precisión simple al importar. Las
+        coordenadas conservan su precisión para que la grilla las ubique
+        exactamente.
+        '''
+        if not self.single or self.source is not None:
+            return
+
+        coords = set(self.names.values())
+        for col in self.data.columns:
+            if col not in coords and self.data[col].dtype == np.float64:
+                self.data[col] = self.data[col].astype(np.float32)
+
+        self.memory = (self.memory[0], self.data.memory_usage(deep=True).sum())
+
+
+    def build_grid(self, progress=None):
+        '''
+        Construye la grilla regular (i, j, k) del modelo de bloques a partir
+        de las variables espaciales guardadas. Con el modelo fuera de memoria
+        la grilla se escribe en disco (nombre.grid) leyendo el archivo por
+        bloques, o se reutiliza si ya existe con las mismas opciones.
+
+        Argumentos:
+            progress (function): función que recibe la fracción completada
+        '''
+        if self.source is None:
+            self.apply_single()
+            self.grid.build()
+            return
+
+        source = self.source
+        key = self.store.key(
+            source['name'], sep=source['sep'], header=source['header'],
+            usecols=source['usecols'], query=source['query'],
+            names=dict(self.names)
+        )
+        tiled = TiledGrid(f"{source['name']}.grid", self.budget)
+        if not tiled.open(key):
+            reader = BlockReader(source['name'], source['sep'], source['header'])
+            tiled.build(
+                reader, self.names, key, source['usecols'], source['query'],
+                progress
+            )
+        self.grid.attach(tiled)
+
+
+    def set_budget(self, megabytes):
+        '''
+        Establece la memoria máxima de cada tile del modelo fuera de memoria
+
+        Argumentos:
+            megabytes (float): memoria máxima en MB
+        '''
+        self.budget = int(megabytes * 2**20)
+        if self.grid.store is not None:
+            self.grid.store.budget = self.budget
         
     
     def columns(self):
@@ -60,17 +236,42 @@ class BlockModel:
     
     def describe(self):
         '''
-        Realiza un resumen estadístico del modelo de bloques
+        Realiza un resumen estadístico del modelo de bloques (por tiles si
+        el modelo está fuera de memoria)
         
         Retorna:
             pd.DataFrame: resumen estadístico del modelo de bloques
         '''
+        if self.grid.store is not None:
+            return self.grid.store.describe()
+
         return self.data.describe()
 
 
+    def value_range(self, name):
+        '''
+        Devuelve el mínimo y el máximo de una variable
+
+        Argumentos:
+            name (str): nombre de la variable
+
+        Retorna:
+            tuple: valor mínimo y máximo (None si aún no hay datos)
+        '''
+        if self.grid.store is not None:
+            return self.grid.store.value_range(name)
+
+        if self.data[name].empty:
+            return None
+
+        return self.data[name].min(), self.data[name].max()
+
+
     def get_plot_data(self, vname, vrange, xrange, yrange, zrange):
         '''
-        Filtra los datos del modelo de bloques para la visualización 3D
+        Filtra los datos del modelo de bloques para la visualización 3D. Las
+        consultas usan el índice de rangos de la grilla, que se construye una
+        sola vez por modelo.
 
         Argumentos:
             vname (str): nombre de la variable a graficar
@@ -83,24 +284,135 @@ class BlockModel:
             pd.DataFrame: datos filtrados para la visualización 3D
         '''
 
-        # Nombre de las variables espaciales:
-        xname = self.names['x']
-        yname = self.names['y']
-        zname = self.names['z']
-
-        # Filtrar los datos según los rangos seleccionados:
-        filtered_data = self.data.loc[
-            self.data[vname].between(vrange[0], vrange[1]) &
-            self.data[xname].between(xrange[0], xrange[1]) &
-            self.data[yname].between(yrange[0], yrange[1]) &
-            self.data[zname].between(zrange[0], zrange[1])
-        ]
-
-        # Devolver los datos filtrados:
-        return {
-            'x': filtered_data[xname].values,
-            'y': filtered_data[yname].values,
-            'z': filtered_data[zname].values,
-            vname: filtered_data[vname].values
-        }
-        
\ No newline at end of file
+        # Leer del disco solo las filas y niveles de la caja:
+        if self.grid.store is not None:
+            return self.grid.store.query(vname, vrange, xrange, yrange, zrange)
+
+        # Buscar en el índice de rangos solo los niveles y filas de la caja
+        # y aplicar el filtro de la variable a los bloques candidatos:
+        return self.grid.block_index().query(
+            vname, vrange, xrange, yrange, zrange
+        )
+        
+
+    def get_volume_data(self, vname, vrange, xrange, yrange, zrange,
+                        points, agg='mean'):
+        '''
+        Devuelve la variable como campo denso de la grilla dentro de una caja,
+        para graficarla con go.Volume o go.Isosurface. Las posiciones sin
+        bloque o fuera del rango de la variable quedan con NaN y el campo se
+        reduce al máximo de celdas, por lo que su tamaño depende de la
+        resolución de la grilla y no del número de bloques filtrados.
+
+        Argumentos:
+            vname (str): nombre de la variable a graficar
+            vrange, xrange, yrange, zrange (tuple): rangos de la variable y
+                de las coordenadas
+            points (int): número máximo de celdas
+            agg (str): 'mean' o 'max', agregación de la variable en cada celda
+
+        Retorna:
+            dict: coordenadas X, Y, Z y valor de cada celda
+        '''
+        # Índices de la caja en cada eje:
+        box = []
+        for coords, vr in zip(self.grid.coords, [xrange, yrange, zrange]):
+            first = int(np.searchsorted(coords, vr[0], side='left'))
+            last = int(np.searchsorted(coords, vr[1], side='right'))
+            box.append(slice(first, max(first, last)))
+
+        self.detail = LevelOfDetail(self.grid.size, points, agg)
+        shape = [b.stop - b.start for b in box]
+        factor = self.detail.field_factor(shape)
+        array = self.grid.array(vname)
+
+        # Fuera de memoria, la caja se lee por bandas de filas del tamaño de
+        # un tile (múltiplo del tamaño de celda), por lo que solo el campo
+        # reducido queda completo en memoria:
+        rows = max(shape[0], 1)
+        if self.grid.store is not None:
+            _, step = next(self.grid.store.tiles(3, depth=shape[2]))
+            rows = max(1, step // factor) * factor
+
+        def bands():
+            '''Campo de la variable dentro del rango en cada banda de filas'''
+            for i0 in range(box[0].start, box[0].stop, rows):
+                band = (slice(i0, min(i0 + rows, box[0].stop)), *box[1:])
+                field = np.array(array[band], dtype=float)
+                field[(field < vrange[0]) | (field > vrange[1])] = np.nan
+                yield field
+
+        return self.detail.volume_bands(
+            bands(), shape, [c[b] for c, b in zip(self.grid.coords, box)]
+        )
+
+
+    def live_plot_data(self, vname, vrange, xrange, yrange, zrange):
+        '''
+        Actualiza la selección de la visualización en vivo. En lugar de
+        repetir la consulta completa, se descartan los bloques de la
+        selección anterior que quedan fuera de la nueva caja y se buscan en
+        el índice solo los bloques de la diferencia entre ambas cajas. El
+        modelo fuera de memoria repite la consulta desde el disco.
+
+        Argumentos:
+            vname (str): nombre de la variable a graficar
+            vrange (tuple): rango de valores de la variable a graficar
+            xrange (tuple): rango de valores de la coordenada X
+            yrange (tuple): rango de valores de la coordenada Y
+            zrange (tuple): rango de valores de la coordenada Z
+
+        Retorna:
+            tuple: datos de la selección para la visualización 3D, número de
+                bloques que entran y número de bloques que salen
+        '''
+        ranges = (vrange, xrange, yrange, zrange)
+
+        # Sin índice en memoria se consulta la caja completa:
+        if self.grid.store is not None:
+            self.selection = None
+            plot_data = self.get_plot_data(vname, *ranges)
+            return plot_data, len(plot_data[vname]), 0
+
+        index = self.grid.block_index()
+
+        # Primera selección (o cambio de variable o de modelo):
+        if (self.selection is None or self.selection[0] is not index
+                or self.selection[1] != vname):
+            rows = index.select(vname, *ranges)
+            entering, leaving = len(rows), 0
+
+        # Diferencia respecto de la selección anterior:
+        else:
+            previous, rows = self.selection[2], self.selection[3]
+            keep = index.contains(rows, vname, *ranges)
+            added = index.entering(vname, previous, ranges)
+            entering, leaving = len(added), int(len(keep) - keep.sum())
+            if entering or leaving:
+                rows = np.concatenate([rows[keep], added])
+
+        self.selection = (index, vname, ranges, rows)
+        return index.blocks(vname, rows), entering, leaving
+
+
+    def reduce_plot_data(self, plot_data, vname, points, agg='mean'):
+        '''
+        Reduce los datos de la visualización 3D a un máximo de puntos,
+        agrupando los bloques en celdas más grandes de la grilla. Al acotar
+        los rangos de la visualización la reducción disminuye.
+
+        Argumentos:
+            plot_data (dict): datos filtrados por get_plot_data
+            vname (str): nombre de la variable a graficar
+            points (int): número máximo de puntos
+            agg (str): 'mean' o 'max', agregación de la variable en cada celda
+
+        Retorna:
+            dict: datos reducidos para la visualización 3D
+        '''
+        self.detail = LevelOfDetail(self.grid.size, points, agg)
+        x, y, z, values = self.detail.reduce(
+            plot_data['x'], plot_data['y'], plot_data['z'],
+            {vname: plot_data[vname]}
+        )
+        return {'x': x, 'y': y, 'z': z, vname: values[vname]}
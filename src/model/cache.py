@@ -0,0 +1,79 @@
+from collections import OrderedDict
+
+
+class ColumnCache:
+    '''
+    Caché de arreglos con memoria acotada y descarte LRU (se elimina primero
+    la entrada usada hace más tiempo)
+
+    Argumentos:
+        max_bytes (int): memoria máxima ocupada por los arreglos guardados
+
+    Atributos:
+        entries (OrderedDict): arreglos guardados, del menos al más reciente
+        nbytes (int): memoria ocupada por los arreglos guardados
+    '''
+
+    def __init__(self, max_bytes=512 * 2**20):
+        self.max_bytes = max_bytes
+        self.entries = OrderedDict()
+        self.nbytes = 0
+
+
+    def __contains__(self, key):
+        return key in self.entries
+
+
+    def __len__(self):
+        return len(self.entries)
+
+
+    def get(self, key):
+        '''
+        Recupera una entrada y la marca como la más reciente
+
+        Argumentos:
+            key (tuple): clave de la entrada
+
+        Retorna:
+            tuple or None: arreglos guardados o None si no existen
+        '''
+        if key not in self.entries:
+            return None
+
+        self.entries.move_to_end(key)
+        return self.entries[key]
+
+
+    def put(self, key, arrays):
+        '''
+        Guarda una entrada, descartando las menos recientes si se supera el
+        límite de memoria
+
+        Argumentos:
+            key (tuple): clave de la entrada
+            arrays (tuple): arreglos a guardar
+        '''
+
+        # No guardar entradas más grandes que la caché completa:
+        size = sum(array.nbytes for array in arrays)
+        if size > self.max_bytes:
+            return
+
+        # Reemplazar la entrada si ya existe:
+        if key in self.entries:
+            self.nbytes -= sum(a.nbytes for a in self.entries.pop(key))
+
+        # Descartar las entradas menos recientes:
+        while self.entries and self.nbytes + size > self.max_bytes:
+            _, old = self.entries.popitem(last=False)
+            self.nbytes -= sum(a.nbytes for a in old)
+
+        self.entries[key] = arrays
+        self.nbytes += size
+
+
+    def clear(self):
+        '''Descarta todas las entradas'''
+        self.entries.clear()
+        self.nbytes = 0
@@ -0,0 +1,56 @@
+import numpy as np
+
+from model import kernels
+
+
+class ClosureSolver:
+    '''
+    Resuelve el problema de clausura máxima sobre una grilla regular mediante
+    flujo máximo (push-relabel). Cada nodo exige que se extraigan los nodos
+    ubicados en sus desplazamientos de precedencia. Los arcos no se guardan:
+    se generan al recorrer cada nodo sumando los desplazamientos de la
+    plantilla a su posición, por lo que la memoria crece linealmente con el
+    número de nodos. El flujo se calcula con el núcleo closure_loop (compilado
+    con numba si es el motor activo) sobre arreglos int64.
+
+    Argumentos:
+        shape (tuple): dimensión de la grilla de nodos
+        cells (np.ndarray): posición (índice plano) de cada nodo en la grilla
+        weight (np.ndarray): peso entero de cada nodo
+        stencil (tuple): desplazamientos di, dj y dk de los predecesores
+
+    Atributos:
+        n (int): número de nodos
+        level (np.ndarray): nivel k de cada nodo
+        delta (np.ndarray): desplazamiento plano de cada arco de la plantilla
+        node (np.ndarray): nodo de cada posición de la grilla (o -1)
+    '''
+
+    def __init__(self, shape, cells, weight, stencil):
+        di, dj, dk = (np.asarray(a, dtype=np.int64) for a in stencil)
+        self.shape = shape
+        self.n = len(cells)
+        self.cells = np.asarray(cells, dtype=np.int64)
+        self.weight = np.asarray(weight, dtype=np.int64)
+        self.level = np.unravel_index(self.cells, shape)[2].astype(np.int64)
+        self.dk = dk
+
+        # Desplazamiento plano de cada arco (índices en orden C):
+        self.delta = (di * shape[1] + dj) * shape[2] + dk
+
+        # Nodo de cada posición de la grilla:
+        self.node = np.full(int(np.prod(shape)), -1, dtype=np.int64)
+        self.node[self.cells] = np.arange(self.n)
+
+
+    def solve(self):
+        '''
+        Resuelve la clausura máxima
+
+        Retorna:
+            np.ndarray: True para los nodos de la clausura máxima
+        '''
+        return kernels.max_closure(
+            self.cells, self.level, self.shape[2], self.node, self.delta,
+            self.dk, self.weight
+        )
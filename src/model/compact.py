@@ -0,0 +1,133 @@
+import numpy as np
+import pandas as pd
+from pandas.api.types import union_categoricals
+
+
+class ColumnCompactor:
+    '''
+    Compacta el modelo de bloques a medida que se lee por bloques de filas,
+    de modo que nunca se guarda el modelo completo en float64. Cada bloque se
+    guarda con el tipo más compacto que admiten todas las filas leídas hasta
+    el momento: enteros (también los leídos como decimales) en int32,
+    decimales en float32 si no se pierde precisión y códigos de texto (roca,
+    dominio) como categorías. Si un bloque posterior exige un tipo más amplio,
+    las partes anteriores se convierten al unir las columnas, una columna a
+    la vez.
+
+    Argumentos:
+        single (bool): guardar los decimales en float32 aunque se pierda
+            precisión
+
+    Atributos:
+        pieces (dict): partes compactadas de cada columna
+        kinds (dict): tipo más amplio exigido por cada columna numérica
+        raw (int): memoria de los bloques leídos antes de compactar, en bytes
+    '''
+
+    # Tipos numéricos, de menor a mayor:
+    KINDS = [np.int32, np.float32, np.float64]
+
+    def __init__(self, single=False):
+        self.single = single
+        self.pieces = {}
+        self.kinds = {}
+        self.raw = 0
+
+
+    def kind(self, values):
+        '''
+        Devuelve el tipo más compacto que representa una parte de columna
+
+        Argumentos:
+            values (np.ndarray): valores numéricos de la parte
+
+        Retorna:
+            int: posición del tipo en KINDS
+        '''
+        info = np.iinfo(np.int32)
+        finite = np.isfinite(values).all()
+
+        # Decimales sin parte fraccionaria que caben en int32:
+        if (finite and np.all(values == np.round(values))
+                and (len(values) == 0 or (values.min() >= info.min
+                                          and values.max() <= info.max))):
+            return 0
+
+        # Decimales que se representan exactamente en float32:
+        if self.single or np.array_equal(
+                values.astype(np.float32), values, equal_nan=True):
+            return 1
+
+        return 2
+
+
+    def add(self, chunk):
+        '''
+        Compacta y guarda un bloque de filas
+
+        Argumentos:
+            chunk (pd.DataFrame): bloque de filas leído del archivo
+        '''
+        self.raw += int(chunk.memory_usage(index=False, deep=True).sum())
+
+        for col in chunk.columns:
+            column = chunk[col]
+            parts = self.pieces.setdefault(col, [])
+
+            # Códigos de texto como categorías:
+            if not pd.api.types.is_numeric_dtype(column):
+                parts.append(pd.Categorical(column))
+                continue
+
+            values = column.to_numpy(dtype=np.float64)
+            kind = max(self.kind(values), self.kinds.get(col, 0))
+            self.kinds[col] = kind
+            parts.append(values.astype(self.KINDS[kind]))
+
+
+    def join(self, col):
+        '''
+        Une las partes de una columna en el tipo exigido por todas ellas
+
+        Argumentos:
+            col (str or int): nombre de la columna
+
+        Retorna:
+            np.ndarray or pd.Categorical: columna completa
+        '''
+        parts = self.pieces.pop(col)
+
+        if col not in self.kinds:
+            return union_categoricals(parts) if len(parts) > 1 else parts[0]
+
+        # Los enteros de las primeras partes solo se pasan a float32 si no
+        # pierden precisión:
+        kind = self.kinds[col]
+        if kind == 1 and not self.single and any(
+                p.dtype == np.int32 and
+                not np.array_equal(p.astype(np.float32), p)
+                for p in parts):
+            kind = 2
+
+        dtype = self.KINDS[kind]
+        return np.concatenate([p.astype(dtype, copy=False) for p in parts])
+
+
+    def result(self, columns):
+        '''
+        Devuelve el modelo compactado
+
+        Argumentos:
+            columns (list): columnas del modelo, en orden
+
+        Retorna:
+            pd.DataFrame: modelo de bloques compactado
+        '''
+        data = pd.DataFrame()
+        for col in columns:
+            if col not in self.pieces:
+                data[col] = pd.Series(dtype=np.float64)
+                continue
+            data[col] = self.join(col)
+
+        return data
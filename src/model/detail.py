@@ -0,0 +1,243 @@
+import numpy as np
+import pandas as pd
+
+
+class LevelOfDetail:
+    '''
+    Reducción del número de puntos de las visualizaciones 3D. Si hay más
+    bloques que el máximo de puntos, los bloques se agrupan en celdas cúbicas
+    de f x f x f bloques (con el menor f que respeta el máximo) y cada celda
+    se dibuja como un solo punto en el centroide de sus bloques, con el valor
+    medio o máximo de cada variable. Como f se calcula con los bloques de la
+    selección, al acercarse (rangos más estrechos) la reducción disminuye
+    hasta mostrar los bloques originales.
+
+    Argumentos:
+        size (np.ndarray): dimensiones de los bloques en X, Y y Z
+        budget (int): número máximo de puntos
+        agg (str): 'mean' o 'max', agregación de las variables de cada celda
+
+    Los campos densos de la grilla (volúmenes y superficies) se reducen del
+    mismo modo, agrupando las posiciones de la grilla en celdas de f x f x f,
+    por lo que su tamaño depende de la resolución y no del número de bloques.
+
+    Atributos:
+        factor (int): bloques por lado de las celdas de la última reducción
+        total (int): número de bloques de la última reducción
+        shown (int): número de puntos de la última reducción
+    '''
+
+    def __init__(self, size, budget=200_000, agg='mean'):
+        self.size = np.asarray(size, dtype=float)
+        self.budget = max(1, int(budget))
+        self.agg = agg
+        self.factor = 1
+        self.total = 0
+        self.shown = 0
+
+
+    def cells(self, x, y, z, factor):
+        '''
+        Devuelve la celda de cada punto para un tamaño de celda
+
+        Argumentos:
+            x, y, z (np.ndarray): coordenadas de los puntos
+            factor (int): bloques por lado de cada celda
+
+        Retorna:
+            tuple: identificador de celda de cada punto (ordenados de 0 a
+                número de celdas - 1) y número de celdas ocupadas
+        '''
+        index = [
+            np.round((c - c.min()) / s).astype(np.int64) // factor
+            for c, s in zip([x, y, z], self.size)
+        ]
+        flat = np.ravel_multi_index(index, [i.max() + 1 for i in index])
+        unique, inverse = np.unique(flat, return_inverse=True)
+        return inverse.ravel(), len(unique)
+
+
+    def reduce(self, x, y, z, values, agg=None):
+        '''
+        Reduce los puntos al máximo permitido
+
+        Argumentos:
+            x, y, z (np.ndarray): coordenadas de los puntos
+            values (dict): variables de cada punto
+            agg (dict): agregación de cada variable ('mean' o 'max'); por
+                defecto, la agregación general
+
+        Retorna:
+            tuple: coordenadas X, Y, Z y variables de los puntos reducidos
+        '''
+        x, y, z = (np.asarray(c, dtype=float) for c in (x, y, z))
+        agg = agg or {}
+        self.total = len(x)
+        self.factor = 1
+
+        if len(x) <= self.budget:
+            self.shown = len(x)
+            return x, y, z, values
+
+        # Menor tamaño de celda que respeta el máximo de puntos (la
+        # estimación inicial supone celdas llenas):
+        factor = max(2, int(np.ceil((len(x) / self.budget) ** (1 / 3))))
+        cell, count = self.cells(x, y, z, factor)
+        while count > self.budget:
+            factor += 1
+            cell, count = self.cells(x, y, z, factor)
+
+        # Centroide de cada celda y valor agregado de cada variable:
+        groups = pd.DataFrame({'x': x, 'y': y, 'z': z}).groupby(cell)
+        center = groups.mean()
+        reduced = {
+            name: pd.Series(v).groupby(cell).agg(agg.get(name, self.agg)).values
+            for name, v in values.items()
+        }
+
+        self.factor = factor
+        self.shown = count
+        return (center['x'].values, center['y'].values, center['z'].values,
+                reduced)
+
+
+    def field_factor(self, shape):
+        '''
+        Devuelve el menor tamaño de celda con el que un campo denso de la
+        grilla respeta el máximo de celdas
+
+        Argumentos:
+            shape (tuple): dimensión del campo
+
+        Retorna:
+            int: posiciones por lado de cada celda
+        '''
+        shape = np.array(shape)
+        if np.prod(shape) <= self.budget:
+            return 1
+
+        factor = max(2, int(np.ceil((np.prod(shape) / self.budget) **
+                                    (1 / len(shape)))))
+        while np.prod(-(-shape // factor)) > self.budget:
+            factor += 1
+
+        return factor
+
+
+    def coarsen(self, array, coords, agg=None):
+        '''
+        Reduce un campo denso de la grilla (2D o 3D, NaN en las posiciones
+        vacías) al máximo de celdas permitido
+
+        Argumentos:
+            array (np.ndarray): valor de cada posición de la grilla
+            coords (list): coordenadas de cada índice en cada eje
+            agg (str): 'mean' o 'max'; por defecto, la agregación general
+
+        Retorna:
+            tuple: coordenadas de las celdas en cada eje y campo reducido
+        '''
+        array = np.asarray(array, dtype=float)
+        return self.coarsen_bands([array], array.shape, coords, agg)
+
+
+    def coarsen_bands(self, bands, shape, coords, agg=None):
+        '''
+        Reduce un campo denso de la grilla leído por bandas consecutivas del
+        primer eje. Cada banda (salvo la última) debe tener un múltiplo de
+        field_factor(shape) filas, de modo que ninguna celda quede repartida
+        entre dos bandas y el campo completo nunca esté en memoria.
+
+        Argumentos:
+            bands (iterable): valor de cada posición de cada banda
+            shape (tuple): dimensión del campo completo
+            coords (list): coordenadas de cada índice en cada eje
+            agg (str): 'mean' o 'max'; por defecto, la agregación general
+
+        Retorna:
+            tuple: coordenadas de las celdas en cada eje y campo reducido
+        '''
+        shape = np.array(shape)
+        factor = self.field_factor(shape)
+        cells = -(-shape // factor)
+        inner = tuple(range(1, 2 * len(shape), 2))
+
+        parts = []
+        for band in bands:
+            band = np.asarray(band, dtype=float)
+            if factor == 1:
+                parts.append(band)
+                continue
+
+            # Completar cada eje con NaN hasta un múltiplo del tamaño de
+            # celda y separar las celdas en ejes propios:
+            rows = -(-np.array(band.shape) // factor)
+            padded = np.full(rows * factor, np.nan)
+            padded[tuple(slice(0, n) for n in band.shape)] = band
+            blocks = padded.reshape([m for n in rows for m in (n, factor)])
+
+            # Agregar las posiciones con bloques de cada celda:
+            if (agg or self.agg) == 'max':
+                parts.append(np.fmax.reduce(blocks, axis=inner))
+            else:
+                count = np.isfinite(blocks).sum(axis=inner)
+                total = np.nansum(blocks, axis=inner)
+                reduced = np.full(total.shape, np.nan)
+                np.divide(total, count, out=reduced, where=count > 0)
+                parts.append(reduced)
+
+        reduced = np.concatenate(parts) if parts else np.empty(cells)
+
+        # Coordenada media de las posiciones de cada celda:
+        centers = []
+        for c, n in zip(coords, cells):
+            axis = np.full(n * factor, np.nan)
+            axis[:len(c)] = c
+            centers.append(np.nanmean(axis.reshape(n, factor), axis=1))
+
+        self.total = int(np.prod(shape))
+        self.factor = factor
+        self.shown = reduced.size
+        return centers, reduced
+
+
+    def volume(self, array, coords, agg=None):
+        '''
+        Reduce un campo 3D de la grilla y lo aplana para go.Volume y
+        go.Isosurface
+
+        Argumentos:
+            array (np.ndarray): valor de cada posición de la grilla
+            coords (list): coordenadas de cada índice en X, Y y Z
+            agg (str): 'mean' o 'max'; por defecto, la agregación general
+
+        Retorna:
+            dict: coordenadas X, Y, Z y valor de cada celda (float32)
+        '''
+        array = np.asarray(array, dtype=float)
+        return self.volume_bands([array], array.shape, coords, agg)
+
+
+    def volume_bands(self, bands, shape, coords, agg=None):
+        '''
+        Igual que volume, pero con el campo leído por bandas (ver
+        coarsen_bands)
+
+        Argumentos:
+            bands (iterable): valor de cada posición de cada banda
+            shape (tuple): dimensión del campo completo
+            coords (list): coordenadas de cada índice en X, Y y Z
+            agg (str): 'mean' o 'max'; por defecto, la agregación general
+
+        Retorna:
+            dict: coordenadas X, Y, Z y valor de cada celda (float32)
+        '''
+        centers, field = self.coarsen_bands(bands, shape, coords, agg)
+        x, y, z = np.meshgrid(*centers, indexing='ij')
+
+        return {
+            'x': x.ravel().astype(np.float32),
+            'y': y.ravel().astype(np.float32),
+            'z': z.ravel().astype(np.float32),
+            'value': field.ravel().astype(np.float32)
+        }
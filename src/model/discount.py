@@ -0,0 +1,70 @@
+from collections import OrderedDict
+
+import numpy as np
+
+
+class DiscountTable:
+    '''
+    Tabla de factores de descuento por nivel de la grilla. Como la distancia
+    vertical entre bloques es múltiplo de la altura de bloque, el factor
+    1 / (1 + discount) ** (dz / rate) se calcula una sola vez por nivel y
+    luego se recupera indexando con el índice entero k de cada bloque.
+
+    Argumentos:
+        origin (float): cota del nivel k = 0
+        size (float): altura de bloque
+        levels (int): número de niveles de la grilla
+        max_tables (int): número máximo de tablas guardadas
+
+    Atributos:
+        tables (OrderedDict): factores de cada (discount, rate), del menos al
+            más reciente
+    '''
+
+    def __init__(self, origin, size, levels, max_tables=32):
+        self.origin = origin
+        self.size = size
+        self.levels = levels
+        self.max_tables = max_tables
+        self.tables = OrderedDict()
+
+
+    def factors(self, discount, rate):
+        '''
+        Devuelve el factor de descuento de cada nivel respecto al nivel k = 0
+
+        Argumentos:
+            discount (float): tasa de descuento
+            rate (float): tasa de extracción anual en m/año
+
+        Retorna:
+            np.ndarray: factor de descuento de cada nivel
+        '''
+        key = (discount, rate)
+
+        # Calcular la tabla solo la primera vez:
+        if key not in self.tables:
+            dz = self.size * np.arange(self.levels)
+            self.tables[key] = 1 / (1 + discount) ** (dz / rate)
+
+            # Descartar la tabla menos reciente:
+            if len(self.tables) > self.max_tables:
+                self.tables.popitem(last=False)
+
+        self.tables.move_to_end(key)
+        return self.tables[key]
+
+
+    def lookup(self, discount, rate, level):
+        '''
+        Devuelve el factor de descuento de una serie de niveles
+
+        Argumentos:
+            discount (float): tasa de descuento
+            rate (float): tasa de extracción anual en m/año
+            level (np.ndarray): desplazamiento entero de nivel de cada bloque
+
+        Retorna:
+            np.ndarray: factor de descuento de cada bloque
+        '''
+        return self.factors(discount, rate)[level]
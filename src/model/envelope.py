@@ -1,4 +1,12 @@
 import numpy as np
+import pandas as pd
+
+from model import kernels
+from model.batch import EnvelopeBatch
+from model.closure import ClosureSolver
+from model.detail import LevelOfDetail
+from model.raster import FootprintRaster
+
 
 class EnvelopeModel:
     '''
@@ -7,28 +15,70 @@ class EnvelopeModel:
     Atributos:
         data (pd.DataFrame): datos del modelo de bloques
         names (dict): nombres de las columnas del DataFrame
+        grid (GridModel): representación del modelo en una grilla regular
+        fp_raster (FootprintRaster): footprint compartido entre los menús
+        stencils (dict): plantillas de cono y de precedencia ya construidas
+        batch (EnvelopeBatch): evaluación multinivel del modelo actual
+        detail (LevelOfDetail): reducción de puntos de la última
+            visualización
     '''
 
-    def __init__(self, data, names, fp_x, fp_y):
+    def __init__(self, data, names, grid, fp_raster):
         self.data = data
         self.names = names
-        self.fp_x = fp_x
-        self.fp_y = fp_y
+        self.grid = grid
+        self.fp_raster = fp_raster
+        self.stencils = {}
+        self.batch = None
+        self.detail = None
+
+
+    def footprint(self, footprint=None):
+        '''
+        Devuelve el footprint de los vértices de la envolvente, comprobando
+        que corresponda a la grilla actual
+
+        Argumentos:
+            footprint (FootprintRaster): footprint de los vértices (por
+                defecto, el footprint compartido entre los menús)
+
+        Retorna:
+            FootprintRaster: footprint de los vértices
+        '''
+        if footprint is None:
+            footprint = self.fp_raster
+
+        if not footprint.empty and not footprint.matches(self.grid):
+            raise ValueError(
+                'El footprint no corresponde a la grilla del modelo actual'
+            )
+
+        return footprint
 
 
     def filter_data(self, level, height):
         '''
         Filtra el modelo de bloques entre el nivel óptimo y la altura máxima
-        de extracción
+        de extracción, ordenado por cota. Con la grilla fuera de memoria solo
+        se leen del disco los niveles de ese tramo.
 
         Argumentos:
             level (float): nivel óptimo de extracción
             height (float): altura máxima de extracción
+
+        Retorna:
+            pd.DataFrame: bloques entre el nivel y la altura máxima
         '''
-        return self.data[
-            self.data[self.names['z']] >= level &
-            self.data[self.names['z']] <= level + height
+        store = self.grid.store
+        if store is not None:
+            return store.slab(store.variables, level, level + height)
+
+        zname = self.names['z']
+        data = self.data[
+            (self.data[zname] >= level) &
+            (self.data[zname] <= level + height)
         ]
+        return data.sort_values(zname, ascending=True)
     
 
     def get_angles(self, x0, y0, z0, x, y, z):
@@ -43,13 +93,585 @@ class EnvelopeModel:
         dy2 = np.power(y - y0, 2)
         ang = np.arctan2(np.abs(z - z0), np.sqrt(dx2 + dy2))
         return np.degrees(ang)
+
+
+    def block_lookup(self, data):
+        '''
+        Construye el índice espacial de los bloques filtrados: un arreglo 3D
+        sobre la grilla que guarda la posición de cada bloque en data (o -1
+        si no hay bloque). Así los bloques cercanos a un punto se obtienen
+        indexando el arreglo, sin recorrer todo el modelo.
+
+        Argumentos:
+            data (pd.DataFrame): bloques filtrados por filter_data
+
+        Retorna:
+            tuple: índices (i, j, k) de cada bloque, nivel k inicial del
+                arreglo y arreglo de posiciones
+        '''
+
+        # Índices de la grilla de cada bloque filtrado:
+        i, j, k = (
+            self.grid.locate(axis, data[self.names[name]].values)
+            for axis, name in enumerate(['x', 'y', 'z'])
+        )
+
+        # Arreglo de posiciones restringido a los niveles filtrados:
+        k0 = k.min() if len(k) else 0
+        depth = (k.max() - k0 + 1) if len(k) else 0
+        lookup = np.full(self.grid.shape[:2] + (depth,), -1, dtype=np.int64)
+        lookup[i, j, k - k0] = np.arange(len(data))
+
+        return i, j, k, k0, lookup
     
 
-    def floating_cone(self, xcoord, ycoord, zcoord, profit,
-                      min_height, max_height, slope):
+    def cone_stencil(self, slope, max_height):
+        '''
+        Construye la plantilla del cono: los desplazamientos enteros
+        (di, dj, dk) de la grilla que quedan dentro de un cono con el ángulo
+        dado. En una grilla regular la forma del cono es la misma para todos
+        los vértices, por lo que la plantilla se calcula una sola vez por
+        (ángulo, altura máxima, tamaño de bloque).
+
+        Argumentos:
+            slope (float): ángulo de socavación en grados
+            max_height (float): altura máxima de columna
+
+        Retorna:
+            tuple: desplazamientos di, dj y dk de los bloques del cono
+        '''
+        key = (slope, max_height, tuple(self.grid.size), self.grid.shape)
+
+        if key not in self.stencils:
+            sx, sy, sz = self.grid.size
+            depth = int(np.floor(max_height / sz + 1e-9))
+
+            # Radio máximo del cono en número de bloques (con holgura). Sin
+            # ángulo positivo el cono abarca todo el plano:
+            if slope > 0:
+                spread = depth * sz / np.tan(np.radians(min(slope, 90)))
+                ri = int(np.ceil(spread / sx)) + 1
+                rj = int(np.ceil(spread / sy)) + 1
+            else:
+                ri, rj = self.grid.shape[0] - 1, self.grid.shape[1] - 1
+
+            # Desplazamientos de la caja que contiene al cono:
+            di, dj, dk = np.meshgrid(
+                np.arange(-ri, ri + 1),
+                np.arange(-rj, rj + 1),
+                np.arange(-depth, 1),
+                indexing='ij'
+            )
+
+            # Conservar los desplazamientos que cumplen el ángulo:
+            ang = self.get_angles(0, 0, 0, di * sx, dj * sy, dk * sz)
+            inside = ang >= slope
+            self.stencils[key] = (di[inside], dj[inside], dk[inside])
+
+        return self.stencils[key]
+
+
+    def floating_cone_steps(self, level, profit_name, max_height, slope,
+                            footprint=None):
+        '''
+        Operativiza la envolvente de caving usando método del cono flotante,
+        entregando el resultado parcial después de procesar cada cota.
+        Recorre las cotas de menor a mayor y, en cada punto del footprint con
+        beneficio positivo, extrae el cono de bloques inferiores si su valor
+        es positivo. Los bloques de cada cono se obtienen indexando el índice
+        espacial con la plantilla del cono y los bloques extraídos se marcan
+        en una máscara, sin volver a crear los arreglos.
+
+        Argumentos:
+            level (float): cota del footprint
+            profit_name (str): nombre de la columna de beneficio
+            max_height (float): altura máxima de columna
+            slope (float): ángulo de socavación en grados
+            footprint (FootprintRaster): footprint de los vértices (por
+                defecto, el footprint compartido entre los menús)
+
+        Retorna (en cada cota):
+            tuple: cota procesada, número de cotas procesadas, número total
+                de cotas y coordenadas X, Y, Z y beneficio de los bloques
+                extraídos hasta el momento
+        '''
+
+        # Bloques entre la cota del footprint y la altura máxima:
+        footprint = self.footprint(footprint)
+        data = self.filter_data(level, max_height)
+        xcoord = data[self.names['x']].values
+        ycoord = data[self.names['y']].values
+        zcoord = data[self.names['z']].values
+        profit = data[profit_name].values
+
+        # Sin bloques sobre el footprint (por ejemplo, una cota sobre el
+        # techo del modelo) la envolvente queda vacía:
+        if len(data) == 0:
+            empty = np.array([], dtype=np.int64)
+            yield (level, 1, 1, (xcoord[empty], ycoord[empty], zcoord[empty],
+                                 profit[empty]))
+            return
+
+        # Índice espacial de los bloques filtrados:
+        i, j, k, k0, lookup = self.block_lookup(data)
+
+        # Puntos con beneficio positivo en el footprint y primer bloque de
+        # cada cota (los bloques están ordenados por cota):
+        eligible = (profit > 0) & footprint.contains(i, j)
+        bounds = np.r_[np.flatnonzero(np.r_[True, zcoord[1:] != zcoord[:-1]]),
+                       len(zcoord)]
+
+        # Extraer los conos de una cota a la vez con la plantilla del cono:
+        si, sj, sk = self.cone_stencil(slope, max_height)
+        alive = np.ones(len(data), dtype=bool)
+        cones = []
+        steps = len(bounds) - 1
+
+        for n in range(steps):
+            cones.append(kernels.cone_mining(
+                bounds[n:n + 2], eligible, i, j, k - k0, lookup, si, sj, sk,
+                profit, alive
+            ))
+
+            # Bloques extraídos en el orden en que fueron agregados:
+            mined = np.concatenate(cones)
+            yield (zcoord[bounds[n]], n + 1, steps,
+                   (xcoord[mined], ycoord[mined], zcoord[mined], profit[mined]))
+
+
+    def floating_cone(self, level, profit_name, max_height, slope,
+                      footprint=None):
         '''
         Operativiza la envolvente de caving usando método del cono flotante
+        (resultado final de floating_cone_steps)
+
+        Argumentos:
+            level (float): cota del footprint
+            profit_name (str): nombre de la columna de beneficio
+            max_height (float): altura máxima de columna
+            slope (float): ángulo de socavación en grados
+            footprint (FootprintRaster): footprint de los vértices (por
+                defecto, el footprint compartido entre los menús)
+
+        Retorna:
+            tuple: coordenadas X, Y, Z y beneficio de los bloques extraídos
+        '''
+        empty = np.array([])
+        result = (empty, empty, empty, empty)
+        for *_, result in self.floating_cone_steps(
+                level, profit_name, max_height, slope, footprint):
+            pass
+
+        return result
+
+
+    def precedence_stencil(self, slope, max_height):
+        '''
+        Construye la plantilla de precedencia: los desplazamientos del cono
+        que no se pueden obtener como suma de otros dos desplazamientos del
+        cono. Como el cono es convexo, exigir estos desplazamientos a cada
+        bloque equivale a exigir el cono completo, con muchos menos arcos.
+
+        Argumentos:
+            slope (float): ángulo de socavación en grados
+            max_height (float): altura máxima de columna
+
+        Retorna:
+            tuple: desplazamientos di, dj y dk de los arcos de precedencia
+        '''
+        key = ('precedence', slope, max_height, tuple(self.grid.size),
+               self.grid.shape)
+
+        if key not in self.stencils:
+            si, sj, sk = self.cone_stencil(slope, max_height)
+
+            # Quitar el propio vértice del cono:
+            keep = (si != 0) | (sj != 0) | (sk != 0)
+            offsets = set(zip(si[keep].tolist(), sj[keep].tolist(), sk[keep].tolist()))
+
+            # Sin ángulo positivo hay desplazamientos en el mismo nivel y la
+            # reducción no es válida, por lo que se conserva el cono completo:
+            if slope > 0:
+                offsets = {
+                    (a, b, c) for a, b, c in offsets
+                    if not any((a - d, b - e, c - f) in offsets
+                               for d, e, f in offsets)
+                }
+
+            offsets = np.array(sorted(offsets), dtype=np.int64).reshape(-1, 3)
+            self.stencils[key] = tuple(offsets.T)
+
+        return self.stencils[key]
+
+
+    def max_closure(self, level, profit_name, max_height, slope):
+        '''
+        Calcula la envolvente de caving óptima como clausura máxima. Cada
+        bloque exige extraer los bloques de su cono inferior y se busca el
+        conjunto cerrado de mayor beneficio mediante flujo máximo. Los bloques
+        fuera de las columnas del footprint solo se extraen si algún bloque
+        del footprint los exige (su beneficio positivo no se considera en la
+        optimización, pero sí en el valor de la envolvente).
+
+        Argumentos:
+            level (float): cota del footprint
+            profit_name (str): nombre de la columna de beneficio
+            max_height (float): altura máxima de columna
+            slope (float): ángulo de socavación en grados
+
+        Retorna:
+            tuple: coordenadas X, Y, Z y beneficio de los bloques extraídos
+        '''
+
+        # Bloques entre la cota del footprint y la altura máxima:
+        footprint = self.footprint()
+        data = self.filter_data(level, max_height)
+        xcoord = data[self.names['x']].values
+        ycoord = data[self.names['y']].values
+        zcoord = data[self.names['z']].values
+        profit = data[profit_name].values
+        empty = np.array([], dtype=np.int64)
+
+        if len(data) == 0:
+            return xcoord[empty], ycoord[empty], zcoord[empty], profit[empty]
+
+        # Índice espacial y plantilla de precedencia:
+        i, j, k, k0, lookup = self.block_lookup(data)
+        di, dj, dk = self.precedence_stencil(slope, max_height)
+
+        # Grilla de nodos con un margen lateral de posiciones vacías, para que
+        # las cadenas de arcos que pasan fuera del modelo sigan conectadas
+        # (un cono más un arco de precedencia):
+        si, sj, _ = self.cone_stencil(slope, max_height)
+        pi = int(np.abs(si).max() + np.abs(di).max()) if len(di) else 0
+        pj = int(np.abs(sj).max() + np.abs(dj).max()) if len(dj) else 0
+        shape = (lookup.shape[0] + 2 * pi, lookup.shape[1] + 2 * pj, lookup.shape[2])
+        cell = np.ravel_multi_index((i + pi, j + pj, k - k0), shape)
+        delta = (di * shape[1] + dj) * shape[2] + dk
+
+        # Peso de cada nodo (los bloques fuera del footprint no se extraen
+        # por sí solos):
+        weight = profit.astype(float)
+        outside = ~footprint.contains(i, j)
+        weight[outside] = np.minimum(weight[outside], 0.0)
+
+        # Pesos enteros para que el flujo sea exacto (la suma de los pesos
+        # acota el flujo, por lo que se escala para que quepa en int64):
+        scale = np.abs(weight).sum()
+        scale = 2.0 ** 60 / scale if scale > 0 else 1.0
+        weight = np.rint(weight * scale).astype(np.int64)
+
+        # Nodos relevantes: los bloques con peso positivo y los que exigen:
+        reached = np.zeros(int(np.prod(shape)), dtype=bool)
+        frontier = cell[weight > 0]
+        reached[frontier] = True
+        while len(frontier):
+            level_k = frontier % shape[2]
+            target = frontier[:, None] + delta[None, :]
+            target = target[level_k[:, None] + dk[None, :] >= 0]
+            target = np.unique(target[~reached[target]])
+            reached[target] = True
+            frontier = target
+
+        cells = np.flatnonzero(reached)
+
+        # Peso de cada nodo (cero en las posiciones sin bloque):
+        position = np.full(len(reached), -1, dtype=np.int64)
+        position[cell] = np.arange(len(data))
+        position = position[cells]
+        node_weight = np.where(position >= 0, weight[np.maximum(position, 0)], 0)
+
+        # Resolver la clausura máxima:
+        solver = ClosureSolver(shape, cells, node_weight, (di, dj, dk))
+        closure = solver.solve()
+
+        # Bloques extraídos ordenados por cota:
+        mined = np.sort(position[closure & (position >= 0)])
+
+        return xcoord[mined], ycoord[mined], zcoord[mined], profit[mined]
+
+
+    def filter_min_height(self, level, min_height, x_cave, y_cave, z_cave,
+                          v_cave):
+        '''
+        Elimina de la envolvente las columnas más bajas que la altura mínima.
+        La altura de cada columna se obtiene con una única reducción por
+        columna de la grilla, sin recorrer los bloques uno a uno.
+
+        Argumentos:
+            level (float): cota del footprint
+            min_height (float): altura mínima de columna
+            x_cave, y_cave, z_cave, v_cave (np.ndarray): coordenadas y
+                beneficio de los bloques de la envolvente
+
+        Retorna:
+            tuple: coordenadas X, Y, Z, beneficio y altura de columna de los
+                bloques conservados
+        '''
+
+        # Columna de la grilla de cada bloque de la envolvente:
+        i = self.grid.locate(0, x_cave)
+        j = self.grid.locate(1, y_cave)
+        column = i * self.grid.shape[1] + j
+
+        # Altura de extracción de la columna de cada bloque:
+        top = pd.Series(z_cave).groupby(column).transform('max').values
+        height = top - level
+
+        # Conservar las columnas que alcanzan la altura mínima:
+        keep = ~(height < min_height)
+
+        return (x_cave[keep], y_cave[keep], z_cave[keep], v_cave[keep],
+                height[keep])
+
+
+    def reduce_envelope(self, x_cave, y_cave, z_cave, v_cave, h_cave, points,
+                        agg='mean'):
+        '''
+        Reduce los bloques de la envolvente a un máximo de puntos para la
+        visualización 3D (la altura de columna de cada celda es la máxima)
+
+        Argumentos:
+            x_cave, y_cave, z_cave (np.ndarray): coordenadas de los bloques
+            v_cave (np.ndarray): beneficio de cada bloque
+            h_cave (np.ndarray): altura de columna de cada bloque
+            points (int): número máximo de puntos
+            agg (str): 'mean' o 'max', agregación del beneficio de cada celda
+
+        Retorna:
+            tuple: coordenadas X, Y, Z, beneficio y altura de columna de los
+                puntos reducidos
+        '''
+        self.detail = LevelOfDetail(self.grid.size, points, agg)
+        x, y, z, values = self.detail.reduce(
+            x_cave, y_cave, z_cave, {'v': v_cave, 'h': h_cave},
+            agg={'h': 'max'}
+        )
+        return x, y, z, values['v'], values['h']
+
+
+    def envelope_volume(self, x_cave, y_cave, z_cave, v_cave, points,
+                        agg='mean'):
+        '''
+        Devuelve el beneficio de la envolvente como campo denso de la grilla
+        (NaN fuera de la envolvente), reducido al máximo de celdas, para
+        graficarlo con go.Volume
+
+        Argumentos:
+            x_cave, y_cave, z_cave (np.ndarray): coordenadas de los bloques
+            v_cave (np.ndarray): beneficio de cada bloque
+            points (int): número máximo de celdas
+            agg (str): 'mean' o 'max', agregación del beneficio de cada celda
+
+        Retorna:
+            dict: coordenadas X, Y, Z y beneficio de cada celda (None si la
+                envolvente está vacía)
+        '''
+        self.detail = LevelOfDetail(self.grid.size, points, agg)
+        if len(v_cave) == 0:
+            return None
+
+        # Caja de índices que contiene la envolvente:
+        index = [
+            self.grid.locate(axis, c)
+            for axis, c in enumerate([x_cave, y_cave, z_cave])
+        ]
+        first = [i.min() for i in index]
+        last = [i.max() for i in index]
+
+        field = np.full([b - a + 1 for a, b in zip(first, last)], np.nan)
+        field[tuple(i - a for i, a in zip(index, first))] = v_cave
+
+        return self.detail.volume(field, [
+            c[a:b + 1] for c, a, b in zip(self.grid.coords, first, last)
+        ])
+
+
+    def draw_surface(self, x_cave, y_cave, z_cave, points):
+        '''
+        Calcula la superficie de altura de extracción de la envolvente: la
+        cota del bloque más alto de cada columna, reducida al máximo de
+        vértices (con el máximo de cada celda) y triangulada sobre la grilla
+        XY. Se calcula una vez por envolvente, de modo que la figura no
+        agrupa los bloques ni triangula en cada actualización.
+
+        Argumentos:
+            x_cave, y_cave, z_cave (np.ndarray): coordenadas de los bloques
+            points (int): número máximo de vértices
+
+        Retorna:
+            dict: coordenadas X, Y, Z de los vértices e índices i, j, k de
+                los triángulos
+        '''
+        surface = LevelOfDetail(self.grid.size[:2], points, 'max')
+        if len(z_cave) == 0:
+            empty = np.array([], dtype=np.int64)
+            return dict(x=empty, y=empty, z=empty, i=empty, j=empty, k=empty)
+
+        # Cota del bloque más alto de cada columna:
+        ii = self.grid.locate(0, x_cave)
+        jj = self.grid.locate(1, y_cave)
+        i0, j0 = ii.min(), jj.min()
+        top = np.full((ii.max() - i0 + 1, jj.max() - j0 + 1), np.nan)
+        np.fmax.at(top, (ii - i0, jj - j0), np.asarray(z_cave, dtype=float))
+
+        (xs, ys), top = surface.coarsen(top, [
+            self.grid.coords[0][i0:i0 + top.shape[0]],
+            self.grid.coords[1][j0:j0 + top.shape[1]]
+        ])
+
+        # Vértices en las celdas con columnas:
+        valid = np.isfinite(top)
+        ids = np.full(top.shape, -1)
+        ids[valid] = np.arange(valid.sum())
+        xx, yy = np.meshgrid(xs, ys, indexing='ij')
+
+        # Dos triángulos por cuadrado de celdas (uno si falta una esquina):
+        a, b = ids[:-1, :-1], ids[1:, :-1]
+        c, d = ids[:-1, 1:], ids[1:, 1:]
+        triangles = [
+            (a, b, d, (a >= 0) & (b >= 0) & (d >= 0)),
+            (a, d, c, (a >= 0) & (c >= 0) & (d >= 0)),
+            (b, d, c, (a < 0) & (b >= 0) & (c >= 0) & (d >= 0)),
+            (a, b, c, (d < 0) & (a >= 0) & (b >= 0) & (c >= 0))
+        ]
+        i, j, k = (
+            np.concatenate([t[n][t[3]] for t in triangles]) for n in range(3)
+        )
+
+        return dict(
+            x=xx[valid], y=yy[valid], z=top[valid], i=i, j=j, k=k
+        )
+
+
+    def evaluate_levels(self, levels, profit_name, discount, rate, inv_cost,
+                        min_height, max_height, slope, density,
+                        tonnage_name=None):
+        '''
+        Calcula el footprint y la envolvente del cono flotante para varias
+        cotas en paralelo y las ordena por valor de la envolvente. Con la
+        grilla fuera de memoria las cotas se evalúan una a una, leyendo solo
+        el tramo de niveles de cada envolvente.
+
+        Argumentos:
+            levels (list): cotas de footprint a evaluar
+            profit_name (str): nombre de la columna de beneficio
+            discount (float): tasa de descuento
+            rate (float): tasa de extracción anual en m/año
+            inv_cost (float): costo de inversión del PE
+            min_height (float): altura mínima de columna
+            max_height (float): altura máxima de columna
+            slope (float): ángulo de socavación en grados
+            density (float): densidad de roca en t/m3 (solo si el modelo no
+                tiene columna de tonelaje)
+            tonnage_name (str): nombre de la columna de tonelaje de cada
+                bloque (None para estimarlo con el volumen y la densidad)
+
+        Retorna:
+            pd.DataFrame: cota, valor, tonelaje y número de columnas de la
+                envolvente de cada cota, de mayor a menor valor
+        '''
+
+        if self.grid.store is not None:
+            results = [
+                self.envelope_level(
+                    level, profit_name, discount, rate, inv_cost, min_height,
+                    max_height, slope, tonnage_name
+                )
+                for level in levels
+            ]
+            return self.level_table(results, density, tonnage_name)
+
+        # Publicar el modelo en memoria compartida solo si cambió:
+        sweep = self.grid.sweep('profit')
+        if (self.batch is None or self.batch.sweep is not sweep or
+                self.batch.profit_name != profit_name or
+                self.batch.tonnage_name != tonnage_name):
+            if self.batch is not None:
+                self.batch.close()
+            self.batch = EnvelopeBatch(
+                self.data, self.names, self.grid, profit_name, tonnage_name
+            )
+
+        # Evaluar cada cota en un proceso de trabajo:
+        results = self.batch.evaluate(
+            levels, discount, rate, inv_cost, min_height, max_height,
+            self.cone_stencil(slope, max_height)
+        )
+
+        return self.level_table(results, density, tonnage_name)
+
+
+    def envelope_level(self, level, profit_name, discount, rate, inv_cost,
+                       min_height, max_height, slope, tonnage_name=None):
+        '''
+        Calcula el footprint y la envolvente del cono flotante de una cota,
+        sin modificar el footprint compartido entre los menús
+
+        Argumentos:
+            level (float): cota del footprint
+            profit_name (str): nombre de la columna de beneficio
+            discount (float): tasa de descuento
+            rate (float): tasa de extracción anual en m/año
+            inv_cost (float): costo de inversión del PE
+            min_height (float): altura mínima de columna
+            max_height (float): altura máxima de columna
+            slope (float): ángulo de socavación en grados
+            tonnage_name (str): nombre de la columna de tonelaje de cada
+                bloque (None si el modelo no la tiene)
+
+        Retorna:
+            tuple: cota, valor de la envolvente, número de bloques, tonelaje
+                de los bloques (0 sin columna de tonelaje) y número de
+                columnas
+        '''
+
+        # Footprint de la cota:
+        [(column, value)] = self.grid.column_values(
+            'profit', [level], discount, rate
+        )
+        footprint = FootprintRaster()
+        footprint.update(self.grid, column, value, inv_cost, level)
+
+        # Envolvente sin las columnas por debajo de la altura mínima:
+        cone = self.floating_cone(
+            level, profit_name, max_height, slope, footprint
+        )
+        x, y, z, v, _ = self.filter_min_height(level, min_height, *cone)
+        i, j, k = (self.grid.locate(axis, values)
+                   for axis, values in enumerate([x, y, z]))
+        columns = i * self.grid.shape[1] + j
+
+        # Tonelaje de los bloques extraídos:
+        tonnage = 0.0
+        if tonnage_name is not None:
+            tonnage = np.nansum(self.grid.array(tonnage_name)[i, j, k])
+
+        return level, v.sum(), len(v), tonnage, len(np.unique(columns))
+
+
+    def level_table(self, results, density, tonnage_name=None):
+        '''
+        Ordena los resultados de varias cotas por valor de la envolvente
+
+        Argumentos:
+            results (list): cota, valor, número de bloques, tonelaje y número
+                de columnas de la envolvente de cada cota
+            density (float): densidad de roca en t/m3
+            tonnage_name (str): nombre de la columna de tonelaje sumada en
+                los resultados (None para estimar el tonelaje con el volumen
+                de los bloques y la densidad)
+
+        Retorna:
+            pd.DataFrame: cota, valor, tonelaje y número de columnas de la
+                envolvente de cada cota, de mayor a menor valor
         '''
+        table = pd.DataFrame(
+            results, columns=['level', 'value', 'blocks', 'tonnage', 'columns']
+        )
+        if tonnage_name is None:
+            table['tonnage'] = (table['blocks'] * np.prod(self.grid.size) *
+                                density)
+        table = table.sort_values('value', ascending=False, ignore_index=True)
 
-        # Inicializar vectores de coordenada y beneficio:
-        data = self.filter_data()
\ No newline at end of file
+        return table[['level', 'value', 'tonnage', 'columns']]
@@ -1,3 +1,6 @@
+import numpy as np
+
+
 class FootprintModel:
     '''
     Modelo para la definición de la geometría de la cota óptima
@@ -5,13 +8,15 @@ class FootprintModel:
     Atributos:
         data (pd.DataFrame): datos del modelo de bloques
         names (dict): nombres de las variables espaciales
+        grid (GridModel): representación del modelo en una grilla regular
+        fp_raster (FootprintRaster): footprint compartido entre los menús
     '''
 
-    def __init__(self, data, names, fp_x, fp_y):
+    def __init__(self, data, names, grid, fp_raster):
         self.data = data
         self.names = names
-        self.fp_x = fp_x
-        self.fp_y = fp_y
+        self.grid = grid
+        self.fp_raster = fp_raster
 
 
     def get_footprint(self, height, discount, rate, inv_cost):
@@ -26,44 +31,30 @@ class FootprintModel:
             inv_cost (float): costo de inversión del PE
 
         Retorna:
-            pd.DataFrame: modelo de bloques con valor económico acumulado
+            tuple: coordenadas X e Y de las columnas del ráster, ráster del
+                máximo valor acumulado de las columnas que pagan la inversión
+                (NaN en el resto), dimensión (nx, ny), y coordenadas X e Y del
+                contorno del footprint
         '''
 
-        # Nombre de las variables espaciales:
-        xname = self.names['x']
-        yname = self.names['y']
-        zname = self.names['z']
-
-        # filtrar modelo de bloques y ordenar valor Z:
-        model = self.data[self.data[zname] >= height].copy()
-        model = model.sort_values(by=zname, ascending=True)
-
-        # Calcular la altura del bloque:
-        dz = model[zname] - height
-
-        # Actualizar el valor de cada bloque:
-        model['discounted'] = model['profit'] / (1 + discount) ** (dz / rate)
-
-        # Calcular el valor acumulado en cada columna:
-        model['cumulative'] = model.groupby([xname, yname])['discounted'].cumsum()
-
-        # Obtener el máximo de cada columna:
-        max_values = model.groupby([xname, yname])['cumulative'].max()
-        max_values = max_values[max_values > inv_cost]
-
-        # Obtener los datos para graficar:
-        x = [point[0] for point in max_values.index.values]
-        y = [point[1] for point in max_values.index.values]
-        v = max_values.values
-
-        # Guardar geometría del footprint:
-        self.fp_x.resize(len(x), refcheck=False)
-        self.fp_x[:] = x
+        # Máximo valor acumulado de cada columna de la grilla en la cota:
+        [(column, value)] = self.grid.column_values(
+            'profit', [height], discount, rate
+        )
 
-        self.fp_y.resize(len(y), refcheck=False)
-        self.fp_y[:] = y
+        # Guardar el ráster del footprint y del valor de cada columna:
+        self.fp_raster.update(self.grid, column, value, inv_cost, height)
+        outline = self.fp_raster.outline()
 
-        return x, y, v
+        # Recortar el ráster a las columnas que pagan la inversión del PE:
+        mask = self.fp_raster.mask
+        i, j = np.nonzero(mask)
+        if len(i) == 0:
+            return np.array([]), np.array([]), np.empty((0, 0)), outline
 
+        box = (slice(i.min(), i.max() + 1), slice(j.min(), j.max() + 1))
+        v = np.where(mask[box], self.fp_raster.value[box], np.nan)
+        x = self.grid.coords[0][box[0]]
+        y = self.grid.coords[1][box[1]]
 
-    
\ No newline at end of file
+        return x, y, v, outline
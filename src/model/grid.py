@@ -0,0 +1,386 @@
+import numpy as np
+
+from model.cache import ColumnCache
+from model.discount import DiscountTable
+from model.index import BlockIndex
+from model.raster import FootprintRaster
+from model.sweep import LevelSweep
+
+
+class GridModel:
+    '''
+    Representación del modelo de bloques en una grilla regular. Asigna a cada
+    bloque los índices enteros (i, j, k) de su posición en la grilla, de modo
+    que las operaciones por columna, por nivel y por vecindario se resuelvan
+    indexando arreglos en vez de agrupar por coordenadas.
+
+    Atributos:
+        data (pd.DataFrame): datos del modelo de bloques
+        names (dict): nombres de las variables espaciales
+        origin (np.ndarray): coordenadas del bloque (0, 0, 0)
+        size (np.ndarray): dimensiones de los bloques en X, Y y Z
+        shape (tuple): número de bloques en X, Y y Z
+        index (np.ndarray): índices (i, j, k) de cada bloque, dimensión (n, 3)
+        coords (list): coordenada de cada índice en X, Y y Z
+        arrays (dict): arreglos 3D de las variables numéricas ya construidas
+        version (int): contador que aumenta cada vez que cambia la grilla
+        cache (ColumnCache): máximos acumulados por columna ya calculados
+        discount (DiscountTable): factores de descuento por nivel de la grilla
+        store (TiledGrid): grilla fuera de memoria (None si el modelo está en
+            el DataFrame)
+        range_index (BlockIndex): índice de consultas por rango ya construido
+        fp_raster (FootprintRaster): footprint calculado sobre la grilla
+            (compartido entre los menús)
+    '''
+
+    def __init__(self, data, names):
+        self.data = data
+        self.names = names
+        self.version = 0
+        self.cache = ColumnCache()
+        self.fp_raster = FootprintRaster()
+        self.clear()
+
+
+    @property
+    def built(self):
+        '''Indica si la grilla fue construida'''
+        return self.index is not None or self.store is not None
+
+
+    def clear(self):
+        '''Descarta la grilla actual (por ejemplo, al importar otro modelo)'''
+        self.origin = None
+        self.size = None
+        self.shape = None
+        self.index = None
+        self.coords = []
+        self.discount = None
+        self.arrays = {}
+        self.level_sweeps = {}
+        self.store = None
+        self.range_index = None
+        self.cache.clear()
+        self.fp_raster.clear()
+        self.version += 1
+
+
+    @staticmethod
+    def axis_geometry(values, tol=1e-6):
+        '''
+        Detecta el origen, el tamaño de bloque y el número de bloques de un eje
+
+        Argumentos:
+            values (np.ndarray): coordenadas de los bloques en el eje
+            tol (float): tolerancia relativa al tamaño de bloque
+
+        Retorna:
+            tuple: origen, tamaño de bloque y número de bloques
+        '''
+
+        # Coordenadas distintas del eje:
+        levels = np.unique(values)
+        if len(levels) == 1:
+            return levels[0], 1.0, 1
+
+        # El tamaño de bloque es la menor distancia entre coordenadas:
+        size = np.diff(levels).min()
+
+        # Comprobar que todas las coordenadas caigan sobre la grilla:
+        position = (levels - levels[0]) / size
+        if not np.allclose(position, np.round(position), rtol=0, atol=tol):
+            raise ValueError('Las coordenadas no forman una grilla regular')
+
+        return levels[0], size, int(round(position[-1])) + 1
+
+
+    def build(self):
+        '''Construye la grilla a partir de las variables espaciales'''
+
+        self.clear()
+
+        # Coordenadas de cada bloque:
+        values = [
+            self.data[self.names[axis]].values.astype(float)
+            for axis in ['x', 'y', 'z']
+        ]
+
+        # Detectar la geometría de cada eje:
+        origin, size, shape = zip(*[self.axis_geometry(v) for v in values])
+
+        # Calcular los índices de cada bloque:
+        index = np.column_stack([
+            np.round((v - o) / s).astype(np.int32)
+            for v, o, s in zip(values, origin, size)
+        ])
+
+        # Comprobar que no existan bloques repetidos:
+        flat = np.ravel_multi_index(index.T, shape)
+        if len(np.unique(flat)) != len(flat):
+            raise ValueError('El modelo contiene bloques repetidos')
+
+        # Coordenada de cada índice (se conservan los valores originales para
+        # que las comparaciones con el modelo de bloques sean exactas):
+        coords = []
+        for axis in range(3):
+            lookup = origin[axis] + size[axis] * np.arange(shape[axis])
+            lookup[index[:, axis]] = values[axis]
+            coords.append(lookup)
+
+        self.origin = np.array(origin)
+        self.size = np.array(size)
+        self.shape = tuple(shape)
+        self.index = index
+        self.coords = coords
+
+        # Factores de descuento compartidos por el barrido, el footprint y
+        # la envolvente:
+        self.discount = DiscountTable(origin[2], size[2], shape[2])
+
+
+    def attach(self, store):
+        '''
+        Usa una grilla fuera de memoria en vez de los datos del DataFrame
+
+        Argumentos:
+            store (TiledGrid): grilla con las variables en disco
+        '''
+        self.clear()
+        self.store = store
+        self.origin = store.origin
+        self.size = store.size
+        self.shape = store.shape
+        self.coords = store.coords
+        self.discount = DiscountTable(
+            store.origin[2], store.size[2], store.shape[2]
+        )
+
+
+    def levels(self):
+        '''
+        Devuelve las cotas de los niveles que contienen bloques
+
+        Retorna:
+            np.ndarray: cotas de los niveles del modelo
+        '''
+        if self.store is not None:
+            return self.coords[2][self.store.levels]
+
+        return self.data[self.names['z']].unique()
+
+
+    def column(self):
+        '''
+        Devuelve el identificador de la columna (i, j) de cada bloque
+
+        Retorna:
+            np.ndarray: identificador de columna de cada bloque
+        '''
+        return self.index[:, 0].astype(np.int64) * self.shape[1] + self.index[:, 1]
+
+
+    def column_index(self, column):
+        '''
+        Devuelve los índices (i, j) de una serie de columnas
+
+        Argumentos:
+            column (np.ndarray): identificadores de columna
+
+        Retorna:
+            tuple: índices i y j de cada columna
+        '''
+        return np.divmod(column, self.shape[1])
+
+
+    def coordinates(self, axis, index):
+        '''
+        Devuelve las coordenadas correspondientes a una serie de índices
+
+        Argumentos:
+            axis (int): eje de la grilla (0 = X, 1 = Y, 2 = Z)
+            index (np.ndarray): índices de la grilla en el eje
+
+        Retorna:
+            np.ndarray: coordenadas de cada índice
+        '''
+        return self.coords[axis][index]
+
+
+    def locate(self, axis, values):
+        '''
+        Devuelve los índices de la grilla correspondientes a una serie de
+        coordenadas
+
+        Argumentos:
+            axis (int): eje de la grilla (0 = X, 1 = Y, 2 = Z)
+            values (np.ndarray): coordenadas en el eje
+
+        Retorna:
+            np.ndarray: índice de la grilla de cada coordenada
+        '''
+        position = (np.asarray(values) - self.origin[axis]) / self.size[axis]
+        return np.round(position).astype(np.int64)
+
+
+    def mask(self):
+        '''
+        Devuelve un arreglo 3D que indica las posiciones con bloques
+
+        Retorna:
+            np.ndarray: arreglo booleano de dimensión shape
+        '''
+        if self.store is not None:
+            return self.store.array('mask')
+
+        mask = np.zeros(self.shape, dtype=bool)
+        mask[tuple(self.index.T)] = True
+        return mask
+
+
+    def array(self, name):
+        '''
+        Devuelve el arreglo 3D de una variable numérica. Las posiciones sin
+        bloque quedan con NaN. Los arreglos se construyen la primera vez que se
+        solicitan y se reutilizan mientras no cambie la grilla (fuera de
+        memoria se devuelve el arreglo en disco).
+
+        Argumentos:
+            name (str): nombre de la variable
+
+        Retorna:
+            np.ndarray: arreglo de dimensión shape
+        '''
+        if self.store is not None:
+            return self.store.array(name)
+
+        if name not in self.arrays:
+            array = np.full(self.shape, np.nan)
+            array[tuple(self.index.T)] = self.data[name].values
+            self.arrays[name] = array
+
+        return self.arrays[name]
+
+
+    def block_index(self):
+        '''
+        Devuelve el índice de consultas por rango del modelo. Se construye la
+        primera vez que se solicita y se reutiliza mientras no cambie la
+        grilla.
+
+        Retorna:
+            BlockIndex: índice de consultas por rango
+        '''
+        if self.range_index is None:
+            self.range_index = BlockIndex(self)
+
+        return self.range_index
+
+
+    def sweep(self, profit='profit'):
+        '''
+        Devuelve el motor de barrido de cotas con las columnas de la grilla
+
+        Argumentos:
+            profit (str): nombre de la columna de beneficio
+
+        Retorna:
+            LevelSweep: motor de barrido de cotas
+        '''
+        if profit not in self.level_sweeps:
+            self.level_sweeps[profit] = LevelSweep(
+                self.column(),
+                self.data[self.names['z']].values,
+                self.data[profit].values,
+                offset=self.index[:, 2],
+                table=self.discount
+            )
+
+        return self.level_sweeps[profit]
+
+
+    def sweeps(self, profit='profit'):
+        '''
+        Recorre los motores de barrido del modelo: uno solo con el modelo en
+        memoria o uno por tile con la grilla fuera de memoria. Los resultados
+        por columna se pueden concatenar y los totales por cota sumar.
+
+        Argumentos:
+            profit (str): nombre de la columna de beneficio
+
+        Retorna (en cada tramo):
+            LevelSweep: motor de barrido de las columnas del tramo
+        '''
+        if self.store is not None:
+            yield from self.store.sweeps(profit, self.discount)
+        else:
+            yield self.sweep(profit)
+
+
+    def cache_key(self, profit, height, discount, rate):
+        '''Clave de caché de los máximos por columna de una cota'''
+        return (self.version, profit, float(height), discount, rate)
+
+
+    def is_cached(self, profit, heights, discount, rate):
+        '''
+        Indica si los máximos por columna de todas las cotas están en caché
+
+        Argumentos:
+            profit (str): nombre de la columna de beneficio
+            heights (list): lista de cotas de extracción
+            discount (float): tasa de descuento
+            rate (float): tasa de extracción anual en m/año
+
+        Retorna:
+            bool: True si no es necesario recorrer el modelo
+        '''
+        return all(
+            self.cache_key(profit, h, discount, rate) in self.cache
+            for h in heights
+        )
+
+
+    def column_values(self, profit, heights, discount, rate):
+        '''
+        Devuelve el máximo valor acumulado de cada columna para cada cota. Los
+        resultados se guardan en caché según (versión del modelo, beneficio,
+        cota, descuento, tasa), de modo que un cambio en el costo de
+        inversión solo requiere comparar y sumar arreglos ya calculados.
+
+        Argumentos:
+            profit (str): nombre de la columna de beneficio
+            heights (list): lista de cotas de extracción
+            discount (float): tasa de descuento
+            rate (float): tasa de extracción anual en m/año
+
+        Retorna:
+            list: columnas y máximo acumulado de cada columna para cada cota
+        '''
+
+        # Recuperar las cotas ya calculadas:
+        found = {}
+        for h in heights:
+            entry = self.cache.get(self.cache_key(profit, h, discount, rate))
+            if entry is not None:
+                found[float(h)] = entry
+
+        # Calcular las cotas restantes en una sola pasada:
+        missing = np.unique([float(h) for h in heights if float(h) not in found])
+        if len(missing):
+            parts = [
+                sweep.column_values(missing, discount, rate)
+                for sweep in self.sweeps(profit)
+            ]
+            level, column, value = (np.concatenate(p) for p in zip(*parts))
+
+            # Separar los resultados de cada cota:
+            order = np.argsort(level, kind='stable')
+            bounds = np.searchsorted(level[order], np.arange(len(missing) + 1))
+            for n, h in enumerate(missing):
+                sel = order[bounds[n]:bounds[n + 1]]
+                found[h] = (column[sel], value[sel])
+                self.cache.put(
+                    self.cache_key(profit, h, discount, rate), found[h]
+                )
+
+        return [found[float(h)] for h in heights]
@@ -1,4 +1,8 @@
 import numpy as np
+import pandas as pd
+
+from model import kernels
+from model.parallel import ParallelSweep
 
 
 class HeightModel:
@@ -8,11 +12,49 @@ class HeightModel:
     Atributos:
         data (pd.DataFrame): datos del modelo de bloques
         names (dict): nombres de las variables espaciales
+        grid (GridModel): representación del modelo en una grilla regular
+        parallel (ParallelSweep): barrido en paralelo del modelo actual
     '''
 
-    def __init__(self, data, names):
+    def __init__(self, data, names, grid):
         self.data = data
         self.names = names
+        self.grid = grid
+        self.parallel = None
+
+
+    def backends(self):
+        '''
+        Devuelve los motores de cálculo disponibles y el activo
+
+        Retorna:
+            tuple: lista de motores disponibles y nombre del motor activo
+        '''
+        return list(kernels.BACKENDS), kernels.active_backend()
+
+
+    def set_backend(self, name):
+        '''
+        Selecciona el motor de cálculo de los núcleos (barrido de columnas y
+        cono flotante)
+
+        Argumentos:
+            name (str): 'numpy', 'numba' o 'auto'
+
+        Retorna:
+            str: motor de cálculo activo
+        '''
+        return kernels.set_backend(name)
+
+
+    def levels(self):
+        '''
+        Devuelve las cotas candidatas de extracción (niveles con bloques)
+
+        Retorna:
+            np.ndarray: cotas del modelo de bloques
+        '''
+        return self.grid.levels()
 
 
     def economic_value(self):
@@ -34,51 +76,193 @@ class HeightModel:
             float: valor económico del piso
         '''
 
-        # Nombre de las variables espaciales:
-        xname = self.names['x']
-        yname = self.names['y']
-        zname = self.names['z']
+        # Reutilizar el barrido de cotas (y su caché) para una sola cota:
+        return self.value_by_height([height], discount, rate, inv_cost)[0]
 
-        # filtrar modelo de bloques y ordenar valor Z:
-        model = self.data[self.data[zname] >= height].copy()
-        model = model.sort_values(by=zname, ascending=True)
 
-        # Calcular la altura del bloque:
-        dz = model[zname] - height
+    def value_by_height(self, heights, discount, rate, inv_cost, mode='serial'):
+        '''
+        Calcula el valor económico del piso para una serie de cotas
 
-        # Actualizar el valor de cada bloque:
-        model['discounted'] = model['profit'] / (1 + discount) ** (dz / rate)
+        Argumentos:
+            heights (list): lista de cotas de extracción
+            discount (float): tasa de descuento
+            rate (float): tasa de extracción anual en m/año
+            inv_cost (float): costo de inversión del PE
+            mode (str): 'serial' para un solo núcleo o 'parallel' para
+                repartir las columnas entre varios procesos
 
-        # Calcular el valor acumulado en cada columna:
-        model['cumulative'] = model.groupby([xname, yname])['discounted'].cumsum()
+        Retorna:
+            list: lista con el valor económico del piso para cada cota
+        '''
+
+        # Máximos por columna de cada cota (calculados o en caché). Si solo
+        # cambia el costo de inversión basta con comparar y sumar:
+        # (la grilla fuera de memoria se recorre por tiles en este proceso):
+        if mode != 'parallel' or self.grid.store is not None or \
+                self.grid.is_cached('profit', heights, discount, rate):
+            columns = self.grid.column_values('profit', heights, discount, rate)
+            return [value[value > inv_cost].sum() for _, value in columns]
 
-        # Obtener el máximo de cada columna:
-        max_values = model.groupby([xname, yname])['cumulative'].max()
+        # Columnas de la grilla ordenadas una única vez por modelo:
+        sweep = self.grid.sweep('profit')
 
-        # Sumar aquellos bloques que pagan la inversión del PE:
-        return max_values[max_values > inv_cost].sum()
-    
+        # Publicar el modelo en memoria compartida solo si cambió:
+        if self.parallel is None or self.parallel.sweep is not sweep:
+            if self.parallel is not None:
+                self.parallel.close()
+            self.parallel = ParallelSweep(sweep)
 
-    def value_by_height(self, heights, discount, rate, inv_cost):
+        return self.parallel.values(heights, discount, rate, inv_cost)
+            
+
+    def search_optimum(self, heights, discount, rate, inv_cost, stride=None,
+                       tol=0.01):
         '''
-        Calcula el valor económico del piso para una serie de cotas
+        Busca la cota óptima sin evaluar todas las cotas. Primero hace un
+        barrido grueso, en el que los bloques de cada columna se reagrupan
+        por intervalo entre cotas espaciadas, para obtener el valor de esas
+        cotas y una cota superior del valor de las cotas intermedias. Luego
+        evalúa a resolución completa solo las cotas de los intervalos que
+        podrían superar al mejor candidato en más de la tolerancia, usando
+        únicamente los bloques de esos intervalos.
 
         Argumentos:
             heights (list): lista de cotas de extracción
             discount (float): tasa de descuento
             rate (float): tasa de extracción anual en m/año
             inv_cost (float): costo de inversión del PE
+            stride (int): separación entre las cotas del barrido grueso (por
+                defecto, la raíz del número de cotas)
+            tol (float): diferencia relativa admitida respecto al óptimo
+                de la búsqueda exhaustiva
 
         Retorna:
-            list: lista con el valor económico del piso para cada cota
+            tuple: cota óptima, su valor, cotas evaluadas, sus valores y la
+                máxima diferencia posible respecto al óptimo exhaustivo
         '''
 
-        values = []
-        for z in heights:
-            values.append(self.floor_value(z, discount, rate, inv_cost))
-        
-        return values
-            
+        # Cotas candidatas ordenadas de menor a mayor:
+        levels = np.unique(np.asarray(heights, dtype=float))
+        n = len(levels)
+        stride = stride or max(1, int(np.sqrt(n)))
+
+        # 1. Barrido grueso en las cotas espaciadas (incluidos los extremos).
+        # Los valores y cotas superiores de cada tramo del modelo se suman:
+        index = np.unique(np.r_[np.arange(0, n, stride), n - 1])
+        values = np.zeros(len(index))
+        upper = np.zeros(len(index) - 1)
+        for sweep in self.grid.sweeps('profit'):
+            totals, bounds = sweep.coarse_totals(
+                levels[index], discount, rate, inv_cost
+            )
+            values += totals
+            upper += bounds
+
+        # 2. Intervalos que podrían contener un valor mayor:
+        gaps = np.flatnonzero(np.diff(index) > 1)
+        best_value = values.max()
+        refine = upper[gaps] > best_value + tol * abs(best_value)
+
+        # 3. Evaluar a resolución completa las cotas de esos intervalos:
+        inner = [np.arange(index[g] + 1, index[g + 1]) for g in gaps[refine]]
+        if inner:
+            inner = np.concatenate(inner)
+            refined = np.zeros(len(inner))
+            for sweep in self.grid.sweeps('profit'):
+                refined += sweep.refine_totals(
+                    levels[index], levels[inner], discount, rate, inv_cost
+                )
+            index = np.r_[index, inner]
+            values = np.r_[values, refined]
+
+        # Máxima diferencia posible en los intervalos no evaluados:
+        closed = gaps[~refine]
+        bound = 0.0
+        if len(closed):
+            bound = max(upper[closed].max() - values.max(), 0.0)
+
+        # Resultados en orden de cota:
+        order = np.argsort(index)
+        index, values = index[order], values[order].tolist()
+        opt_height, opt_value = self.find_optimum(levels[index], values)
+
+        return opt_height, opt_value, levels[index], values, bound
+
+
+    def sensitivity(self, heights, discounts, rates, inv_costs):
+        '''
+        Evalúa el valor económico del piso para la grilla completa de casos de
+        sensibilidad (descuento x tasa de extracción x costo de inversión)
+
+        Argumentos:
+            heights (list): lista de cotas de extracción
+            discounts (list): tasas de descuento
+            rates (list): tasas de extracción anual en m/año
+            inv_costs (list): costos de inversión del PE
+
+        Retorna:
+            pd.DataFrame: valor del piso con un caso por fila (índice
+                discount, rate, inv_cost) y una cota por columna
+        '''
+
+        # Ordenar las cotas de menor a mayor:
+        levels = np.unique(np.asarray(heights, dtype=float))
+
+        # Evaluar todos los casos compartiendo el orden de las columnas (los
+        # valores de cada tramo del modelo se suman):
+        cube = sum(
+            sweep.sensitivity(levels, discounts, rates, inv_costs)
+            for sweep in self.grid.sweeps('profit')
+        )
+
+        # Etiquetar el resultado:
+        index = pd.MultiIndex.from_product(
+            [discounts, rates, inv_costs],
+            names=['discount', 'rate', 'inv_cost']
+        )
+        columns = pd.Index(levels, name='height')
+
+        return pd.DataFrame(cube.reshape(len(index), -1), index=index,
+                            columns=columns)
+
+
+    def optimum_surface(self, cube):
+        '''
+        Encuentra la cota óptima y su valor para cada caso de sensibilidad
+
+        Argumentos:
+            cube (pd.DataFrame): resultado de HeightModel.sensitivity
+
+        Retorna:
+            pd.DataFrame: cota óptima (height) y valor (value) de cada caso
+        '''
+        return pd.DataFrame({
+            'height': cube.idxmax(axis=1),
+            'value': cube.max(axis=1)
+        })
+
+
+    def best_levels(self, heights, discount, rate, inv_cost, count,
+                    mode='serial'):
+        '''
+        Devuelve las cotas de mayor valor económico del piso
+
+        Argumentos:
+            heights (list): lista de cotas de extracción
+            discount (float): tasa de descuento
+            rate (float): tasa de extracción anual en m/año
+            inv_cost (float): costo de inversión del PE
+            count (int): número de cotas a devolver
+            mode (str): modo de cálculo de value_by_height
+
+        Retorna:
+            list: cotas ordenadas de mayor a menor valor económico
+        '''
+        values = self.value_by_height(heights, discount, rate, inv_cost, mode)
+        ranking = pd.Series(values, index=heights).nlargest(int(count))
+        return ranking.index.tolist()
+
 
     def find_optimum(self, heights, values):
         '''
@@ -0,0 +1,289 @@
+import numpy as np
+
+
+class BlockIndex:
+    '''
+    Índice de consultas por rango del modelo de bloques. Ordena los bloques
+    una sola vez por nivel k y, dentro de cada nivel, por fila i y columna j,
+    y guarda el tramo de cada nivel y su caja XY (índices mínimos y máximos).
+    Una consulta por caja recorre solo los niveles que cortan el rango Z,
+    descarta los niveles cuya caja XY no corta el rango y, dentro de cada
+    nivel, ubica las filas i por búsqueda binaria, por lo que su costo es
+    O(log n + k) y cada tramo se obtiene como vista de los arreglos ordenados.
+
+    Argumentos:
+        grid (GridModel): grilla del modelo de bloques
+
+    Atributos:
+        order (np.ndarray): posición en el modelo de cada bloque ordenado
+        i, j, k (np.ndarray): índices de la grilla de los bloques ordenados
+        bounds (np.ndarray): primer bloque de cada nivel (y el total al final)
+        boxes (np.ndarray): índices i y j mínimos y máximos de cada nivel,
+            dimensión (nz, 4)
+        columns (dict): variables ya ordenadas según el índice
+    '''
+
+    def __init__(self, grid):
+        self.grid = grid
+        self.columns = {}
+
+        # Ordenar los bloques por nivel, fila y columna:
+        i, j, k = grid.index.T
+        self.order = np.lexsort((j, i, k))
+        self.i, self.j, self.k = i[self.order], j[self.order], k[self.order]
+
+        # Tramo de cada nivel:
+        nz = grid.shape[2]
+        self.bounds = np.searchsorted(self.k, np.arange(nz + 1))
+
+        # Caja XY de cada nivel (vacía en los niveles sin bloques):
+        self.boxes = np.empty((nz, 4), dtype=np.int64)
+        self.boxes[:] = [grid.shape[0], -1, grid.shape[1], -1]
+        filled = np.flatnonzero(np.diff(self.bounds) > 0)
+        if len(filled):
+            starts = self.bounds[filled]
+            self.boxes[filled, 0] = np.minimum.reduceat(self.i, starts)
+            self.boxes[filled, 1] = np.maximum.reduceat(self.i, starts)
+            self.boxes[filled, 2] = np.minimum.reduceat(self.j, starts)
+            self.boxes[filled, 3] = np.maximum.reduceat(self.j, starts)
+
+
+    def column(self, name):
+        '''
+        Devuelve una variable del modelo ordenada según el índice. Se ordena
+        la primera vez que se consulta y luego se reutiliza.
+
+        Argumentos:
+            name (str): nombre de la variable
+
+        Retorna:
+            np.ndarray: valores de la variable en el orden del índice
+        '''
+        if name not in self.columns:
+            self.columns[name] = self.grid.data[name].values[self.order]
+
+        return self.columns[name]
+
+
+    def index_range(self, axis, vrange):
+        '''
+        Convierte un rango de coordenadas en un rango de índices de la grilla
+
+        Argumentos:
+            axis (int): eje de la grilla (0 = X, 1 = Y, 2 = Z)
+            vrange (tuple): coordenadas mínima y máxima
+
+        Retorna:
+            tuple: primer índice y último índice (incluido) del rango
+        '''
+        coords = self.grid.coords[axis]
+        first = int(np.searchsorted(coords, vrange[0], side='left'))
+        last = int(np.searchsorted(coords, vrange[1], side='right')) - 1
+        return first, last
+
+
+    def grid_box(self, xrange, yrange, zrange):
+        '''
+        Convierte una caja de coordenadas en una caja de índices de la grilla
+
+        Argumentos:
+            xrange, yrange, zrange (tuple): rangos de las coordenadas
+
+        Retorna:
+            list: primer y último índice (incluido) en cada eje
+        '''
+        return [
+            self.index_range(axis, vrange)
+            for axis, vrange in enumerate([xrange, yrange, zrange])
+        ]
+
+
+    def segments(self, box):
+        '''
+        Devuelve los tramos del índice que pueden contener bloques de una caja
+
+        Argumentos:
+            box (list): caja de índices de la grilla (ver grid_box)
+
+        Retorna:
+            list: tramos (slice) de los arreglos ordenados; dentro de cada
+                tramo los bloques cumplen los rangos X y Z, pero aún se debe
+                comprobar el rango Y
+        '''
+        (i0, i1), (j0, j1), (k0, k1) = box
+        segments = []
+
+        for level in range(max(k0, 0), min(k1, self.grid.shape[2] - 1) + 1):
+
+            # Descartar los niveles cuya caja XY no corta la consulta:
+            imin, imax, jmin, jmax = self.boxes[level]
+            if imin > i1 or imax < i0 or jmin > j1 or jmax < j0:
+                continue
+
+            # Filas i del rango dentro del nivel (ordenadas):
+            a, b = self.bounds[level], self.bounds[level + 1]
+            start = a + np.searchsorted(self.i[a:b], i0, side='left')
+            stop = a + np.searchsorted(self.i[a:b], i1, side='right')
+            if start < stop:
+                segments.append(slice(start, stop))
+
+        return segments
+
+
+    def rows(self, values, box, accept):
+        '''
+        Devuelve los bloques de una caja de índices cuya variable cumple una
+        condición. La condición se evalúa solo en los bloques candidatos.
+
+        Argumentos:
+            values (np.ndarray): variable en el orden del índice
+            box (list): caja de índices de la grilla (ver grid_box)
+            accept (function): recibe los valores de un tramo y devuelve la
+                máscara de los bloques aceptados
+
+        Retorna:
+            np.ndarray: posiciones de los bloques en el orden del índice
+        '''
+        j0, j1 = box[1]
+        parts = []
+
+        for segment in self.segments(box):
+
+            # Comprobar el rango Y y el de la variable en el tramo (vista):
+            j = self.j[segment]
+            keep = (j >= j0) & (j <= j1) & accept(values[segment])
+            parts.append(segment.start + np.flatnonzero(keep))
+
+        if not parts:
+            return np.array([], dtype=np.int64)
+
+        return np.concatenate(parts)
+
+
+    def blocks(self, vname, rows):
+        '''
+        Devuelve las coordenadas y la variable de un conjunto de bloques
+
+        Argumentos:
+            vname (str): nombre de la variable
+            rows (np.ndarray): posiciones de los bloques en el orden del índice
+
+        Retorna:
+            dict: coordenadas X, Y, Z y valor de la variable de cada bloque
+        '''
+        return {
+            'x': self.grid.coords[0][self.i[rows]],
+            'y': self.grid.coords[1][self.j[rows]],
+            'z': self.grid.coords[2][self.k[rows]],
+            vname: self.column(vname)[rows]
+        }
+
+
+    def select(self, vname, vrange, xrange, yrange, zrange):
+        '''
+        Devuelve las posiciones de los bloques dentro de una caja con la
+        variable en un rango
+
+        Argumentos:
+            vname (str): nombre de la variable
+            vrange, xrange, yrange, zrange (tuple): rangos de la variable y
+                de las coordenadas
+
+        Retorna:
+            np.ndarray: posiciones de los bloques en el orden del índice
+        '''
+        return self.rows(
+            self.column(vname),
+            self.grid_box(xrange, yrange, zrange),
+            lambda v: (v >= vrange[0]) & (v <= vrange[1])
+        )
+
+
+    def query(self, vname, vrange, xrange, yrange, zrange):
+        '''
+        Devuelve los bloques dentro de una caja con la variable en un rango.
+        El filtro de la variable se aplica solo a los bloques candidatos.
+
+        Argumentos:
+            vname (str): nombre de la variable
+            vrange, xrange, yrange, zrange (tuple): rangos de la variable y
+                de las coordenadas
+
+        Retorna:
+            dict: coordenadas X, Y, Z y valor de la variable de cada bloque
+        '''
+        rows = self.select(vname, vrange, xrange, yrange, zrange)
+        return self.blocks(vname, rows)
+
+
+    def contains(self, rows, vname, vrange, xrange, yrange, zrange):
+        '''
+        Comprueba qué bloques de una selección siguen dentro de una caja
+
+        Argumentos:
+            rows (np.ndarray): posiciones de los bloques en el orden del índice
+            vname (str): nombre de la variable
+            vrange, xrange, yrange, zrange (tuple): rangos de la variable y
+                de las coordenadas
+
+        Retorna:
+            np.ndarray: máscara de los bloques que siguen dentro de la caja
+        '''
+        (i0, i1), (j0, j1), (k0, k1) = self.grid_box(xrange, yrange, zrange)
+        i, j, k = self.i[rows], self.j[rows], self.k[rows]
+        v = self.column(vname)[rows]
+
+        return (
+            (i >= i0) & (i <= i1) & (j >= j0) & (j <= j1) &
+            (k >= k0) & (k <= k1) & (v >= vrange[0]) & (v <= vrange[1])
+        )
+
+
+    def entering(self, vname, old, new):
+        '''
+        Devuelve los bloques que entran a la selección al pasar de una caja a
+        otra. La diferencia entre las cajas se divide en losas disjuntas: en
+        cada eje, la parte nueva del rango del eje (con los ejes anteriores
+        restringidos a la intersección de ambas cajas) y, por último, la
+        intersección de ambas cajas con la parte nueva del rango de la
+        variable. Solo se recorren los bloques de esas losas.
+
+        Argumentos:
+            vname (str): nombre de la variable
+            old, new (tuple): rangos de la variable y de las coordenadas X, Y
+                y Z de la caja anterior y de la nueva
+
+        Retorna:
+            np.ndarray: posiciones de los bloques en el orden del índice
+        '''
+        values = self.column(vname)
+        (ov0, ov1), obox = old[0], self.grid_box(*old[1:])
+        (nv0, nv1), nbox = new[0], self.grid_box(*new[1:])
+        common = [
+            (max(a0, b0), min(a1, b1)) for (a0, a1), (b0, b1) in zip(obox, nbox)
+        ]
+
+        def inside(v):
+            return (v >= nv0) & (v <= nv1)
+
+        def added(v):
+            return inside(v) & ~((v >= ov0) & (v <= ov1))
+
+        parts = []
+        for axis, ((n0, n1), (o0, o1)) in enumerate(zip(nbox, obox)):
+
+            # Partes del rango nuevo del eje fuera del rango anterior:
+            if o0 > o1:
+                pieces = [(n0, n1)]
+            else:
+                pieces = [(n0, min(n1, o0 - 1)), (max(n0, o1 + 1), n1)]
+
+            for piece in pieces:
+                if piece[0] <= piece[1]:
+                    box = common[:axis] + [piece] + nbox[axis + 1:]
+                    parts.append(self.rows(values, box, inside))
+
+        # Bloques de ambas cajas que entran por el rango de la variable:
+        parts.append(self.rows(values, common, added))
+
+        return np.concatenate(parts)
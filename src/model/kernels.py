@@ -0,0 +1,409 @@
+import importlib.util
+
+import numpy as np
+import pandas as pd
+
+# Bucles paralelos de los núcleos (range si numba no está instalado):
+try:
+    from numba import prange
+except ImportError:
+    prange = range
+
+
+# Motores de cálculo disponibles (numba solo si está instalado):
+BACKENDS = ['numpy']
+if importlib.util.find_spec('numba') is not None:
+    BACKENDS.append('numba')
+
+# Motor de cálculo activo y núcleos ya compilados con numba:
+_active = {'backend': BACKENDS[-1]}
+_compiled = {}
+
+
+def set_backend(name='auto'):
+    '''
+    Selecciona el motor de cálculo de los núcleos
+
+    Argumentos:
+        name (str): 'numpy', 'numba' o 'auto' (numba si está instalado)
+
+    Retorna:
+        str: motor de cálculo activo
+    '''
+    if name == 'auto':
+        name = BACKENDS[-1]
+
+    if name not in BACKENDS:
+        raise ValueError(f'Motor de cálculo no disponible: {name}')
+
+    _active['backend'] = name
+    return name
+
+
+def active_backend():
+    '''Devuelve el nombre del motor de cálculo activo'''
+    return _active['backend']
+
+
+def compiled(name):
+    '''
+    Compila un núcleo con numba la primera vez que se usa. La compilación se
+    guarda en disco, por lo que las sesiones siguientes la reutilizan.
+
+    Argumentos:
+        name (str): nombre de la función del núcleo en este módulo
+
+    Retorna:
+        function: núcleo compilado
+    '''
+    if name not in _compiled:
+        import numba
+
+        kernel = numba.njit(parallel=True, cache=True)(globals()[name])
+        _compiled[name] = kernel
+
+    return _compiled[name]
+
+
+def column_best(weight, start):
+    '''
+    Calcula el máximo valor acumulado de la columna si la extracción se
+    inicia en cada bloque (columnas de largo variable, ordenadas por cota)
+
+    Argumentos:
+        weight (np.ndarray): beneficio descontado de cada bloque
+        start (np.ndarray): indica si el bloque es el primero de su columna
+
+    Retorna:
+        np.ndarray: máximo valor acumulado desde cada bloque
+    '''
+    if _active['backend'] == 'numba':
+        return compiled('column_best_loop')(weight, start)
+
+    # Suma acumulada inversa de cada columna (desde el bloque hacia arriba):
+    groups = np.cumsum(start)[::-1]
+    suffix = pd.Series(weight[::-1]).groupby(groups).cumsum().values
+    lowest = pd.Series(suffix).groupby(groups).cummin().values
+    suffix = suffix[::-1]
+    lowest = lowest[::-1]
+
+    # Menor suma inversa por sobre cada bloque (cero al final de columna):
+    above = np.zeros(len(suffix))
+    above[:-1] = np.where(start[1:], 0.0, lowest[1:])
+
+    return suffix - np.minimum(above, 0.0)
+
+
+def cone_mining(bounds, eligible, i, j, k, lookup, si, sj, sk, profit,
+                alive=None):
+    '''
+    Extrae los conos del método del cono flotante. Recorre las cotas de menor
+    a mayor y, en cada vértice elegible aún disponible al inicio de la cota,
+    extrae el cono de bloques inferiores si su valor es positivo.
+
+    Argumentos:
+        bounds (np.ndarray): primer bloque de cada cota (y el total al final)
+        eligible (np.ndarray): bloques que pueden ser vértice de un cono
+        i, j, k (np.ndarray): índices de cada bloque en el arreglo lookup
+        lookup (np.ndarray): posición de cada bloque en la grilla (o -1)
+        si, sj, sk (np.ndarray): plantilla del cono
+        profit (np.ndarray): beneficio de cada bloque
+        alive (np.ndarray): bloques aún no extraídos; se actualiza en el
+            lugar, lo que permite procesar las cotas por partes
+
+    Retorna:
+        np.ndarray: bloques extraídos en el orden en que fueron agregados
+    '''
+    if alive is None:
+        alive = np.ones(len(profit), dtype=bool)
+
+    if _active['backend'] == 'numba':
+        return compiled('cone_mining_loop')(
+            bounds, eligible, i, j, k, lookup, si, sj, sk, profit, alive
+        )
+
+    nx, ny = lookup.shape[:2]
+    cones = []
+
+    for a, b in zip(bounds[:-1], bounds[1:]):
+
+        # Vértices disponibles al inicio de la cota:
+        apexes = a + np.flatnonzero(eligible[a:b] & alive[a:b])
+
+        for p in apexes:
+
+            # Posiciones del cono dentro de la grilla:
+            ti, tj, tk = i[p] + si, j[p] + sj, k[p] + sk
+            valid = (ti >= 0) & (ti < nx) & (tj >= 0) & (tj < ny) & (tk >= 0)
+
+            # Bloques del cono aún no extraídos:
+            cone = lookup[ti[valid], tj[valid], tk[valid]]
+            cone = np.sort(cone[cone >= 0])
+            cone = cone[alive[cone]]
+
+            # Continuar con el siguiente punto si el valor es negativo:
+            if np.sum(profit[cone]) <= 0:
+                continue
+
+            # Guardar los bloques del cono y quitarlos del modelo:
+            cones.append(cone)
+            alive[cone] = False
+
+    return np.concatenate(cones) if cones else np.array([], dtype=np.int64)
+
+
+def max_closure(cells, level, top, node, delta, dk, weight):
+    '''
+    Resuelve la clausura máxima de una grilla por flujo máximo. Con el motor
+    numpy el mismo bucle se ejecuta sin compilar, por lo que en modelos
+    grandes conviene el motor numba.
+
+    Argumentos:
+        cells (np.ndarray): posición (índice plano) de cada nodo en la grilla
+        level (np.ndarray): nivel k de cada nodo
+        top (int): número de niveles de la grilla
+        node (np.ndarray): nodo de cada posición de la grilla (o -1)
+        delta (np.ndarray): desplazamiento plano de cada arco de la plantilla
+        dk (np.ndarray): desplazamiento en k de cada arco de la plantilla
+        weight (np.ndarray): peso entero de cada nodo
+
+    Retorna:
+        np.ndarray: True para los nodos de la clausura máxima
+    '''
+    if _active['backend'] == 'numba':
+        return compiled('closure_loop')(
+            cells, level, top, node, delta, dk, weight
+        )
+
+    return closure_loop(cells, level, top, node, delta, dk, weight)
+
+
+# Núcleos compilados con numba. Se escriben como bucles explícitos y solo se
+# compilan si el motor activo es numba:
+
+
+def column_best_loop(weight, start):
+    '''Versión en bucles de column_best (una columna por hilo)'''
+    n = len(weight)
+    first = np.flatnonzero(start)
+    last = np.empty(len(first), dtype=np.int64)
+    last[:-1] = first[1:]
+    last[-1:] = n
+    best = np.empty(n)
+
+    for c in prange(len(first)):
+        suffix = 0.0
+        lowest = np.inf
+        for p in range(last[c] - 1, first[c] - 1, -1):
+            above = lowest if p < last[c] - 1 else 0.0
+            suffix += weight[p]
+            best[p] = suffix - min(above, 0.0)
+            lowest = min(lowest, suffix)
+
+    return best
+
+
+def cone_mining_loop(bounds, eligible, i, j, k, lookup, si, sj, sk, profit,
+                     alive):
+    '''Versión en bucles de cone_mining (el cono se evalúa en paralelo)'''
+    nx, ny = lookup.shape[0], lookup.shape[1]
+    n, size = len(profit), len(si)
+    mined = np.empty(n, dtype=np.int64)
+    slots = np.empty(size, dtype=np.int64)
+    count = 0
+
+    for level in range(len(bounds) - 1):
+
+        # Vértices disponibles al inicio de la cota:
+        apexes = np.empty(bounds[level + 1] - bounds[level], dtype=np.int64)
+        found = 0
+        for p in range(bounds[level], bounds[level + 1]):
+            if eligible[p] and alive[p]:
+                apexes[found] = p
+                found += 1
+
+        for a in range(found):
+            p = apexes[a]
+
+            # Bloques del cono aún no extraídos y su valor:
+            total = 0.0
+            for s in prange(size):
+                ti, tj, tk = i[p] + si[s], j[p] + sj[s], k[p] + sk[s]
+                q = -1
+                if 0 <= ti < nx and 0 <= tj < ny and tk >= 0:
+                    q = lookup[ti, tj, tk]
+                    if q >= 0 and not alive[q]:
+                        q = -1
+                slots[s] = q
+                if q >= 0:
+                    total += profit[q]
+
+            if total <= 0:
+                continue
+
+            # Guardar los bloques del cono y quitarlos del modelo:
+            cone = np.sort(slots[slots >= 0])
+            for q in cone:
+                alive[q] = False
+                mined[count] = q
+                count += 1
+
+    return mined[:count]
+
+
+def closure_loop(cells, level, top, node, delta, dk, weight):
+    '''
+    Versión en bucles de la clausura máxima (push-relabel FIFO con
+    reetiquetado global). Los arcos se generan con la plantilla al recorrer
+    cada nodo; el flujo de cada arco, el exceso y la capacidad hacia el
+    sumidero se guardan en arreglos int64.
+
+    Argumentos:
+        cells (np.ndarray): posición (índice plano) de cada nodo en la grilla
+        level (np.ndarray): nivel k de cada nodo
+        top (int): número de niveles de la grilla
+        node (np.ndarray): nodo de cada posición de la grilla (o -1)
+        delta (np.ndarray): desplazamiento plano de cada arco de la plantilla
+        dk (np.ndarray): desplazamiento en k de cada arco de la plantilla
+        weight (np.ndarray): peso entero de cada nodo
+
+    Retorna:
+        np.ndarray: True para los nodos de la clausura máxima
+    '''
+    n, S, size = len(cells), len(delta), len(node)
+    flow = np.zeros(n * S, dtype=np.int64)
+    excess = np.maximum(weight, 0)
+    sink = np.maximum(-weight, 0)
+    d = np.full(n, n, dtype=np.int64)
+    queue = np.empty(max(n, 1), dtype=np.int64)
+    active = np.empty(max(n, 1), dtype=np.int64)
+    head, count = 0, 0
+    relabels = n + 1
+
+    while True:
+
+        # Reetiquetado global: distancia de cada nodo al sumidero en la red
+        # residual (búsqueda en anchura hacia atrás desde el sumidero):
+        if relabels > n or count == 0:
+            d[:] = n
+            first, last = 0, 0
+            for v in range(n):
+                if sink[v] > 0:
+                    d[v] = 1
+                    queue[last] = v
+                    last += 1
+
+            while first < last:
+                u = queue[first]
+                first += 1
+                for s in range(S):
+
+                    # Arcos de precedencia v -> u (capacidad infinita):
+                    if level[u] - dk[s] < top:
+                        t = cells[u] - delta[s]
+                        if 0 <= t < size:
+                            v = node[t]
+                            if v >= 0 and d[v] == n:
+                                d[v] = d[u] + 1
+                                queue[last] = v
+                                last += 1
+
+                    # Arcos inversos v -> u de un flujo u -> v:
+                    if level[u] + dk[s] >= 0:
+                        t = cells[u] + delta[s]
+                        if 0 <= t < size:
+                            v = node[t]
+                            if v >= 0 and d[v] == n and flow[u * S + s] > 0:
+                                d[v] = d[u] + 1
+                                queue[last] = v
+                                last += 1
+
+            # Nodos activos que aún alcanzan el sumidero:
+            head, count = 0, 0
+            for v in range(n):
+                if excess[v] > 0 and d[v] < n:
+                    active[count] = v
+                    count += 1
+            relabels = 0
+
+            if count == 0:
+                break
+
+        v = active[head]
+        head = (head + 1) % n
+        count -= 1
+        if d[v] >= n:
+            continue
+
+        while excess[v] > 0:
+
+            # Empujar hacia el sumidero:
+            if d[v] == 1 and sink[v] > 0:
+                amount = min(excess[v], sink[v])
+                sink[v] -= amount
+                excess[v] -= amount
+                continue
+
+            pushed = False
+            lowest = n
+
+            # Empujar por los arcos de precedencia (capacidad infinita):
+            for s in range(S):
+                if level[v] + dk[s] < 0:
+                    continue
+                t = cells[v] + delta[s]
+                if t < 0 or t >= size or node[t] < 0:
+                    continue
+                u = node[t]
+                if d[u] == d[v] - 1:
+                    flow[v * S + s] += excess[v]
+                    if excess[u] == 0:
+                        active[(head + count) % n] = u
+                        count += 1
+                    excess[u] += excess[v]
+                    excess[v] = 0
+                    pushed = True
+                    break
+                lowest = min(lowest, d[u])
+
+            if pushed:
+                break
+
+            # Devolver flujo por los arcos inversos:
+            for s in range(S):
+                if level[v] - dk[s] >= top:
+                    continue
+                t = cells[v] - delta[s]
+                if t < 0 or t >= size or node[t] < 0:
+                    continue
+                p = node[t]
+                cap = flow[p * S + s]
+                if cap <= 0:
+                    continue
+                if d[p] == d[v] - 1:
+                    amount = min(excess[v], cap)
+                    flow[p * S + s] -= amount
+                    if excess[p] == 0:
+                        active[(head + count) % n] = p
+                        count += 1
+                    excess[p] += amount
+                    excess[v] -= amount
+                    pushed = True
+                    if excess[v] == 0:
+                        break
+                else:
+                    lowest = min(lowest, d[p])
+
+            if pushed:
+                continue
+
+            # Reetiquetar el nodo:
+            if sink[v] > 0:
+                lowest = 0
+            d[v] = min(lowest + 1, n)
+            relabels += 1
+            if d[v] >= n:
+                break
+
+    # La clausura son los nodos que no alcanzan el sumidero:
+    return d >= n
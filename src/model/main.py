@@ -1,10 +1,8 @@
 # Trabajo con arreglos de datos:
 import pandas as pd
 
-# Trabajo con arreglos numéricos:
-import numpy as np
-
 # Modelos de cada menú de la aplicación:
+from model.grid import GridModel
 from model.block import BlockModel
 from model.height import HeightModel
 from model.footprint import FootprintModel
@@ -18,15 +16,17 @@ class MainModel:
         # Inicializar variables de la aplicación:
         self.data = pd.DataFrame()
         self.names = {}
-        self.fp_x = np.array([])
-        self.fp_y = np.array([])
+        self.grid = GridModel(self.data, self.names)
+
+        # El footprint se descarta junto con la grilla:
+        self.fp_raster = self.grid.fp_raster
 
         # Inicializar modelos de cada menú:
-        self.block = BlockModel(self.data, self.names)
-        self.height = HeightModel(self.data, self.names)
+        self.block = BlockModel(self.data, self.names, self.grid)
+        self.height = HeightModel(self.data, self.names, self.grid)
         self.footprint = FootprintModel(
-            self.data, self.names, self.fp_x, self.fp_y
+            self.data, self.names, self.grid, self.fp_raster
         )
         self.envelope = EnvelopeModel(
-            self.data, self.names, self.fp_x, self.fp_y
+            self.data, self.names, self.grid, self.fp_raster
         )
@@ -0,0 +1,228 @@
+import multiprocessing
+import os
+import weakref
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing import shared_memory
+
+import numpy as np
+
+from model import kernels
+from model.discount import DiscountTable
+from model.sweep import LevelSweep
+
+
+# Bloques de memoria compartida ya abiertos en cada proceso de trabajo:
+_attached = {}
+
+
+class SharedArrays:
+    '''
+    Publica un conjunto de arreglos NumPy en memoria compartida para que los
+    procesos de trabajo los lean sin volver a serializarlos en cada tarea
+
+    Argumentos:
+        arrays (dict): arreglos a publicar, indexados por nombre
+
+    Atributos:
+        specs (dict): nombre del bloque, dimensión y tipo de cada arreglo
+        blocks (list): bloques de memoria compartida creados
+    '''
+
+    def __init__(self, arrays):
+        self.specs = {}
+        self.blocks = []
+
+        for name, array in arrays.items():
+
+            # Copiar el arreglo a un bloque de memoria compartida:
+            array = np.ascontiguousarray(array)
+            block = shared_memory.SharedMemory(
+                create=True, size=max(array.nbytes, 1)
+            )
+            shared = np.ndarray(array.shape, array.dtype, buffer=block.buf)
+            shared[:] = array
+
+            self.blocks.append(block)
+            self.specs[name] = (block.name, array.shape, array.dtype.str)
+
+        # Liberar la memoria aunque no se llame a close():
+        self._finalizer = weakref.finalize(self, SharedArrays.release, self.blocks)
+
+
+    @staticmethod
+    def release(blocks):
+        '''Cierra y elimina los bloques de memoria compartida'''
+        for block in blocks:
+            block.close()
+            block.unlink()
+        blocks.clear()
+
+
+    def close(self):
+        '''Libera la memoria compartida'''
+        self._finalizer()
+
+
+    @staticmethod
+    def attach(specs):
+        '''
+        Abre los arreglos publicados desde un proceso de trabajo
+
+        Argumentos:
+            specs (dict): nombre del bloque, dimensión y tipo de cada arreglo
+
+        Retorna:
+            dict: arreglos de solo lectura indexados por nombre
+        '''
+        arrays = {}
+        for name, (block_name, shape, dtype) in specs.items():
+
+            # Reutilizar el bloque si ya fue abierto por este proceso:
+            if block_name not in _attached:
+                _attached[block_name] = shared_memory.SharedMemory(name=block_name)
+
+            array = np.ndarray(shape, dtype, buffer=_attached[block_name].buf)
+            array.flags.writeable = False
+            arrays[name] = array
+
+        return arrays
+
+
+def sweep_chunk(specs, table, backend, start, stop, levels, discount, rate,
+                inv_cost):
+    '''
+    Tarea de un proceso de trabajo: evalúa las cotas sobre un tramo de
+    columnas completas del motor de barrido publicado en memoria compartida
+
+    Argumentos:
+        specs (dict): especificación de los arreglos compartidos
+        table (tuple): origen, altura de bloque y niveles de la tabla de
+            descuento (None si el barrido no usa tabla)
+        backend (str): motor de cálculo de los núcleos
+        start, stop (int): primer y último bloque (excluido) del tramo
+        levels (np.ndarray): cotas de extracción ordenadas de menor a mayor
+        discount (float): tasa de descuento
+        rate (float): tasa de extracción anual en m/año
+        inv_cost (float): costo de inversión del PE
+
+    Retorna:
+        np.ndarray: valor del tramo para cada cota
+    '''
+    kernels.set_backend(backend)
+    arrays = SharedArrays.attach(specs)
+    offset = arrays['offset'][start:stop] if 'offset' in arrays else None
+    sweep = LevelSweep(
+        arrays['column'][start:stop],
+        arrays['z'][start:stop],
+        arrays['profit'][start:stop],
+        offset=offset,
+        table=DiscountTable(*table) if table else None,
+        ordered=True
+    )
+    return sweep.level_totals(levels, discount, rate, inv_cost)
+
+
+class ParallelSweep:
+    '''
+    Barrido de cotas en paralelo. Reparte las columnas del modelo entre un
+    conjunto de procesos; los arreglos del motor de barrido se publican una
+    sola vez en memoria compartida y se reutilizan en cada cálculo.
+
+    Argumentos:
+        sweep (LevelSweep): motor de barrido con las columnas ordenadas
+        workers (int): número de procesos (por defecto, todos los núcleos)
+
+    Atributos:
+        sweep (LevelSweep): motor de barrido publicado
+        workers (int): número de procesos
+        shared (SharedArrays): arreglos publicados en memoria compartida
+        chunks (list): primer y último bloque de cada tramo de columnas
+    '''
+
+    def __init__(self, sweep, workers=None):
+        self.sweep = sweep
+        self.workers = workers or os.cpu_count() or 1
+        self.executor = None
+
+        # Publicar los arreglos del motor de barrido:
+        arrays = {'column': sweep.column, 'z': sweep.z, 'profit': sweep.profit}
+        self.table = None
+        if sweep.table is not None:
+            arrays['offset'] = sweep.offset
+            self.table = (sweep.table.origin, sweep.table.size, sweep.table.levels)
+        self.shared = SharedArrays(arrays)
+
+        # Dividir el modelo en tramos de columnas completas:
+        self.chunks = self.split(4 * self.workers)
+
+
+    def split(self, count):
+        '''
+        Divide los bloques en tramos de tamaño similar sin cortar columnas
+
+        Argumentos:
+            count (int): número de tramos deseado
+
+        Retorna:
+            list: primer y último bloque (excluido) de cada tramo
+        '''
+        n = len(self.sweep.z)
+        starts = np.flatnonzero(self.sweep.start)
+
+        # Ajustar los cortes al inicio de la columna más cercana:
+        targets = np.linspace(0, n, count + 1)[1:-1]
+        cuts = starts[np.minimum(np.searchsorted(starts, targets), len(starts) - 1)]
+        bounds = np.unique(np.r_[0, cuts, n])
+
+        return [(a, b) for a, b in zip(bounds[:-1], bounds[1:]) if b > a]
+
+
+    def values(self, heights, discount, rate, inv_cost):
+        '''
+        Calcula el valor económico del piso para una serie de cotas
+
+        Argumentos:
+            heights (list): lista de cotas de extracción
+            discount (float): tasa de descuento
+            rate (float): tasa de extracción anual en m/año
+            inv_cost (float): costo de inversión del PE
+
+        Retorna:
+            list: valor económico del piso en el mismo orden de heights
+        '''
+
+        # Ordenar las cotas sin perder el orden original:
+        levels, inverse = np.unique(np.asarray(heights, dtype=float),
+                                    return_inverse=True)
+
+        # Iniciar los procesos de trabajo la primera vez. Se crean con
+        # 'spawn' porque un proceso copiado con fork después de que los
+        # núcleos de numba iniciaron sus hilos puede quedar bloqueado:
+        if self.executor is None:
+            self.executor = ProcessPoolExecutor(
+                max_workers=self.workers,
+                mp_context=multiprocessing.get_context('spawn')
+            )
+
+        # Evaluar cada tramo de columnas en paralelo y sumar los resultados:
+        futures = [
+            self.executor.submit(
+                sweep_chunk, self.shared.specs, self.table,
+                kernels.active_backend(), start, stop, levels, discount, rate,
+                inv_cost
+            )
+            for start, stop in self.chunks
+        ]
+        totals = np.zeros(len(levels))
+        for future in futures:
+            totals += future.result()
+
+        return totals[inverse.ravel()].tolist()
+
+
+    def close(self):
+        '''Detiene los procesos y libera la memoria compartida'''
+        if self.executor is not None:
+            self.executor.shutdown()
+            self.executor = None
+        self.shared.close()
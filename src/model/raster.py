@@ -0,0 +1,195 @@
+import numpy as np
+
+
+class FootprintRaster:
+    '''
+    Footprint representado como ráster sobre la grilla XY del modelo de
+    bloques. Guarda qué columnas pertenecen al footprint y el máximo valor
+    acumulado de cada columna en la cota del footprint.
+
+    Atributos:
+        mask (np.ndarray): columnas que pertenecen al footprint, dimensión
+            (nx, ny)
+        value (np.ndarray): máximo valor acumulado de cada columna (NaN en
+            las columnas sin bloques), dimensión (nx, ny)
+        level (float): cota del footprint
+        origin (np.ndarray): coordenadas X e Y de la columna (0, 0)
+        size (np.ndarray): dimensiones de los bloques en X e Y
+    '''
+
+    def __init__(self):
+        self.clear()
+
+
+    @property
+    def empty(self):
+        '''Indica si aún no se ha calculado el footprint'''
+        return self.mask is None
+
+
+    def clear(self):
+        '''Descarta el footprint actual'''
+        self.mask = None
+        self.value = None
+        self.level = None
+        self.origin = None
+        self.size = None
+
+
+    def update(self, grid, column, value, inv_cost, level):
+        '''
+        Reemplaza el footprint a partir del valor de cada columna
+
+        Argumentos:
+            grid (GridModel): grilla del modelo de bloques
+            column (np.ndarray): identificadores de columna de la grilla
+            value (np.ndarray): máximo valor acumulado de cada columna
+            inv_cost (float): costo de inversión del PE
+            level (float): cota del footprint
+        '''
+
+        # Ráster del máximo valor acumulado:
+        i, j = grid.column_index(column)
+        raster = np.full(grid.shape[:2], np.nan)
+        raster[i, j] = value
+
+        # Se asignan arreglos nuevos, de modo que los modelos que comparten
+        # este objeto ven siempre un footprint completo:
+        self.value = raster
+        self.mask = raster > inv_cost
+        self.level = level
+        self.origin = grid.origin[:2].copy()
+        self.size = grid.size[:2].copy()
+
+
+    def matches(self, grid):
+        '''
+        Indica si el footprint fue calculado sobre la grilla actual
+
+        Argumentos:
+            grid (GridModel): grilla del modelo de bloques
+
+        Retorna:
+            bool: True si el ráster tiene la dimensión, el origen y el tamaño
+                de bloque de la grilla
+        '''
+        return (grid.shape is not None and
+                self.mask.shape == tuple(grid.shape[:2]) and
+                np.allclose(self.origin, grid.origin[:2]) and
+                np.allclose(self.size, grid.size[:2]))
+
+
+    def contains(self, i, j):
+        '''
+        Indica si las columnas (i, j) pertenecen al footprint
+
+        Argumentos:
+            i, j (np.ndarray): índices de columna en la grilla
+
+        Retorna:
+            np.ndarray: True para las columnas del footprint
+        '''
+        i, j = np.asarray(i), np.asarray(j)
+        inside = np.zeros(i.shape, dtype=bool)
+        if self.empty:
+            return inside
+
+        # Las columnas fuera del ráster no pertenecen al footprint:
+        nx, ny = self.mask.shape
+        valid = (i >= 0) & (i < nx) & (j >= 0) & (j < ny)
+        inside[valid] = self.mask[i[valid], j[valid]]
+
+        return inside
+
+
+    def columns(self):
+        '''
+        Devuelve los índices de las columnas del footprint
+
+        Retorna:
+            tuple: índices i y j de cada columna del footprint
+        '''
+        return np.nonzero(self.mask)
+
+
+    @staticmethod
+    def runs(edges):
+        '''
+        Agrupa los bordes consecutivos de cada fila de un arreglo booleano
+
+        Argumentos:
+            edges (np.ndarray): arreglo booleano 2D
+
+        Retorna:
+            tuple: fila, primera y última posición (incluida) de cada tramo
+        '''
+        padded = np.zeros((edges.shape[0], edges.shape[1] + 2), dtype=np.int8)
+        padded[:, 1:-1] = edges
+        change = np.diff(padded, axis=1)
+        row, start = np.nonzero(change == 1)
+        _, stop = np.nonzero(change == -1)
+        return row, start, stop - 1
+
+
+    def outline(self):
+        '''
+        Devuelve el contorno del footprint como polilínea sobre los bordes de
+        las celdas. Los bordes alineados y consecutivos se unen en un solo
+        tramo, de modo que el tamaño depende del perímetro del footprint.
+
+        Retorna:
+            tuple: coordenadas X e Y del contorno, con NaN entre tramos
+        '''
+        if self.empty:
+            return np.array([]), np.array([])
+
+        # Máscara con un borde de celdas vacías:
+        padded = np.zeros(np.add(self.mask.shape, 2), dtype=bool)
+        padded[1:-1, 1:-1] = self.mask
+        ox, oy = self.origin - self.size / 2
+        sx, sy = self.size
+        segments = []
+
+        # Bordes entre las columnas i - 1 e i (tramos en Y):
+        row, start, stop = self.runs(padded[1:, 1:-1] != padded[:-1, 1:-1])
+        x = ox + row * sx
+        segments.append([x, oy + start * sy, x, oy + (stop + 1) * sy])
+
+        # Bordes entre las filas j - 1 y j (tramos en X):
+        row, start, stop = self.runs((padded[1:-1, 1:] != padded[1:-1, :-1]).T)
+        y = oy + row * sy
+        segments.append([ox + start * sx, y, ox + (stop + 1) * sx, y])
+
+        # Tramos separados por NaN para la polilínea:
+        x0, y0, x1, y1 = (np.concatenate(c) for c in zip(*segments))
+        gap = np.full(len(x0), np.nan)
+        return (np.column_stack([x0, x1, gap]).ravel(),
+                np.column_stack([y0, y1, gap]).ravel())
+
+
+    def save(self, path):
+        '''
+        Guarda el footprint en un archivo .npz
+
+        Argumentos:
+            path (str): ruta del archivo
+        '''
+        np.savez_compressed(
+            path, mask=self.mask, value=self.value, level=self.level,
+            origin=self.origin, size=self.size
+        )
+
+
+    def load(self, path):
+        '''
+        Carga un footprint guardado con FootprintRaster.save
+
+        Argumentos:
+            path (str): ruta del archivo
+        '''
+        with np.load(path) as saved:
+            self.value = saved['value']
+            self.mask = saved['mask']
+            self.level = float(saved['level'])
+            self.origin = saved['origin']
+            self.size = saved['size']
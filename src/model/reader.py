@@ -0,0 +1,172 @@
+import importlib.util
+import os
+
+import numpy as np
+import pandas as pd
+
+from model.compact import ColumnCompactor
+
+
+# Lector de pyarrow (solo si está instalado):
+PYARROW = importlib.util.find_spec('pyarrow') is not None
+
+
+class BlockReader:
+    '''
+    Lector por bloques de archivos de texto de modelos de bloques. Lee solo
+    las columnas seleccionadas, con tipos de datos explícitos, y aplica el
+    filtro de filas a cada bloque, de modo que las filas descartadas nunca se
+    guardan. Usa el lector de pyarrow cuando está instalado y, si no, el
+    lector de pandas por partes.
+
+    Argumentos:
+        name (str): ruta del archivo
+        sep (str): separador de columnas
+        header (int or None): fila del encabezado
+        chunksize (int): número de filas de cada bloque (lector de pandas)
+        sample (int): número de filas usadas para deducir los tipos de datos
+
+    Atributos:
+        size (int): tamaño del archivo en bytes
+    '''
+
+    def __init__(self, name, sep, header, chunksize=500_000, sample=10_000):
+        self.name = name
+        self.sep = sep
+        self.header = header
+        self.chunksize = chunksize
+        self.sample = sample
+        self.size = os.path.getsize(name)
+
+
+    def columns(self):
+        '''
+        Lee el encabezado del archivo
+
+        Retorna:
+            list: nombres de las columnas (números si no hay encabezado)
+        '''
+        head = pd.read_csv(self.name, sep=self.sep, header=self.header, nrows=1)
+        return head.columns.tolist()
+
+
+    def dtypes(self, usecols=None):
+        '''
+        Deduce el tipo de datos de cada columna a partir de las primeras filas.
+        Las columnas numéricas se leen como float64, ya que una columna entera
+        en las primeras filas puede tener decimales o valores vacíos más
+        adelante; los enteros se recuperan al compactar el modelo.
+
+        Argumentos:
+            usecols (list): columnas a leer (por defecto, todas)
+
+        Retorna:
+            dict: tipo de datos de cada columna
+        '''
+        head = pd.read_csv(
+            self.name, sep=self.sep, header=self.header, usecols=usecols,
+            nrows=self.sample
+        )
+        return {
+            col: np.float64 if pd.api.types.is_numeric_dtype(head[col]) else str
+            for col in head.columns
+        }
+
+
+    def chunks(self, usecols=None, dtypes=None):
+        '''
+        Recorre el archivo por bloques de filas
+
+        Argumentos:
+            usecols (list): columnas a leer (por defecto, todas)
+            dtypes (dict): tipo de datos de cada columna
+
+        Retorna (en cada bloque):
+            tuple: bloque de filas y fracción del archivo leída
+        '''
+        with open(self.name, 'rb') as file:
+            if PYARROW:
+                reader = self.arrow_reader(file, usecols, dtypes)
+                for batch in reader:
+                    chunk = batch.to_pandas()
+                    if self.header is None:
+                        chunk.columns = [int(col) for col in chunk.columns]
+                    yield chunk, file.tell() / max(self.size, 1)
+            else:
+                reader = pd.read_csv(
+                    file, sep=self.sep, header=self.header, usecols=usecols,
+                    dtype=dtypes, chunksize=self.chunksize
+                )
+                for chunk in reader:
+                    yield chunk, file.tell() / max(self.size, 1)
+
+
+    def arrow_reader(self, file, usecols, dtypes):
+        '''
+        Crea el lector por bloques de pyarrow
+
+        Argumentos:
+            file (file): archivo abierto en modo binario
+            usecols (list): columnas a leer (por defecto, todas)
+            dtypes (dict): tipo de datos de cada columna
+
+        Retorna:
+            pyarrow.csv.CSVStreamingReader: lector por bloques
+        '''
+        import pyarrow as pa
+        from pyarrow import csv
+
+        # Sin encabezado, las columnas se nombran con su posición:
+        names = None
+        if self.header is None:
+            names = [str(col) for col in self.columns()]
+
+        arrow = {np.float64: pa.float64(), str: pa.string()}
+        types = {
+            str(col): arrow[dtype] for col, dtype in (dtypes or {}).items()
+        }
+        include = [str(col) for col in usecols] if usecols else []
+
+        return csv.open_csv(
+            file,
+            read_options=csv.ReadOptions(column_names=names),
+            parse_options=csv.ParseOptions(delimiter=self.sep),
+            convert_options=csv.ConvertOptions(
+                include_columns=include, column_types=types
+            )
+        )
+
+
+    def read(self, usecols=None, query=None, progress=None, single=False):
+        '''
+        Lee el archivo completo por bloques. Cada bloque se compacta antes de
+        guardarlo, por lo que la memoria máxima es la del modelo compactado
+        más un bloque en float64.
+
+        Argumentos:
+            usecols (list): columnas a leer (por defecto, todas)
+            query (str): filtro de filas (expresión de DataFrame.query), por
+                ejemplo "z >= 100 and domain in [1, 2]"
+            progress (function): función que recibe la fracción del archivo
+                leída después de cada bloque
+            single (bool): guardar los decimales en float32 aunque se pierda
+                precisión
+
+        Retorna:
+            tuple: filas que cumplen el filtro (compactadas) y memoria de los
+                bloques leídos antes de compactar, en bytes
+        '''
+        dtypes = self.dtypes(usecols)
+        compactor = ColumnCompactor(single)
+
+        for chunk, fraction in self.chunks(usecols, dtypes):
+
+            # Descartar las filas que no cumplen el filtro:
+            if query:
+                chunk = chunk.query(query)
+            compactor.add(chunk)
+
+            if progress is not None:
+                progress(fraction)
+
+        return compactor.result(list(dtypes)), compactor.raw
@@ -0,0 +1,123 @@
+import hashlib
+import json
+import os
+import shutil
+
+import numpy as np
+import pandas as pd
+
+
+class BlockCache:
+    '''
+    Caché binaria de modelos de bloques importados. Cada modelo se guarda en
+    una carpeta junto al archivo de origen (nombre.cache), con un archivo .npy
+    por columna, de modo que se puede abrir con memoria mapeada sin volver a
+    leer el texto. La caché se identifica por la ruta, el tamaño y la fecha
+    de modificación del archivo y por las opciones de lectura, por lo que se
+    reconstruye automáticamente si el archivo cambia.
+
+    Argumentos:
+        mmap (bool): abrir las columnas con memoria mapeada (solo lectura)
+    '''
+
+    def __init__(self, mmap=True):
+        self.mmap = mmap
+
+
+    def folder(self, name):
+        '''
+        Devuelve la carpeta de caché de un archivo
+
+        Argumentos:
+            name (str): ruta del archivo de origen
+
+        Retorna:
+            str: ruta de la carpeta de caché
+        '''
+        return f'{name}.cache'
+
+
+    def key(self, name, **options):
+        '''
+        Calcula la huella del archivo y de las opciones de lectura
+
+        Argumentos:
+            name (str): ruta del archivo de origen
+            options (dict): opciones de lectura (separador, encabezado, etc.)
+
+        Retorna:
+            str: identificador de la caché
+        '''
+        stat = os.stat(name)
+        fingerprint = json.dumps({
+            'path': os.path.abspath(name),
+            'size': stat.st_size,
+            'mtime': stat.st_mtime_ns,
+            'options': options
+        }, sort_keys=True, default=str)
+        return hashlib.sha1(fingerprint.encode()).hexdigest()[:16]
+
+
+    def load(self, name, key):
+        '''
+        Abre un modelo guardado en la caché
+
+        Argumentos:
+            name (str): ruta del archivo de origen
+            key (str): identificador de la caché
+
+        Retorna:
+            pd.DataFrame: modelo de bloques (None si no está en la caché)
+        '''
+        path = os.path.join(self.folder(name), key)
+        try:
+            with open(os.path.join(path, 'columns.json')) as file:
+                columns = json.load(file)
+        except (OSError, ValueError):
+            return None
+
+        # Abrir cada columna (las categorías se reconstruyen desde sus códigos):
+        mode = 'r' if self.mmap else None
+        arrays = {}
+        for n, column in enumerate(columns):
+            values = np.load(os.path.join(path, f'{n}.npy'), mmap_mode=mode)
+            if column['categories'] is not None:
+                values = pd.Categorical.from_codes(values, column['categories'])
+            arrays[column['name']] = values
+
+        return pd.DataFrame(arrays, copy=False)
+
+
+    def save(self, name, key, data):
+        '''
+        Guarda un modelo en la caché y elimina las versiones anteriores
+
+        Argumentos:
+            name (str): ruta del archivo de origen
+            key (str): identificador de la caché
+            data (pd.DataFrame): modelo de bloques
+        '''
+        folder = self.folder(name)
+        path = os.path.join(folder, key)
+        os.makedirs(path, exist_ok=True)
+
+        # Guardar cada columna como un arreglo .npy:
+        columns = []
+        for n, col in enumerate(data.columns):
+            values = data[col]
+            categories = None
+            if isinstance(values.dtype, pd.CategoricalDtype):
+                categories = values.cat.categories.tolist()
+                values = values.cat.codes
+            np.save(os.path.join(path, f'{n}.npy'), values.to_numpy())
+            columns.append({'name': col, 'categories': categories})
+
+        # El índice de columnas se escribe al final, para que una caché
+        # incompleta no se pueda abrir:
+        with open(os.path.join(path, 'columns.json'), 'w') as file:
+            json.dump(columns, file, default=str)
+
+        # Eliminar versiones anteriores (puede fallar si siguen abiertas):
+        for old in os.listdir(folder):
+            if old != key:
+                shutil.rmtree(os.path.join(folder, old), ignore_errors=True)
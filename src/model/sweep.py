@@ -0,0 +1,459 @@
+import numpy as np
+
+from model import kernels
+
+
+class LevelSweep:
+    '''
+    Motor de barrido de cotas. Ordena y agrupa el modelo de bloques en
+    columnas una única vez y luego obtiene el valor económico de todas las
+    cotas candidatas en una sola pasada vectorizada, usando sumas acumuladas
+    inversas del beneficio descontado de cada columna.
+
+    Argumentos:
+        offset (np.ndarray): nivel k de la grilla de cada bloque (opcional)
+        table (DiscountTable): factores de descuento por nivel de la grilla
+            (opcional, junto con offset)
+        ordered (bool): indica que los bloques ya vienen ordenados por
+            columna y cota (por ejemplo, un tramo de otro LevelSweep)
+
+    Atributos:
+        column (np.ndarray): identificador de columna de cada bloque
+        z (np.ndarray): cota de cada bloque
+        profit (np.ndarray): beneficio de cada bloque
+        offset (np.ndarray): nivel k de la grilla de cada bloque
+        table (DiscountTable): factores de descuento por nivel
+        base (float): cota a la que se refieren los factores de descuento
+        start (np.ndarray): indica si el bloque es el primero de su columna
+    '''
+
+    def __init__(self, column, z, profit, offset=None, table=None,
+                 ordered=False):
+
+        column = np.asarray(column)
+        z = np.asarray(z, dtype=float)
+        profit = np.asarray(profit, dtype=float)
+
+        # Ordenar los bloques por columna y cota:
+        if not ordered:
+            order = np.lexsort((z, column))
+            column, z, profit = column[order], z[order], profit[order]
+            if offset is not None:
+                offset = np.asarray(offset)[order]
+
+        self.column = column
+        self.z = z
+        self.profit = profit
+        self.offset = offset
+        self.table = table
+
+        # Cota de referencia del descuento:
+        if table is not None:
+            self.base = table.origin
+        else:
+            self.base = z.min() if len(z) else 0.0
+
+        # Marcar el primer bloque de cada columna:
+        self.start = np.ones(len(self.column), dtype=bool)
+        self.start[1:] = self.column[1:] != self.column[:-1]
+
+
+    @classmethod
+    def from_data(cls, data, names, profit='profit'):
+        '''
+        Construye el motor de barrido a partir del modelo de bloques
+
+        Argumentos:
+            data (pd.DataFrame): datos del modelo de bloques
+            names (dict): nombres de las variables espaciales
+            profit (str): nombre de la columna de beneficio
+
+        Retorna:
+            LevelSweep: motor de barrido con las columnas ordenadas
+        '''
+        column = data.groupby([names['x'], names['y']], sort=False).ngroup()
+        return cls(column.values, data[names['z']].values, data[profit].values)
+
+
+    def pairs(self, heights):
+        '''
+        Obtiene los pares columna-cota del barrido. Para cada cota, el primer
+        bloque de cada columna es el bloque más bajo con cota mayor o igual a
+        ella. No depende de los parámetros económicos, por lo que se puede
+        reutilizar entre distintos casos.
+
+        Argumentos:
+            heights (np.ndarray): cotas de extracción ordenadas de menor a mayor
+
+        Retorna:
+            tuple: primer bloque e índice de la cota de cada par columna-cota
+        '''
+
+        # Cada bloque es el primero de su columna para las cotas comprendidas
+        # entre el bloque inferior (excluido) y el propio bloque (incluido):
+        below = np.full(len(self.z), -np.inf)
+        below[1:] = np.where(self.start[1:], -np.inf, self.z[:-1])
+        first = np.searchsorted(heights, below, side='right')
+        last = np.searchsorted(heights, self.z, side='right')
+        count = last - first
+
+        # Expandir los pares columna-cota:
+        block = np.repeat(np.arange(len(self.z)), count)
+        step = np.arange(count.sum()) - np.repeat(np.cumsum(count) - count, count)
+        level = first[block] + step
+
+        return block, level
+
+
+    def block_factors(self, discount, rate):
+        '''
+        Devuelve el factor de descuento de cada bloque respecto a self.base.
+        Con grilla, el factor se recupera de la tabla por nivel en vez de
+        calcular una potencia por bloque.
+
+        Argumentos:
+            discount (float): tasa de descuento
+            rate (float): tasa de extracción anual en m/año
+
+        Retorna:
+            np.ndarray: factor de descuento de cada bloque
+        '''
+        if self.table is not None:
+            return self.table.lookup(discount, rate, self.offset)
+
+        return 1 / (1 + discount) ** ((self.z - self.base) / rate)
+
+
+    def level_factors(self, heights, discount, rate):
+        '''
+        Devuelve el factor que refiere el descuento de self.base a cada cota
+
+        Argumentos:
+            heights (np.ndarray): cotas de extracción
+            discount (float): tasa de descuento
+            rate (float): tasa de extracción anual en m/año
+
+        Retorna:
+            np.ndarray: factor de cada cota
+        '''
+        return (1 + discount) ** ((np.asarray(heights) - self.base) / rate)
+
+
+    def best_values(self, discount, rate, factors=None):
+        '''
+        Calcula el máximo valor acumulado de la columna si la extracción se
+        inicia en cada bloque. El descuento se refiere a la cota self.base.
+
+        Argumentos:
+            discount (float): tasa de descuento
+            rate (float): tasa de extracción anual en m/año
+            factors (np.ndarray): factores de descuento de cada bloque, si ya
+                fueron calculados
+
+        Retorna:
+            np.ndarray: máximo valor acumulado desde cada bloque
+        '''
+
+        # Descontar cada bloque respecto a la cota de referencia:
+        if factors is None:
+            factors = self.block_factors(discount, rate)
+        weight = self.profit * factors
+
+        # Máximo de las sumas acumuladas inversas de cada columna:
+        return kernels.column_best(weight, self.start)
+
+
+    def column_values(self, heights, discount, rate):
+        '''
+        Calcula el máximo valor acumulado de cada columna para cada cota. Es
+        equivalente a ejecutar los dos groupby de HeightModel.floor_value en
+        cada cota, pero recorriendo el modelo una sola vez.
+
+        Argumentos:
+            heights (np.ndarray): cotas de extracción ordenadas de menor a mayor
+            discount (float): tasa de descuento
+            rate (float): tasa de extracción anual en m/año
+
+        Retorna:
+            tuple: índice de la cota, columna y valor máximo de cada par
+                columna-cota
+        '''
+
+        heights = np.asarray(heights, dtype=float)
+        if len(self.z) == 0:
+            return np.array([], dtype=int), self.column, np.array([])
+
+        # Máximo acumulado desde cada bloque y pares columna-cota:
+        best = self.best_values(discount, rate)
+        block, level = self.pairs(heights)
+
+        # Referir el descuento a la cota de extracción:
+        value = best[block] * self.level_factors(heights, discount, rate)[level]
+
+        return level, self.column[block], value
+
+
+    def runs(self, heights):
+        '''
+        Reagrupa los bloques de cada columna según el intervalo entre cotas
+        consecutivas en el que se encuentran. Con pocas cotas, cada tramo de
+        columna reemplaza a todos sus bloques en el barrido grueso.
+
+        Argumentos:
+            heights (np.ndarray): cotas ordenadas de menor a mayor
+
+        Retorna:
+            tuple: intervalo de cada bloque (heights[g] <= z < heights[g + 1],
+                -1 bajo la primera cota) e indicador del primer bloque de
+                cada tramo
+        '''
+        group = None
+
+        # Con grilla, el intervalo se calcula una vez por nivel (si las cotas
+        # coinciden con niveles de la grilla):
+        if self.table is not None:
+            step = (np.asarray(heights) - self.table.origin) / self.table.size
+            k = np.rint(step).astype(int)
+            if np.allclose(step, k, rtol=0, atol=1e-6):
+                per_level = np.searchsorted(
+                    k, np.arange(self.table.levels), side='right'
+                ) - 1
+                group = per_level[self.offset]
+
+        if group is None:
+            group = np.searchsorted(heights, self.z, side='right') - 1
+        run = self.start.copy()
+        run[1:] |= group[1:] != group[:-1]
+
+        return group, run
+
+
+    def coarse_totals(self, heights, discount, rate, inv_cost):
+        '''
+        Barrido grueso del modelo: calcula el valor del piso en unas pocas
+        cotas y una cota superior del valor de cualquier cota comprendida
+        entre dos de ellas. Los pares se forman por tramo de columna y no por
+        bloque, por lo que su número depende de las cotas evaluadas y no de la
+        resolución del modelo. En cada intervalo se toma el mejor bloque
+        inicial posible y el menor descuento posible, de modo que la cota
+        superior nunca subestima el valor.
+
+        Argumentos:
+            heights (np.ndarray): cotas evaluadas ordenadas de menor a mayor
+            discount (float): tasa de descuento
+            rate (float): tasa de extracción anual en m/año
+            inv_cost (float): costo de inversión del PE
+
+        Retorna:
+            tuple: valor del piso en cada cota y cota superior del valor en
+                cada intervalo abierto (heights[n], heights[n + 1])
+        '''
+
+        heights = np.asarray(heights, dtype=float)
+        gaps = max(len(heights) - 1, 0)
+        if len(heights) == 0 or len(self.z) == 0:
+            return np.zeros(len(heights)), np.zeros(gaps)
+
+        # Máximo acumulado desde cada bloque (a resolución completa):
+        factors = self.block_factors(discount, rate)
+        best = self.best_values(discount, rate, factors)
+        lift = self.level_factors(heights, discount, rate)
+
+        # Tramos de columna e intervalo del tramo anterior de la columna:
+        group, run = self.runs(heights)
+        first = np.flatnonzero(run)
+        current = group[first]
+        previous = np.full(len(first), -1)
+        previous[1:] = np.where(self.start[first[1:]], -1, current[:-1])
+
+        # El primer bloque de cada tramo es el primero de su columna en las
+        # cotas comprendidas entre el tramo anterior (excluido) y el suyo:
+        count = current - previous
+        block = np.repeat(first, count)
+        step = np.arange(count.sum()) - np.repeat(np.cumsum(count) - count, count)
+        level = np.repeat(previous + 1, count) + step
+        value = best[block] * lift[level]
+        paying = value > inv_cost
+        totals = np.bincount(
+            level[paying], weights=value[paying], minlength=len(heights)
+        )
+
+        # Mejor valor posible dentro del intervalo del propio tramo (bloques
+        # sobre la cota inferior, a su propia cota):
+        best = np.maximum(best, 0.0)
+        inner = np.where(
+            self.z > heights[np.maximum(group, 0)], best / factors, 0.0
+        )
+        own = np.maximum.reduceat(inner, first)
+
+        # Cada tramo acota los intervalos sin bloques que lo preceden (a la
+        # cota superior del intervalo) y el suyo propio:
+        lower = np.maximum(previous, 0)
+        count = np.maximum(current - lower, 0) + (
+            (current >= 0) & (current < gaps)
+        )
+        index = np.repeat(np.arange(len(first)), count)
+        step = np.arange(count.sum()) - np.repeat(np.cumsum(count) - count, count)
+        gap = lower[index] + step
+        if len(gap) == 0:
+            return totals, np.zeros(gaps)
+        value = np.where(
+            gap == current[index],
+            own[index],
+            best[first[index]] * lift[gap + 1]
+        )
+
+        # Mejor bloque inicial de cada columna en cada intervalo (los pares
+        # quedan ordenados por columna e intervalo, por lo que basta reducir
+        # cada tramo contiguo):
+        column = np.cumsum(self.start)[first[index]]
+        change = np.flatnonzero(
+            (column[1:] != column[:-1]) | (gap[1:] != gap[:-1])
+        ) + 1
+        start = np.r_[0, change]
+        upper = np.maximum.reduceat(value, start)
+        paid = upper > inv_cost
+
+        return totals, np.bincount(
+            gap[start][paid], weights=upper[paid], minlength=gaps
+        )
+
+
+    def refine_totals(self, heights, levels, discount, rate, inv_cost):
+        '''
+        Calcula a resolución completa el valor del piso en cotas comprendidas
+        entre las cotas del barrido grueso. Solo intervienen los bloques de
+        los intervalos que contienen esas cotas y el primer bloque de cada
+        tramo de columna (el primero sobre cualquier intervalo sin bloques).
+
+        Argumentos:
+            heights (np.ndarray): cotas del barrido grueso ordenadas de menor
+                a mayor
+            levels (np.ndarray): cotas a evaluar ordenadas de menor a mayor
+            discount (float): tasa de descuento
+            rate (float): tasa de extracción anual en m/año
+            inv_cost (float): costo de inversión del PE
+
+        Retorna:
+            np.ndarray: valor económico del piso para cada cota
+        '''
+
+        heights = np.asarray(heights, dtype=float)
+        levels = np.asarray(levels, dtype=float)
+        if len(levels) == 0 or len(self.z) == 0:
+            return np.zeros(len(levels))
+
+        # Bloques de los intervalos con cotas a evaluar y primeros bloques
+        # de cada tramo:
+        group, run = self.runs(heights)
+        wanted = np.zeros(len(heights) + 1, dtype=bool)
+        wanted[np.searchsorted(heights, levels, side='right')] = True
+        keep = wanted[group + 1] | run
+
+        # Pares columna-cota de los bloques seleccionados:
+        part = LevelSweep(
+            self.column[keep], self.z[keep], self.profit[keep], ordered=True
+        )
+        block, level = part.pairs(levels)
+
+        # El máximo acumulado se calcula con todos los bloques de la columna:
+        best = self.best_values(discount, rate)[keep]
+        value = best[block] * self.level_factors(levels, discount, rate)[level]
+        paying = value > inv_cost
+
+        return np.bincount(
+            level[paying], weights=value[paying], minlength=len(levels)
+        )
+
+
+    def sensitivity(self, heights, discounts, rates, inv_costs):
+        '''
+        Evalúa el valor económico del piso para todas las combinaciones de
+        tasa de descuento, tasa de extracción y costo de inversión. El orden
+        de los bloques y los pares columna-cota se calculan una sola vez y los
+        costos de inversión se evalúan en conjunto mediante broadcasting.
+
+        Argumentos:
+            heights (np.ndarray): cotas de extracción ordenadas de menor a mayor
+            discounts (np.ndarray): tasas de descuento
+            rates (np.ndarray): tasas de extracción anual en m/año
+            inv_costs (np.ndarray): costos de inversión del PE
+
+        Retorna:
+            np.ndarray: valor del piso, dimensión (descuentos, tasas, costos,
+                cotas)
+        '''
+
+        heights = np.asarray(heights, dtype=float)
+        inv_costs = np.asarray(inv_costs, dtype=float)
+        cube = np.zeros((len(discounts), len(rates), len(inv_costs), len(heights)))
+        if len(self.z) == 0:
+            return cube
+
+        # Pares columna-cota compartidos por todos los casos:
+        block, level = self.pairs(heights)
+
+        # Desplazamiento de cada costo de inversión en el arreglo de salida:
+        shift = np.arange(len(inv_costs))[:, None] * len(heights)
+
+        for a, discount in enumerate(discounts):
+            for b, rate in enumerate(rates):
+
+                # Máximo acumulado de cada par columna-cota:
+                best = self.best_values(discount, rate)
+                lift = self.level_factors(heights, discount, rate)
+                value = best[block] * lift[level]
+
+                # Sumar las columnas que pagan cada costo de inversión:
+                paying = value[None, :] > inv_costs[:, None]
+                totals = np.bincount(
+                    (shift + level[None, :])[paying],
+                    weights=np.broadcast_to(value, paying.shape)[paying],
+                    minlength=len(inv_costs) * len(heights)
+                )
+                cube[a, b] = totals.reshape(len(inv_costs), len(heights))
+
+        return cube
+
+
+    def values(self, heights, discount, rate, inv_cost):
+        '''
+        Calcula el valor económico del piso para una serie de cotas
+
+        Argumentos:
+            heights (list): lista de cotas de extracción
+            discount (float): tasa de descuento
+            rate (float): tasa de extracción anual en m/año
+            inv_cost (float): costo de inversión del PE
+
+        Retorna:
+            list: lista con el valor económico del piso para cada cota
+        '''
+
+        # Ordenar las cotas sin perder el orden original:
+        levels, inverse = np.unique(np.asarray(heights, dtype=float),
+                                    return_inverse=True)
+
+        totals = self.level_totals(levels, discount, rate, inv_cost)
+        return totals[inverse.ravel()].tolist()
+
+
+    def level_totals(self, levels, discount, rate, inv_cost):
+        '''
+        Suma el valor de las columnas que pagan la inversión en cada cota
+
+        Argumentos:
+            levels (np.ndarray): cotas de extracción ordenadas de menor a mayor
+            discount (float): tasa de descuento
+            rate (float): tasa de extracción anual en m/año
+            inv_cost (float): costo de inversión del PE
+
+        Retorna:
+            np.ndarray: valor económico del piso para cada cota
+        '''
+        level, _, value = self.column_values(levels, discount, rate)
+        paying = value > inv_cost
+
+        return np.bincount(
+            level[paying], weights=value[paying], minlength=len(levels)
+        )
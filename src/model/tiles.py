@@ -0,0 +1,428 @@
+import json
+import os
+
+import numpy as np
+import pandas as pd
+
+from model.grid import GridModel
+from model.sweep import LevelSweep
+
+
+class TiledGrid:
+    '''
+    Modelo de bloques fuera de memoria. Cada variable numérica se guarda en
+    disco como un arreglo .npy de dimensión (nx, ny, nz) sobre la grilla
+    regular (NaN en las posiciones sin bloque) y se abre con memoria mapeada;
+    dos arreglos adicionales guardan las posiciones con bloque (mask) y la
+    fila de cada bloque en el archivo (row), que conserva el orden original.
+    Los cálculos recorren el modelo por bandas de columnas completas (tiles
+    de filas i consecutivas), cuyo tamaño se ajusta al presupuesto de memoria,
+    por lo que el modelo puede ser más grande que la memoria disponible.
+
+    Argumentos:
+        folder (str): carpeta de los arreglos de la grilla
+        budget (int): memoria máxima de cada tile, en bytes
+
+    Atributos:
+        names (dict): nombres de las variables espaciales
+        variables (list): variables guardadas en la grilla
+        origin (np.ndarray): coordenadas del bloque (0, 0, 0)
+        size (np.ndarray): dimensiones de los bloques en X, Y y Z
+        shape (tuple): número de bloques en X, Y y Z
+        coords (list): coordenada de cada índice en X, Y y Z
+        levels (np.ndarray): niveles k que contienen bloques
+        key (str): identificador de las opciones con que se construyó
+    '''
+
+    def __init__(self, folder, budget=256 * 2**20):
+        self.folder = folder
+        self.budget = budget
+        self.names = {}
+        self.variables = []
+        self.origin = None
+        self.size = None
+        self.shape = None
+        self.coords = []
+        self.levels = None
+        self.key = None
+
+
+    def path(self, name):
+        '''Devuelve la ruta del arreglo de una variable (o de mask y row)'''
+        if name in ('mask', 'row'):
+            return os.path.join(self.folder, f'{name}.npy')
+        return os.path.join(self.folder, f'{self.variables.index(name)}.npy')
+
+
+    def open(self, key):
+        '''
+        Abre una grilla ya construida con las mismas opciones
+
+        Argumentos:
+            key (str): identificador del archivo y de las opciones de lectura
+
+        Retorna:
+            bool: True si la grilla existe y corresponde a las opciones
+        '''
+        try:
+            with open(os.path.join(self.folder, 'grid.json')) as file:
+                meta = json.load(file)
+        except (OSError, ValueError):
+            return False
+
+        if meta['key'] != key:
+            return False
+
+        self.key = key
+        self.names = meta['names']
+        self.variables = meta['variables']
+        self.origin = np.array(meta['origin'])
+        self.size = np.array(meta['size'])
+        self.shape = tuple(meta['shape'])
+        self.coords = [np.array(c) for c in meta['coords']]
+        self.levels = np.array(meta['levels'], dtype=np.int64)
+        return True
+
+
+    def build(self, reader, names, key, usecols=None, query=None,
+              progress=None):
+        '''
+        Construye la grilla leyendo el archivo por bloques dos veces: la
+        primera para detectar la geometría de cada eje y la segunda para
+        escribir cada bloque en su posición de la grilla
+
+        Argumentos:
+            reader (BlockReader): lector del archivo de origen
+            names (dict): nombres de las variables espaciales
+            key (str): identificador del archivo y de las opciones de lectura
+            usecols (list): columnas a leer (por defecto, todas)
+            query (str): filtro de filas
+            progress (function): función que recibe la fracción completada
+        '''
+        dtypes = reader.dtypes(usecols)
+        axes = [names[axis] for axis in ['x', 'y', 'z']]
+
+        # Variables numéricas guardadas en la grilla:
+        self.names = dict(names)
+        self.variables = [
+            col for col, dtype in dtypes.items()
+            if dtype is np.float64 and col not in axes
+        ]
+
+        def chunks(start):
+            '''Bloques de filas filtrados, con el avance escalado'''
+            for chunk, fraction in reader.chunks(usecols, dtypes):
+                if query:
+                    chunk = chunk.query(query)
+                yield chunk
+                if progress is not None:
+                    progress(start + fraction / 2)
+
+        # 1. Coordenadas distintas de cada eje:
+        levels = [np.array([]) for _ in axes]
+        for chunk in chunks(0.0):
+            for n, axis in enumerate(axes):
+                values = chunk[axis].values.astype(float)
+                levels[n] = np.union1d(levels[n], values)
+
+        origin, size, shape = zip(*[GridModel.axis_geometry(v) for v in levels])
+        self.origin = np.array(origin)
+        self.size = np.array(size)
+        self.shape = tuple(shape)
+
+        # Coordenada de cada índice (valores originales donde hay bloques):
+        self.coords = []
+        for axis in range(3):
+            lookup = origin[axis] + size[axis] * np.arange(shape[axis])
+            lookup[self.locate(axis, levels[axis])] = levels[axis]
+            self.coords.append(lookup)
+
+        # 2. Escribir los bloques en los arreglos de la grilla:
+        os.makedirs(self.folder, exist_ok=True)
+        fill = {'mask': (bool, False), 'row': (np.int64, -1)}
+        for name in ['mask', 'row'] + self.variables:
+            dtype, value = fill.get(name, (np.float64, np.nan))
+            array = np.lib.format.open_memmap(
+                self.path(name), mode='w+', dtype=dtype, shape=self.shape
+            )
+            for i0, i1 in self.tiles(1):
+                array[i0:i1] = value
+            array.flush()
+            del array
+
+        arrays = {
+            name: self.array(name, mode='r+')
+            for name in ['mask', 'row'] + self.variables
+        }
+        present = np.zeros(self.shape[2], dtype=bool)
+        rows = 0
+        for chunk in chunks(0.5):
+            i, j, k = (
+                self.locate(n, chunk[axis].values.astype(float))
+                for n, axis in enumerate(axes)
+            )
+            present[k] = True
+            arrays['mask'][i, j, k] = True
+            arrays['row'][i, j, k] = np.arange(rows, rows + len(chunk))
+            rows += len(chunk)
+            for name in self.variables:
+                arrays[name][i, j, k] = chunk[name].values
+
+        for array in arrays.values():
+            array.flush()
+        del arrays
+        self.levels = np.flatnonzero(present)
+        self.key = key
+
+        # Guardar la geometría al final, para que una grilla incompleta no
+        # se pueda abrir:
+        with open(os.path.join(self.folder, 'grid.json'), 'w') as file:
+            json.dump({
+                'key': key,
+                'names': self.names,
+                'variables': self.variables,
+                'origin': self.origin.tolist(),
+                'size': self.size.tolist(),
+                'shape': list(self.shape),
+                'coords': [c.tolist() for c in self.coords],
+                'levels': self.levels.tolist()
+            }, file)
+
+
+    def locate(self, axis, values):
+        '''
+        Devuelve los índices de la grilla correspondientes a una serie de
+        coordenadas
+
+        Argumentos:
+            axis (int): eje de la grilla (0 = X, 1 = Y, 2 = Z)
+            values (np.ndarray): coordenadas en el eje
+
+        Retorna:
+            np.ndarray: índice de la grilla de cada coordenada
+        '''
+        position = (np.asarray(values) - self.origin[axis]) / self.size[axis]
+        return np.round(position).astype(np.int64)
+
+
+    def array(self, name, mode='r'):
+        '''
+        Abre el arreglo de una variable con memoria mapeada
+
+        Argumentos:
+            name (str): nombre de la variable
+            mode (str): modo de apertura ('r' solo lectura)
+
+        Retorna:
+            np.memmap: arreglo de dimensión shape
+        '''
+        return np.load(self.path(name), mmap_mode=mode)
+
+
+    def tiles(self, count, depth=None):
+        '''
+        Divide la grilla en bandas de filas i consecutivas que respetan el
+        presupuesto de memoria
+
+        Argumentos:
+            count (int): número de arreglos de 8 bytes por posición de la
+                grilla que se mantienen a la vez en memoria
+            depth (int): número de niveles leídos (por defecto, todos)
+
+        Retorna (en cada tile):
+            tuple: primera fila y fila siguiente a la última del tile
+        '''
+        nx, ny, nz = self.shape
+        row = ny * (depth if depth is not None else nz) * 8 * count
+        step = max(1, int(self.budget // max(row, 1)))
+        for i0 in range(0, nx, step):
+            yield i0, min(i0 + step, nx)
+
+
+    def sweeps(self, profit, table):
+        '''
+        Recorre la grilla construyendo el motor de barrido de cada tile. Como
+        las columnas son independientes, los resultados por columna de los
+        tiles se pueden concatenar y los totales por cota se pueden sumar.
+
+        Argumentos:
+            profit (str): nombre de la variable de beneficio
+            table (DiscountTable): factores de descuento por nivel
+
+        Retorna (en cada tile):
+            LevelSweep: motor de barrido de las columnas del tile
+        '''
+        array = self.array(profit)
+        ny = self.shape[1]
+
+        # El barrido mantiene unos diez arreglos por bloque (orden, pares
+        # columna-cota y valores):
+        for i0, i1 in self.tiles(10):
+            values = np.asarray(array[i0:i1])
+
+            # Las posiciones en orden C ya están ordenadas por columna y cota:
+            ti, tj, tk = np.nonzero(~np.isnan(values))
+            yield LevelSweep(
+                (ti + i0).astype(np.int64) * ny + tj,
+                self.coords[2][tk],
+                values[ti, tj, tk],
+                offset=tk,
+                table=table,
+                ordered=True
+            )
+
+
+    def slab(self, variables, zmin, zmax):
+        '''
+        Devuelve los bloques comprendidos entre dos cotas, ordenados por cota
+
+        Argumentos:
+            variables (list): variables a leer
+            zmin, zmax (float): cotas mínima y máxima
+
+        Retorna:
+            pd.DataFrame: coordenadas (con los nombres del modelo) y
+                variables de los bloques
+        '''
+        k0 = max(int(np.searchsorted(self.coords[2], zmin, side='left')), 0)
+        k1 = int(np.searchsorted(self.coords[2], zmax, side='right'))
+        columns = {axis: [] for axis in range(3)}
+        columns.update({name: [] for name in variables})
+        columns['row'] = []
+        mask = self.array('mask')
+        arrays = {name: self.array(name) for name in list(variables) + ['row']}
+
+        for i0, i1 in self.tiles(len(variables) + 4, depth=max(k1 - k0, 1)):
+            tile = {name: np.asarray(a[i0:i1, :, k0:k1])
+                    for name, a in arrays.items()}
+            ti, tj, tk = np.nonzero(mask[i0:i1, :, k0:k1])
+            for axis, index in enumerate([ti + i0, tj, tk + k0]):
+                columns[axis].append(self.coords[axis][index])
+            for name in list(variables) + ['row']:
+                columns[name].append(tile[name][ti, tj, tk])
+
+        data = pd.DataFrame({
+            key: np.concatenate(values) if values else np.array([])
+            for key, values in columns.items()
+        })
+
+        # Ordenar por cota partiendo del orden del archivo, igual que el
+        # modelo en memoria:
+        row = data.pop('row').values
+        data = data.iloc[np.argsort(row, kind='stable')]
+        data.columns = [self.names[a] for a in ['x', 'y', 'z']] + list(variables)
+        return data.sort_values(self.names['z'], ignore_index=True)
+
+
+    def query(self, name, vrange, xrange, yrange, zrange):
+        '''
+        Devuelve los bloques dentro de una caja con la variable en un rango.
+        Solo se leen las filas i y los niveles k que cortan la caja.
+
+        Argumentos:
+            name (str): nombre de la variable
+            vrange, xrange, yrange, zrange (tuple): rangos de la variable y
+                de las coordenadas
+
+        Retorna:
+            dict: coordenadas X, Y, Z y valor de la variable de cada bloque
+        '''
+
+        # Índices de la grilla que cortan la caja:
+        bounds = [
+            (int(np.searchsorted(c, lo, side='left')),
+             int(np.searchsorted(c, hi, side='right')))
+            for c, (lo, hi) in zip(self.coords, [xrange, yrange, zrange])
+        ]
+        (a0, a1), (b0, b1), (c0, c1) = bounds
+        result = {'x': [], 'y': [], 'z': [], name: []}
+        axis = self.axis_of(name)
+        mask = self.array('mask')
+        array = self.array(name) if axis is None else None
+
+        for i0, i1 in self.tiles(3, depth=max(c1 - c0, 1)):
+            i0, i1 = max(i0, a0), min(i1, a1)
+            if i0 >= i1:
+                continue
+
+            # Bloques de la caja y valor de la variable:
+            ti, tj, tk = np.nonzero(mask[i0:i1, b0:b1, c0:c1])
+            index = (ti + i0, tj + b0, tk + c0)
+            if array is not None:
+                values = np.asarray(array[i0:i1, b0:b1, c0:c1])[ti, tj, tk]
+            else:
+                values = self.coords[axis][index[axis]]
+            keep = (values >= vrange[0]) & (values <= vrange[1])
+
+            for key, coord in zip(['x', 'y', 'z'], range(3)):
+                result[key].append(self.coords[coord][index[coord][keep]])
+            result[name].append(values[keep])
+
+        return {
+            key: np.concatenate(values) if values else np.array([])
+            for key, values in result.items()
+        }
+
+
+    def axis_of(self, name):
+        '''Devuelve el eje de una variable espacial (None si no lo es)'''
+        for axis, key in enumerate(['x', 'y', 'z']):
+            if self.names.get(key) == name:
+                return axis
+        return None
+
+
+    def value_range(self, name):
+        '''
+        Devuelve el mínimo y el máximo de una variable
+
+        Argumentos:
+            name (str): nombre de la variable
+
+        Retorna:
+            tuple: valor mínimo y máximo
+        '''
+        axis = self.axis_of(name)
+        if axis is not None:
+            return self.coords[axis].min(), self.coords[axis].max()
+
+        array = self.array(name)
+        low, high = np.inf, -np.inf
+        for i0, i1 in self.tiles(2):
+            tile = np.asarray(array[i0:i1])
+            if not np.isnan(tile).all():
+                low = min(low, np.nanmin(tile))
+                high = max(high, np.nanmax(tile))
+        return low, high
+
+
+    def describe(self):
+        '''
+        Realiza un resumen estadístico de las variables recorriendo la grilla
+        por tiles
+
+        Retorna:
+            pd.DataFrame: número de bloques, media, desviación estándar,
+                mínimo y máximo de cada variable
+        '''
+        stats = {}
+        for name in self.variables:
+            array = self.array(name)
+            count, total, squares = 0, 0.0, 0.0
+            low, high = np.inf, -np.inf
+            for i0, i1 in self.tiles(2):
+                values = np.asarray(array[i0:i1])
+                values = values[~np.isnan(values)]
+                if len(values):
+                    count += len(values)
+                    total += values.sum()
+                    squares += np.square(values).sum()
+                    low, high = min(low, values.min()), max(high, values.max())
+
+            mean = total / count if count else np.nan
+            var = np.nan
+            if count > 1:
+                var = max((squares - count * mean ** 2) / (count - 1), 0.0)
+            stats[name] = [count, mean, np.sqrt(var), low, high]
+
+        return pd.DataFrame(stats, index=['count', 'mean', 'std', 'min', 'max'])
@@ -1,5 +1,6 @@
 # Construcción de la interfaz gráfica:
 import ipywidgets as widgets
+import numpy as np
 from IPython.display import display
 
 # Elementos gráficos personalizados:
@@ -43,12 +44,42 @@ class BlockView(widgets.VBox):
             description='Encabezado',
             options=header
         )
+        self.button_header = widgets.Button(
+            description='Leer encabezado'
+        )
+        self.select_columns = widgets.SelectMultiple(
+            description='Columnas',
+            rows=8
+        )
+        self.text_query = widgets.Text(
+            description='Filtro de filas',
+            placeholder='z >= 100 and domain in [1, 2]',
+            style={'description_width': 'initial'}
+        )
+        self.check_single = widgets.Checkbox(
+            description='Leyes en precisión simple (float32)',
+            value=False,
+            indent=False
+        )
+        self.check_tiled = widgets.Checkbox(
+            description='Modelo fuera de memoria (grilla en disco)',
+            value=False,
+            indent=False
+        )
+        self.text_budget = custom.LabelText(
+            description='Memoria por tile',
+            units='MB'
+        )
+        self.text_budget.value = '256'
         self.button_update = custom.ToolButton(
             tool='update'
         )
         self.button_import = widgets.Button(
             description='Cargar archivo'
         )
+        self.progress = widgets.FloatProgress(
+            value=0.0, min=0.0, max=1.0
+        )
         self.import_status = widgets.HTML()
 
         
@@ -103,10 +134,35 @@ class BlockView(widgets.VBox):
         self.slider_zcoord = custom.LabelSlider(
             description='Coordenada Z'
         )
+        self.text_points = custom.LabelText(
+            description='Puntos máximos',
+            units='puntos'
+        )
+        self.text_points.value = '200000'
+        self.drop_aggregate = custom.LabelDrop(
+            description='Valor de cada celda',
+            options=[('Promedio', 'mean'), ('Máximo', 'max')]
+        )
+        self.drop_render = custom.LabelDrop(
+            description='Representación',
+            options=[
+                ('Puntos', 'points'),
+                ('Volumen', 'volume'),
+                ('Isosuperficies', 'isosurface')
+            ]
+        )
+        self.detail_status = custom.DetailStatus()
+        self.check_live = widgets.Checkbox(
+            description='Actualizar al mover los deslizadores',
+            value=False,
+            indent=False
+        )
+        self.live_status = widgets.HTML()
         self.button_plot = widgets.Button(
             description='Graficar'
         )
-        self.output_plot = widgets.Output()
+        self.output_plot = custom.FigureOutput()
+        self.setup_figure()
 
 
     def widgets_layout(self):
@@ -120,7 +176,14 @@ class BlockView(widgets.VBox):
             ]),
             self.drop_sep,
             self.radio_header,
+            self.button_header,
+            self.select_columns,
+            self.text_query,
+            self.check_single,
+            self.check_tiled,
+            self.text_budget,
             self.button_import,
+            self.progress,
             self.import_status
         ])
 
@@ -148,7 +211,13 @@ class BlockView(widgets.VBox):
             self.slider_xcoord,
             self.slider_ycoord,
             self.slider_zcoord,
+            self.text_points,
+            self.drop_aggregate,
+            self.drop_render,
+            self.check_live,
             self.button_plot,
+            self.detail_status,
+            self.live_status,
             self.output_plot
         ])
 
@@ -167,6 +236,27 @@ class BlockView(widgets.VBox):
         self.drop_name.value = names[0]
 
 
+    def update_columns(self, cols):
+        '''
+        Actualiza la lista de columnas del archivo (todas seleccionadas)
+
+        Argumentos:
+            cols (list): nombres de las columnas del encabezado
+        '''
+        self.select_columns.options = [(str(col), col) for col in cols]
+        self.select_columns.value = tuple(cols)
+
+
+    def show_progress(self, fraction):
+        '''
+        Actualiza la barra de progreso de la importación
+
+        Argumentos:
+            fraction (float): fracción del archivo leída
+        '''
+        self.progress.value = min(fraction, 1.0)
+
+
     def update_variables(self, cols):
         '''
         Actualizar las opciones del menú desplegable de variables
@@ -184,11 +274,32 @@ class BlockView(widgets.VBox):
             drop.value = None
 
 
-    def show_import_info(self):
-        '''Muestra un mensaje de información de carga'''
-        self.import_status.value = '''
+    def show_import_info(self, memory=None, cached=False, out_of_core=False):
+        '''
+        Muestra un mensaje de información de carga
+
+        Argumentos:
+            memory (tuple): memoria del modelo antes y después de compactar
+                los tipos de datos, en bytes
+            cached (bool): indica si el modelo se abrió desde la caché
+            out_of_core (bool): indica si el modelo queda fuera de memoria
+        '''
+        info = ''
+        if out_of_core:
+            info = (
+                '<br> Modelo fuera de memoria: la grilla en disco se construye'
+                ' al guardar las variables espaciales'
+            )
+        elif memory is not None:
+            before, after = (size / 2**20 for size in memory)
+            info = f'<br> Memoria: {before:,.1f} MB → {after:,.1f} MB'
+        if cached:
+            info += '<br> Modelo abierto desde la caché binaria'
+
+        self.import_status.value = f'''
             <span style="color:green; font-weight: bold;">
                 ¡El modelo de bloques se cargó correctamente!
+                {info}
             </span>
         '''
 
@@ -202,6 +313,15 @@ class BlockView(widgets.VBox):
         '''
 
 
+    def show_header_error(self):
+        '''Muestra un mensaje de error de lectura del encabezado'''
+        self.import_status.value = '''
+            <span style="color:red; font-weight: bold;">
+                No es posible leer el encabezado del archivo
+            </span>
+        '''
+
+
     def show_save_info(self):
         '''Muestra un mensaje de información sobre guardado'''
         self.save_status.value = '''
@@ -221,10 +341,21 @@ class BlockView(widgets.VBox):
         '''
 
 
+    def show_grid_error(self):
+        '''Muestra un mensaje de error de construcción de la grilla'''
+        self.save_status.value = '''
+            <span style="color:red; font-weight: bold;">
+                Las coordenadas seleccionadas no forman una grilla regular
+                de bloques.
+            </span>
+        '''
+
+
     def clear_outputs(self):
         '''Limpia el mensaje de información sobre importación'''
         self.import_status.value = ''
         self.save_status.value = ''
+        self.progress.value = 0.0
         self.output_stats.clear_output()
 
 
@@ -240,22 +371,39 @@ class BlockView(widgets.VBox):
             display(stats)
 
 
-    def plot_blocks(self, name, data, box):
+    def show_live(self, entering, leaving, total):
         '''
-        Crea una visualización 3D de los bloques
+        Muestra los cambios de la última actualización en vivo
 
         Argumentos:
-            name (str): nombre de la variable a graficar
-            data (pd.DataFrame): datos del modelo de bloques
-            box (pd.DataFrame): caja delimitadora del modelo de bloques
+            entering (int): bloques que entraron a la selección
+            leaving (int): bloques que salieron de la selección
+            total (int): bloques de la selección
+        '''
+        self.live_status.value = f'''
+            <span style="font-style: italic;">
+                +{entering:,} / -{leaving:,} bloques ({total:,} en la
+                selección)
+            </span>
+        '''
+
+
+    def show_live_error(self):
+        '''Muestra un mensaje de error de la actualización en vivo'''
+        self.live_status.value = '''
+            <span style="color:red; font-weight: bold;">
+                No es posible filtrar los bloques con la variable
+                seleccionada. Compruebe que sea numérica.
+            </span>
         '''
 
-        # Inicializar la figura:
-        fig = go.Figure()
+
+    def setup_figure(self):
+        '''Crea la traza y el diseño de la figura 3D de los bloques'''
+        fig = self.output_plot.figure
 
         # Configuración de la barra de colores:
         colorbar = dict(
-            title=name,
             orientation='v',
             title_side='top'
         )
@@ -263,25 +411,39 @@ class BlockView(widgets.VBox):
         # Configuración de los marcadores:
         marker = dict(
             size=3,
-            color=data[name],
             colorscale='jet',
             opacity=1.0,
             showscale=True,
             colorbar=colorbar
         )
 
-        # Graficar los bloques como puntos:
+        # Los bloques se grafican como puntos:
         fig.add_trace(
             go.Scatter3d(
                 name='Modelo',
-                x=data['x'],
-                y=data['y'],
-                z=data['z'],
                 mode='markers',
                 marker=marker
             )
         )
 
+        # Campo denso de la grilla (volumen o isosuperficies):
+        fig.add_traces([
+            go.Volume(
+                name='Volumen',
+                colorscale='jet',
+                opacity=0.15,
+                surface_count=15,
+                visible=False
+            ),
+            go.Isosurface(
+                name='Isosuperficies',
+                colorscale='jet',
+                surface_count=4,
+                caps=dict(x_show=False, y_show=False, z_show=False),
+                visible=False
+            )
+        ])
+
         # Configuración de los ejes del gráfico:
         scene = dict(
             xaxis_title='Coordenada X',
@@ -310,7 +472,77 @@ class BlockView(widgets.VBox):
             showlegend=False
         )
 
+
+    def plot_blocks(self, name, data, box):
+        '''
+        Actualiza la visualización 3D de los bloques (solo se reemplazan los
+        arreglos de la traza)
+
+        Argumentos:
+            name (str): nombre de la variable a graficar
+            data (pd.DataFrame): datos del modelo de bloques
+            box (pd.DataFrame): caja delimitadora del modelo de bloques
+        '''
+        fig = self.output_plot.figure
+
+        with fig.batch_update():
+            trace = fig.data[0]
+            trace.x = data['x']
+            trace.y = data['y']
+            trace.z = data['z']
+            trace.marker.color = data[name]
+            trace.marker.colorbar.title.text = name
+            trace.visible = True
+
+            # Vaciar los campos densos:
+            for field in fig.data[1:]:
+                field.update(x=None, y=None, z=None, value=None, visible=False)
+
+        # Mostrar el gráfico en el output:
+        self.output_plot.show()
+
+
+    def plot_volume(self, name, data, mode):
+        '''
+        Actualiza la visualización 3D con la variable como campo denso de la
+        grilla. Las celdas vacías se completan con un valor bajo el mínimo
+        del rango de colores para que no se dibujen.
+
+        Argumentos:
+            name (str): nombre de la variable a graficar
+            data (dict): coordenadas X, Y, Z y valor de cada celda
+            mode (str): 'volume' o 'isosurface'
+        '''
+        fig = self.output_plot.figure
+        value = data['value']
+
+        # Rango de colores de las celdas con bloques:
+        if np.isfinite(value).any():
+            vmin, vmax = np.nanmin(value), np.nanmax(value)
+        else:
+            vmin, vmax = 0.0, 1.0
+        empty = vmin - max(vmax - vmin, 1.0)
+        value = np.where(np.isfinite(value), value, empty).astype(np.float32)
+
+        with fig.batch_update():
+
+            # Vaciar los puntos y el campo no seleccionado:
+            fig.data[0].update(x=None, y=None, z=None, visible=False)
+            fig.data[0].marker.color = None
+
+            for field in fig.data[1:]:
+                if field.name != ('Volumen' if mode == 'volume'
+                                  else 'Isosuperficies'):
+                    field.update(
+                        x=None, y=None, z=None, value=None, visible=False
+                    )
+                    continue
+
+                field.update(
+                    x=data['x'], y=data['y'], z=data['z'], value=value,
+                    isomin=vmin, isomax=vmax, visible=True
+                )
+                field.colorbar.title.text = name
+
         # Mostrar el gráfico en el output:
-        with self.output_plot:
-            self.output_plot.clear_output()
-            display(fig)
+        self.output_plot.show()
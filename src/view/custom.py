@@ -1,4 +1,12 @@
+import importlib.util
+
 import ipywidgets as widgets
+from IPython.display import display
+
+import plotly.graph_objects as go
+
+# Figuras interactivas persistentes (go.FigureWidget requiere anywidget):
+FIGURE_WIDGET = importlib.util.find_spec('anywidget') is not None
 
 LABEL_WIDTH = '180px'
 MARGIN = '10px 0px 0px 0px'
@@ -115,6 +123,11 @@ class LabelSlider(widgets.HBox):
         self.children = [self._label, self._slider]
         
 
+    def observe_(self, handler, names=..., type="change"):
+        '''Enlaza una función a los cambios en el deslizador de rango'''
+        return self._slider.observe(handler, names, type)
+
+
     @property
     def value(self):
         '''Devuelve el valor seleccionado en el deslizador de rango'''
@@ -184,6 +197,28 @@ class LabelText(widgets.HBox):
         self._text.value = value
         
 
+class LabelValues(LabelText):
+    '''
+    Layout horizontal que contiene una etiqueta y un campo de texto para una
+    lista de valores separados por comas
+
+    Argumentos:
+        description (str): texto de la etiqueta
+        units (str): unidades de los valores
+    '''
+
+    @property
+    def value(self):
+        '''Devuelve la lista de valores del campo de texto'''
+        return [float(v) for v in self._text.value.split(',') if v.strip()]
+    
+
+    @value.setter
+    def value(self, value):
+        '''Establece el valor del campo de texto'''
+        self._text.value = value
+
+
 class Title(widgets.Label):
     '''Etiqueta personalizada para títulos'''
 
@@ -197,6 +232,35 @@ class Title(widgets.Label):
         self.layout = widgets.Layout(margin=MARGIN)
         
 
+class DetailStatus(widgets.HTML):
+    '''Mensaje con el nivel de detalle de una visualización 3D'''
+
+    def show(self, shown, total, factor):
+        '''
+        Muestra el nivel de detalle de la visualización
+
+        Argumentos:
+            shown (int): número de puntos graficados
+            total (int): número de bloques seleccionados
+            factor (int): bloques por lado de cada punto graficado
+        '''
+        if factor == 1:
+            self.value = f'''
+                <span style="font-style: italic;">
+                    {total:,} bloques graficados
+                </span>
+            '''
+            return
+
+        self.value = f'''
+            <span style="font-style: italic;">
+                {shown:,} puntos de {total:,} bloques (celdas de
+                {factor} x {factor} x {factor} bloques). Acote los rangos
+                para ver más detalle.
+            </span>
+        '''
+
+
 class ToolButton(widgets.Button):
     '''
     Layout horizontal que contiene una etiqueta y un botón
@@ -282,4 +346,49 @@ class CheckDropdown(widgets.HBox):
     @options.setter
     def options(self, options):
         '''Establece las opciones del menú desplegable'''
-        self._drop.options = options
\ No newline at end of file
+        self._drop.options = options
+
+class FigureOutput(widgets.Output):
+    '''
+    Salida que contiene una única figura de plotly durante toda la sesión.
+    Las vistas crean las trazas y el diseño una sola vez y luego solo
+    actualizan los arreglos de las trazas dentro de figure.batch_update(),
+    de modo que el navegador recibe únicamente los cambios. Si anywidget no
+    está instalado se usa un go.Figure, que se vuelve a mostrar después de
+    cada actualización.
+
+    La figura se escribe directamente en las salidas, sin el contexto de
+    captura de Output (que depende del mensaje en curso del kernel), por lo
+    que show() se puede llamar desde un hilo de cálculo.
+
+    Atributos:
+        figure (go.FigureWidget or go.Figure): figura persistente
+        shown (bool): indica si la figura ya se mostró en la salida
+    '''
+
+    def __init__(self, **kwargs):
+        super().__init__(**kwargs)
+        self.figure = go.FigureWidget() if FIGURE_WIDGET else go.Figure()
+        self.shown = False
+
+        # El FigureWidget se muestra una sola vez, al crear la vista:
+        if FIGURE_WIDGET:
+            self.show()
+
+
+    def show(self):
+        '''
+        Reemplaza la salida por la figura actual (el FigureWidget ya se
+        muestra desde que se crea la vista)
+        '''
+        if FIGURE_WIDGET and self.shown:
+            return
+
+        # Representación de la figura sin pasar por display(), que la
+        # enviaría a la celda en ejecución:
+        self.outputs = ({
+            'output_type': 'display_data',
+            'data': self.figure._repr_mimebundle_(),
+            'metadata': {}
+        },)
+        self.shown = True
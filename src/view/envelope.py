@@ -1,6 +1,6 @@
 # Construcción de la interfaz gráfica:
 import ipywidgets as widgets
-from IPython.display import display
+import numpy as np
 
 # Elementos gráficos personalizados:
 from view import custom
@@ -42,11 +42,57 @@ class EnvelopeView(widgets.VBox):
             description='Densidad de roca',
             units='t/m3'
         )
+        self.drop_tonnage = custom.LabelDrop(
+            description='Tonelaje de bloque',
+            options=[('Volumen × densidad', None)]
+        )
+        self.drop_method = custom.LabelDrop(
+            description='Método de cálculo',
+            options=[('Cono flotante', 'cone'),
+                     ('Clausura máxima', 'closure'),
+                     ('Comparar ambos', 'compare')]
+        )
+        self.text_points = custom.LabelText(
+            description='Puntos máximos',
+            units='puntos'
+        )
+        self.text_points.value = '200000'
+        self.drop_aggregate = custom.LabelDrop(
+            description='Valor de cada celda',
+            options=[('Promedio', 'mean'), ('Máximo', 'max')]
+        )
+        self.drop_render = custom.LabelDrop(
+            description='Representación',
+            options=[('Puntos', 'points'), ('Volumen', 'volume')]
+        )
+        self.detail_status = custom.DetailStatus()
         self.button_calculate = widgets.Button(
             description='Generar envolvente'
         )
+        self.button_cancel = widgets.Button(
+            description='Cancelar',
+            disabled=True
+        )
+        self.progress = widgets.FloatProgress(
+            value=0, min=0, max=1
+        )
+        self.progress_status = widgets.HTML()
         self.calculation_status = widgets.HTML()
-        self.output_envelope = widgets.Output()
+        self.output_envelope = custom.FigureOutput()
+
+        # 2. Evaluación de la envolvente en varias cotas:
+        self.title_levels = custom.Title(
+            value='Evaluación multinivel'
+        )
+        self.text_level_count = custom.LabelText(
+            description='Número de cotas',
+            units='cotas'
+        )
+        self.button_levels = widgets.Button(
+            description='Evaluar cotas'
+        )
+        self.output_levels = custom.FigureOutput()
+        self.setup_figures()
         
 
     def widgets_layout(self):
@@ -58,12 +104,45 @@ class EnvelopeView(widgets.VBox):
             self.text_min_height,
             self.text_max_height,
             self.text_slope,
-            self.button_calculate,
+            self.text_density,
+            self.drop_method,
+            widgets.HBox([self.button_calculate, self.button_cancel]),
+            widgets.HBox([self.progress, self.progress_status]),
+            self.calculation_status,
+            self.text_points,
+            self.drop_aggregate,
+            self.drop_render,
+            self.detail_status,
             self.output_envelope
         ])
 
+        # 2. Evaluación de la envolvente en varias cotas:
+        menu_levels = widgets.VBox([
+            self.title_levels,
+            self.text_level_count,
+            self.drop_tonnage,
+            self.button_levels,
+            self.output_levels
+        ])
+
         # Organizar los elementos en la vista:
-        self.children = [menu_envelope]
+        self.children = [menu_envelope, menu_levels]
+
+
+    def update_tonnage(self, cols):
+        '''
+        Actualiza las columnas de tonelaje del menú desplegable y selecciona
+        la que tenga nombre de tonelaje (si existe)
+
+        Argumentos:
+            cols (list): lista de columnas del modelo de bloques
+        '''
+        self.drop_tonnage.options = [('Volumen × densidad', None)] + [
+            (str(col), col) for col in cols
+        ]
+        self.drop_tonnage.value = next(
+            (col for col in cols if str(col).lower().startswith('ton')), None
+        )
 
 
     def show_info(self, value):
@@ -81,6 +160,75 @@ class EnvelopeView(widgets.VBox):
         '''
 
     
+    def set_running(self, running):
+        '''
+        Habilita el botón de cancelar mientras se calcula la envolvente
+
+        Argumentos:
+            running (bool): indica si hay un cálculo en curso
+        '''
+        self.button_calculate.disabled = running
+        self.button_cancel.disabled = not running
+        if running:
+            self.progress.value = 0
+            self.progress_status.value = ''
+            self.calculation_status.value = ''
+
+
+    def show_progress(self, fraction, height, value, blocks):
+        '''
+        Muestra el avance del cálculo de la envolvente
+
+        Argumentos:
+            fraction (float): fracción de cotas procesadas
+            height (float): última cota procesada
+            value (float): valor de los bloques extraídos hasta el momento
+            blocks (int): número de bloques extraídos hasta el momento
+        '''
+        self.progress.value = fraction
+        self.progress_status.value = f'''
+            <span>
+                Cota {height:.2f} m | {blocks:,} bloques |
+                valor parcial = {round(value,2):,}
+            </span>
+        '''
+
+
+    def show_cancelled(self, height, value):
+        '''
+        Muestra el valor de la envolvente parcial de un cálculo cancelado
+
+        Argumentos:
+            height (float): última cota procesada
+            value (float): valor neto de la envolvente parcial
+        '''
+        self.calculation_status.value = f'''
+            <span style="color:orange; font-weight: bold;">
+                Cálculo cancelado en la cota {height:.2f} m.
+                Valor neto de la envolvente parcial = {round(value,2):,}
+            </span>
+        '''
+
+
+    def show_comparison(self, cone_value, closure_value):
+        '''
+        Muestra el valor de la envolvente obtenida con cada método
+
+        Argumentos:
+            cone_value (float): valor neto de la envolvente del cono flotante
+            closure_value (float): valor neto de la envolvente de clausura
+                máxima
+        '''
+        gap = closure_value - cone_value
+        self.calculation_status.value = f'''
+            <span "font-weight: bold;">
+                Valor neto con cono flotante = {round(cone_value,2):,} <br>
+                Valor neto con clausura máxima = {round(closure_value,2):,} <br>
+                Diferencia = {round(gap,2):,}
+            </span>
+        '''
+
+
     def show_error(self):
         '''Muestra un mensaje de error de carga'''
         self.calculation_status.value = '''
@@ -90,10 +238,50 @@ class EnvelopeView(widgets.VBox):
         '''
 
 
-    def plot_envelope(self, x_cave, y_cave, z_cave, v_cave, data):
+    def show_calculation_error(self, error):
+        '''
+        Muestra el error que detuvo el cálculo de la envolvente
+
+        Argumentos:
+            error (Exception): error producido durante el cálculo
+        '''
+        self.calculation_status.value = f'''
+            <span style="color:red; font-weight: bold;">
+                No se pudo calcular la envolvente: {error}
+            </span>
+        '''
+
+
+    def plot_levels(self, table):
+        '''
+        Muestra la tabla de envolventes de cada cota, de mayor a menor valor
+
+        Argumentos:
+            table (pd.DataFrame): cota, valor, tonelaje y número de columnas
+                de la envolvente de cada cota
+        '''
+        fig = self.output_levels.figure
+
+        with fig.batch_update():
+            fig.data[0].cells.values = [
+                table['level'].map('{:,.2f}'.format),
+                table['value'].map('{:,.0f}'.format),
+                table['tonnage'].map('{:,.0f}'.format),
+                table['columns'].map('{:,}'.format)
+            ]
+            fig.layout.height = 150 + 30 * len(table)
+
+        self.output_levels.show()
 
-        # Inicializar el gráfico:
-        fig = go.Figure()
+
+    def setup_figures(self):
+        '''
+        Crea las trazas y el diseño de los gráficos del menú. Los cálculos
+        posteriores solo actualizan los datos de las trazas.
+        '''
+
+        # 1. Envolvente económica:
+        fig = self.output_envelope.figure
 
         # Configurar la barra de color:
         colorbar = dict(
@@ -105,68 +293,41 @@ class EnvelopeView(widgets.VBox):
         # Configuración de los marcadores:
         marker = dict(
             size        = 3         ,   # Tamaño del marcador
-            color       = v_cave    ,   # Datos de la escala de color
             colorscale  = 'viridis' ,   # Esquema de color
             opacity     = 0.8       ,   # Opacidad de los marcadores
             showscale   = True      ,   # Mostrar escala de color
             colorbar    = colorbar      # Configuración de la barra de color
         )
 
-        # Generar el grafico inicial para el cobre:
+        # Bloques de la envolvente:
         fig.add_trace(
             go.Scatter3d(
-                x       = x_cave    ,
-                y       = y_cave    ,
-                z       = z_cave    ,
                 mode    = 'markers' ,
                 marker  = marker
             )
         )
 
-        # fig.add_trace(
-        #     go.Scatter3d(
-        #         x       = block_model.x[block_model.z == level],
-        #         y       = block_model.y[block_model.z == level],
-        #         z       = block_model.z[block_model.z == level],
-        #         mode    = 'markers' ,
-        #         marker_size = 1,
-        #         marker_color = 'blue'
-        #         # marker  = marker
-        #     )
-        # )
-
-
-
-
-        dt = data.groupby(['x','y'])['z'].max()
-        xx = [point[0] for point in dt.index.values]
-        yy = [point[1] for point in dt.index.values]
-        zz = dt.values
-
-
         lighting_effects = dict(ambient=0.4, diffuse=0.5, roughness = 0.9, specular=0.6, fresnel=0.2)
 
+        # Superficie de altura de extracción (triángulos ya calculados):
         fig.add_trace(
-            # go.Scatter3d(
-            #     x       = np.unique(xx),
-            #     y       = np.unique(yy),
-            #     z       = zz,
-            #     mode    = 'markers' ,
-            #     marker_size = 1,
-            #     marker_color = 'blue'
-            #     # marker  = marker
-            # )
             go.Mesh3d(
-                x = xx,
-                y = yy,
-                z = zz,
                 opacity = 0.5,
                 color = 'turquoise',
-                # lighting = {'ambient':0.2}
                 lighting = lighting_effects
             )
         )
 
+        # Beneficio de la envolvente como campo denso de la grilla:
+        fig.add_trace(
+            go.Volume(
+                colorscale    = 'viridis',
+                opacity       = 0.2,
+                surface_count = 12,
+                colorbar      = dict(title='profit', x=1.1),
+                visible       = False
+            )
+        )
 
         # Configuración de los ejes del gráfico:
         scene = dict(
@@ -202,48 +363,7 @@ class EnvelopeView(widgets.VBox):
             height   = 700
         )
 
-
-        # Generar los gráficos para actualizar la figura (botón):
-        list_1 = [v_cave, z_cave]
-        list_2 = ['Beneficio', 'Elevación']
-
-        buttons = []
-        for varname, var in zip(list_2, list_1):
-
-            args = [{
-                'marker.color'          : [var],
-                'marker.colorscale'     : 'Viridis',
-                'marker.colorbar.title' : varname
-            }]
-
-            buttons.append({
-                'args'  : args,
-                'label' : varname,
-                'method': 'restyle'
-            })
-
-        # Posición del botón de variables:
-        dd_pad = dict(
-            r = 10,
-            t = 10
-        )
-
-        # Configurar el botón de variables:
-        dd_set = [dict(
-            buttons     = buttons   ,
-            direction   = 'down'    ,
-            pad         = dd_pad    ,
-            showactive  = True      ,
-            x           = 0.1       ,
-            y           = 1.1       ,
-            xanchor     = 'left'    ,
-            yanchor     = 'top'
-        )]
-
-        # Añadir el botón de variables:
-        fig.update_layout(updatemenus = dd_set)
-
-        # Añadir una etiqueta para el botón:
+        # Añadir una etiqueta para el botón de variables:
         fig.update_layout(
             annotations = [dict(
                 text        = 'Valores: '   ,
@@ -273,9 +393,7 @@ class EnvelopeView(widgets.VBox):
             len          = 0.7
         )
 
-        # fig.update_layout(sliders = sliders)
-
-        # Añadir un deslizador para el tamaño de marcador:
+        # Añadir un deslizador para la opacidad de los marcadores:
         steps = []
         for i in range(10):
             steps.append({
@@ -288,8 +406,6 @@ class EnvelopeView(widgets.VBox):
             active       = 8,
             steps        = steps,
             currentvalue = {'prefix': 'Opacidad del marcador: '},
-            # tickcolor    = 'black',
-            # font         = {'opacity':0},
             pad          = {"t": 80},
             lenmode      = 'fraction',
             len          = 0.7
@@ -297,7 +413,122 @@ class EnvelopeView(widgets.VBox):
 
         fig.update_layout(sliders = [sliders, sliders2])
 
-        with self.output_envelope:
-            self.output_envelope.clear_output()
-            display(fig)
+        # 2. Tabla de envolventes por cota:
+        header = dict(
+            values  = ['Cota (m)', 'Valor neto ($)', 'Tonelaje (t)', 'Columnas'],
+            align   = 'center'
+        )
+
+        self.output_levels.figure.add_trace(
+            go.Table(header=header, cells=dict(align='right'))
+        )
+        self.output_levels.figure.update_layout(
+            title    = '<b>Envolvente por cota de footprint</b>',
+            title_x  = 0.5,
+            template = 'plotly_dark'
+        )
+
+
+    def plot_envelope(self, x_cave, y_cave, z_cave, v_cave, h_cave, surface):
+        '''
+        Actualiza el gráfico de los bloques de la envolvente económica
+
+        Argumentos:
+            x_cave, y_cave, z_cave (np.ndarray): coordenadas de los bloques
+            v_cave (np.ndarray): beneficio de cada bloque
+            h_cave (np.ndarray): altura de extracción de la columna de cada
+                bloque
+            surface (dict): vértices y triángulos de la superficie de altura
+                de extracción
+        '''
+        fig = self.output_envelope.figure
+
+        # Generar los botones para cambiar la variable del color:
+        list_1 = [v_cave, z_cave, h_cave]
+        list_2 = ['Beneficio', 'Elevación', 'Altura de columna']
+
+        buttons = []
+        for varname, var in zip(list_2, list_1):
+
+            args = [{
+                'marker.color'          : [var],
+                'marker.colorscale'     : 'Viridis',
+                'marker.colorbar.title' : varname
+            }, [0]]
+
+            buttons.append({
+                'args'  : args,
+                'label' : varname,
+                'method': 'restyle'
+            })
+
+        # Posición del botón de variables:
+        dd_pad = dict(
+            r = 10,
+            t = 10
+        )
 
+        # Configurar el botón de variables:
+        dd_set = [dict(
+            buttons     = buttons   ,
+            direction   = 'down'    ,
+            pad         = dd_pad    ,
+            showactive  = True      ,
+            x           = 0.1       ,
+            y           = 1.1       ,
+            xanchor     = 'left'    ,
+            yanchor     = 'top'
+        )]
+
+        # Actualizar las trazas y el botón de variables:
+        with fig.batch_update():
+            fig.data[0].x = x_cave
+            fig.data[0].y = y_cave
+            fig.data[0].z = z_cave
+            fig.data[0].marker.color = v_cave
+            fig.data[0].marker.colorbar.title.text = 'profit'
+            fig.data[0].visible = True
+            fig.data[1].update(**surface)
+            fig.data[2].update(x=None, y=None, z=None, value=None,
+                               visible=False)
+            fig.layout.updatemenus = dd_set
+
+        self.output_envelope.show()
+
+
+    def plot_envelope_volume(self, field, surface):
+        '''
+        Actualiza el gráfico de la envolvente con el beneficio como campo
+        denso de la grilla. Las celdas fuera de la envolvente se completan con
+        un valor bajo el mínimo del rango de colores para que no se dibujen.
+
+        Argumentos:
+            field (dict): coordenadas X, Y, Z y beneficio de cada celda (None
+                si la envolvente está vacía)
+            surface (dict): vértices y triángulos de la superficie de altura
+                de extracción
+        '''
+        fig = self.output_envelope.figure
+
+        with fig.batch_update():
+
+            # Vaciar los puntos (y sus botones de variables):
+            fig.data[0].update(x=None, y=None, z=None, visible=False)
+            fig.data[0].marker.color = None
+            fig.layout.updatemenus = []
+            fig.data[1].update(**surface)
+
+            if field is None:
+                fig.data[2].update(x=None, y=None, z=None, value=None,
+                                   visible=False)
+            else:
+                value = field['value']
+                vmin, vmax = np.nanmin(value), np.nanmax(value)
+                empty = vmin - max(vmax - vmin, 1.0)
+                fig.data[2].update(
+                    x=field['x'], y=field['y'], z=field['z'],
+                    value=np.where(np.isfinite(value), value, empty),
+                    isomin=vmin, isomax=vmax, visible=True
+                )
+
+        self.output_envelope.show()
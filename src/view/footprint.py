@@ -1,6 +1,5 @@
 # Construcción de la interfaz gráfica:
 import ipywidgets as widgets
-from IPython.display import display
 
 # Elementos gráficos personalizados:
 from view import custom
@@ -32,7 +31,8 @@ class FootprintView(widgets.VBox):
         self.button_create = widgets.Button(
             description='Graficar footprint'
         )
-        self.output_footprint = widgets.Output()
+        self.output_footprint = custom.FigureOutput()
+        self.setup_figure()
         
         
         # 2. Suavizamiento del footprint:
@@ -76,11 +76,10 @@ class FootprintView(widgets.VBox):
         self.children = [menu_footprint]#, menu_smoothing]
 
 
-    def plot_footprint(self, x, y, v, level):
-        '''Grafica el footprint en la salida correspondiente'''
+    def setup_figure(self):
+        '''Crea las trazas y el diseño del gráfico del footprint'''
 
-        # Inicializar figura:
-        fig = go.Figure()
+        fig = self.output_footprint.figure
 
         # Barra de color para el beneficio:
         colorbar = dict(
@@ -89,20 +88,21 @@ class FootprintView(widgets.VBox):
             title_side='top'
         )
 
-        # Configuración de los marcadores:
-        marker = dict(
-            symbol='square',
-            size=6,
-            line_width=1,
-            line_color='gray',
-            color=v,
+        # Ráster del valor de las columnas como una sola imagen:
+        fig.add_trace(go.Heatmap(
             colorscale='jet',
-            showscale=True,
-            colorbar=colorbar
-        )
-
-        # Graficar el footprint como scatter:
-        fig.add_trace(go.Scatter(x=x, y=y, mode='markers', marker=marker))
+            colorbar=colorbar,
+            hoverongaps=False
+        ))
+
+        # Contorno del footprint:
+        fig.add_trace(go.Scatter(
+            mode='lines',
+            line=dict(color='black', width=2),
+            connectgaps=False,
+            hoverinfo='skip',
+            showlegend=False
+        ))
 
         # Igualar la escala del eje Y con el eje X:
         fig.update_yaxes(scaleanchor="x", scaleratio=1,)
@@ -117,7 +117,6 @@ class FootprintView(widgets.VBox):
         # Añadir una anotación que funciona como subtítulo:
         fig.update_layout(
             annotations=[dict(
-                text='Nivel = {}m'.format(level),
                 showarrow=False,
                 x=0.5,
                 y=1.1,
@@ -136,28 +135,28 @@ class FootprintView(widgets.VBox):
             scene=scene
         )
 
-        # Añadir un deslizador para el tamaño de marcador:
-        steps = []
-        for i in range(12):
-            steps.append({
-                'args': [{'marker.size': i+1}],
-                'method': 'restyle',
-                'label': '{}'.format(i+1)
-            })
-
-        sliders = [dict(
-            active=6,
-            steps=steps,
-            currentvalue={'prefix': 'Tamaño del marcador: '},
-            pad={"t": 50},
-            lenmode='fraction',
-            len=0.7
-        )]
-
-        fig.update_layout(sliders=sliders)
 
-        # Mostrar figura:
-        with self.output_footprint:
-            self.output_footprint.clear_output()
-            display(fig)
+    def plot_footprint(self, x, y, v, outline, level):
+        '''
+        Actualiza el gráfico del footprint en la salida correspondiente
+
+        Argumentos:
+            x, y (np.ndarray): coordenadas X e Y de las columnas del ráster
+            v (np.ndarray): valor de cada columna (NaN fuera del footprint),
+                dimensión (nx, ny)
+            outline (tuple): coordenadas X e Y del contorno del footprint
+            level (float): cota del footprint
+        '''
+        fig = self.output_footprint.figure
+
+        # Actualizar el ráster, el contorno y el subtítulo:
+        with fig.batch_update():
+            fig.data[0].x = x
+            fig.data[0].y = y
+            fig.data[0].z = v.T
+            fig.data[1].x = outline[0]
+            fig.data[1].y = outline[1]
+            fig.layout.annotations[0].text = 'Nivel = {}m'.format(level)
 
+        # Mostrar figura:
+        self.output_footprint.show()
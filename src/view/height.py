@@ -1,6 +1,5 @@
 # Construcción de la interfaz gráfica:
 import ipywidgets as widgets
-from IPython.display import display
 
 # Elementos gráficos personalizados:
 from view import custom
@@ -54,6 +53,23 @@ class HeightView(widgets.VBox):
             description='Área punto de extracción',
             units='m²'
         )
+
+        self.drop_mode = custom.LabelDrop(
+            description='Modo de cálculo',
+            options=[('Secuencial', 'serial'), ('Paralelo', 'parallel')]
+        )
+
+        self.drop_backend = custom.LabelDrop(
+            description='Motor de cálculo',
+            options=[('Automático', 'auto')]
+        )
+        self.backend_status = widgets.HTML()
+
+        self.drop_search = custom.LabelDrop(
+            description='Búsqueda del óptimo',
+            options=[('Exhaustiva', 'exhaustive'),
+                     ('Multirresolución', 'multiresolution')]
+        )
         
         # 3. Botón de cálculo y visualización de resultados:
         self.button_calculate = widgets.Button(
@@ -61,7 +77,34 @@ class HeightView(widgets.VBox):
         )
         
         self.output_results = widgets.HTML()
-        self.output_plot = widgets.Output()
+        self.output_plot = custom.FigureOutput()
+
+        # 4. Análisis de sensibilidad:
+        self.title_sensitivity = custom.Title(
+            value='Análisis de sensibilidad'
+        )
+
+        self.text_discounts = custom.LabelValues(
+            description='Tasas de descuento',
+            units='%'
+        )
+
+        self.text_velocities = custom.LabelValues(
+            description='Tasas extracción vertical',
+            units='m/año'
+        )
+
+        self.text_dp_costs = custom.LabelValues(
+            description='Costos de apertura DP',
+            units='$/m²'
+        )
+
+        self.button_sensitivity = widgets.Button(
+            description='Calcular sensibilidad'
+        )
+
+        self.output_sensitivity = custom.FigureOutput()
+        self.setup_figures()
         
         
     def widgets_layout(self):
@@ -79,7 +122,11 @@ class HeightView(widgets.VBox):
         menu_operational = widgets.VBox([
             self.title_operational,
             self.text_velocity,
-            self.text_dp_area
+            self.text_dp_area,
+            self.drop_mode,
+            self.drop_backend,
+            self.backend_status,
+            self.drop_search
         ])
 
         # 3. Botón de cálculo y visualización de resultados:
@@ -89,8 +136,21 @@ class HeightView(widgets.VBox):
             self.output_plot
         ])
 
-        # 4. Colocar en el layout principal:
-        self.children = [menu_economics, menu_operational, menu_calculation]
+        # 4. Análisis de sensibilidad:
+        menu_sensitivity = widgets.VBox([
+            self.title_sensitivity,
+            self.text_discounts,
+            self.text_velocities,
+            self.text_dp_costs,
+            self.button_sensitivity,
+            self.output_sensitivity
+        ])
+
+        # 5. Colocar en el layout principal:
+        self.children = [
+            menu_economics, menu_operational, menu_calculation,
+            menu_sensitivity
+        ]
 
 
     def update_profit(self, cols):
@@ -104,18 +164,52 @@ class HeightView(widgets.VBox):
         self.drop_profit.value = None
 
 
-    def show_info(self, height, value):
+    def update_backends(self, backends):
+        '''
+        Actualiza los motores de cálculo disponibles en el menú desplegable
+
+        Argumentos:
+            backends (list): motores de cálculo disponibles
+        '''
+        labels = {'numpy': 'NumPy', 'numba': 'Numba'}
+        self.drop_backend.options = [('Automático', 'auto')] + [
+            (labels.get(name, name), name) for name in backends
+        ]
+
+
+    def show_backend(self, backend):
+        '''
+        Muestra el motor de cálculo activo
+
+        Argumentos:
+            backend (str): nombre del motor de cálculo activo
+        '''
+        self.backend_status.value = f'''
+            <span style="font-style: italic;">
+                Motor de cálculo activo: {backend}
+            </span>
+        '''
+
+
+    def show_info(self, height, value, bound=None):
         '''
         Muestra un mensaje de información en la salida de resultados
         
         Argumentos:
             height (float): cota óptima de extracción
             value (float): valor económico del piso
+            bound (float): máxima diferencia posible respecto al óptimo
+                exhaustivo (solo en la búsqueda multirresolución)
         '''
+        info = ''
+        if bound is not None:
+            info = f'<br> Diferencia máxima con el óptimo = ${round(bound, 2):,}'
+
         self.output_results.value = f'''
             <span "font-weight: bold;">
                 Nivel que maximiza el valor económico = {height:.2f} m <br>
                 Máximo valor económico = ${round(value, 2):,}
+                {info}
             </span>
         '''
 
@@ -129,29 +223,17 @@ class HeightView(widgets.VBox):
         '''
             
     
-    def plot_height_vs_value(self, heights, values, opt_height, opt_value):
-        '''
-        Genera un gráfico del valor económico del piso vs cota de extracción
-        
-        Argumentos:
-            heights (list): lista de cotas de extracción
-            values (list): lista de valores económicos del piso
-        '''
-        
-        # Limpiar la salida del gráfico:
-        self.output_plot.clear_output()
+    def setup_figures(self):
+        '''Crea las trazas y el diseño de las figuras del menú'''
 
-        # Crear el gráfico:
-        fig = go.Figure(data=[
+        # 1. Valor económico del piso vs cota de extracción:
+        fig = self.output_plot.figure
+        fig.add_traces([
             go.Scatter(
-                x=heights,
-                y=values,
                 mode='lines',
                 name='Valor'
             ),
             go.Scatter(
-                x=[opt_height, opt_height, min(heights)],
-                y=[0, opt_value, opt_value],
                 mode='lines',
                 name='Óptimo',
                 line=dict(dash='dash', color='green')
@@ -167,7 +249,81 @@ class HeightView(widgets.VBox):
             autosize=True
         )
 
+        # 2. Cota óptima por caso de sensibilidad:
+        self.output_sensitivity.figure.update_layout(
+            title='Cota óptima por caso de sensibilidad',
+            title_x=0.5,
+            scene=dict(
+                xaxis_title='Tasa de descuento (%)',
+                yaxis_title='Tasa de extracción (m/año)',
+                zaxis_title='Cota óptima (m)'
+            ),
+            autosize=True
+        )
+
+
+    def plot_height_vs_value(self, heights, values, opt_height, opt_value):
+        '''
+        Actualiza el gráfico del valor económico del piso vs cota de
+        extracción
+        
+        Argumentos:
+            heights (list): lista de cotas de extracción
+            values (list): lista de valores económicos del piso
+        '''
+        fig = self.output_plot.figure
+
+        with fig.batch_update():
+            fig.data[0].x = heights
+            fig.data[0].y = values
+            fig.data[1].x = [opt_height, opt_height, min(heights)]
+            fig.data[1].y = [0, opt_value, opt_value]
+
         # Mostrar el gráfico en la salida correspondiente:
-        with self.output_plot:
-            display(fig)
+        self.output_plot.show()
+
+
+    def plot_optimum_surface(self, surface):
+        '''
+        Actualiza el gráfico de la cota óptima en función de la tasa de
+        descuento y la tasa de extracción, con una superficie por costo de
+        inversión. Las superficies existentes se reutilizan y solo se agregan
+        o quitan trazas si cambia el número de costos de inversión.
 
+        Argumentos:
+            surface (pd.DataFrame): cota óptima y valor de cada caso
+        '''
+        fig = self.output_sensitivity.figure
+        inv_costs = surface.index.unique(level='inv_cost')
+
+        # Ajustar el número de superficies:
+        if len(fig.data) != len(inv_costs):
+            fig.data = fig.data[:len(inv_costs)]
+            fig.add_traces([
+                go.Surface(colorscale='jet', colorbar=dict(title='Cota (m)'))
+                for _ in range(len(inv_costs) - len(fig.data))
+            ])
+
+        # Botones para cambiar el costo de inversión visible:
+        buttons = []
+        for n, inv_cost in enumerate(inv_costs):
+            buttons.append({
+                'args': [{'visible': [m == n for m in range(len(inv_costs))]}],
+                'label': f'Inversión PE = ${inv_cost:,.0f}',
+                'method': 'restyle'
+            })
+
+        # Actualizar cada superficie y los botones:
+        with fig.batch_update():
+            for trace, inv_cost in zip(fig.data, inv_costs):
+                case = surface.xs(inv_cost, level='inv_cost')['height'].unstack()
+                trace.x = case.index.values * 100
+                trace.y = case.columns.values
+                trace.z = case.values.T
+                trace.name = f'Inversión PE = ${inv_cost:,.0f}'
+                trace.visible = bool(inv_cost == inv_costs[0])
+
+            fig.layout.updatemenus = [dict(buttons=buttons, x=0.1, y=1.1)]
+
+        # Mostrar el gráfico en la salida correspondiente:
+        self.output_sensitivity.show()
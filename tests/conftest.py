@@ -0,0 +1,88 @@
+import os
+import sys
+
+import numpy as np
+import pandas as pd
+import pytest
+
+# Módulos de la aplicación:
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'src'))
+
+from model.main import MainModel
+
+
+def block_model(shape=(10, 8, 9), size=(10.0, 10.0, 15.0), seed=0,
+                missing=0.1):
+    '''
+    Crea un modelo de bloques sintético con un cuerpo mineralizado en el
+    centro y algunas posiciones sin bloque
+
+    Argumentos:
+        shape (tuple): número de bloques en X, Y y Z
+        size (tuple): dimensiones de los bloques en X, Y y Z
+        seed (int): semilla de los valores aleatorios
+        missing (float): fracción de posiciones sin bloque
+
+    Retorna:
+        pd.DataFrame: columnas x, y, z, tonn, cu y profit
+    '''
+    rng = np.random.default_rng(seed)
+    i, j, k = (a.ravel() for a in np.meshgrid(
+        *[np.arange(n) for n in shape], indexing='ij'
+    ))
+    keep = rng.random(len(i)) >= missing
+    i, j, k = i[keep], j[keep], k[keep]
+
+    # Ley decreciente con la distancia al centro del modelo:
+    center = (np.array(shape) - 1) / 2
+    distance = np.sqrt(((i - center[0]) / shape[0]) ** 2 +
+                       ((j - center[1]) / shape[1]) ** 2 +
+                       ((k - center[2]) / shape[2]) ** 2)
+    cu = np.round(np.clip(1.2 - 3 * distance + rng.normal(0, 0.1, len(i)),
+                          0, None), 3)
+    tonn = np.round(np.prod(size) * rng.uniform(2.4, 2.8, len(i)), 3)
+
+    return pd.DataFrame({
+        'x': 5 + i * size[0],
+        'y': 5 + j * size[1],
+        'z': size[2] / 2 + k * size[2],
+        'tonn': tonn,
+        'cu': cu,
+        'profit': np.round(tonn * (40 * cu - 12), 2)
+    })
+
+
+def load_model(path, out_of_core=False, budget=None):
+    '''
+    Importa un archivo de bloques y construye la grilla como lo hace el
+    menú de importación
+
+    Argumentos:
+        path (str): ruta del archivo de bloques
+        out_of_core (bool): dejar el modelo fuera de memoria
+        budget (float): memoria máxima de cada tile en MB
+
+    Retorna:
+        MainModel: modelo de la aplicación con la grilla construida
+    '''
+    model = MainModel()
+    model.block.read_file(str(path), ' ', 0, out_of_core=out_of_core)
+    model.names.update({'x': 'x', 'y': 'y', 'z': 'z'})
+    if budget is not None:
+        model.block.set_budget(budget)
+    model.block.build_grid()
+    return model
+
+
+@pytest.fixture
+def block_file(tmp_path):
+    '''Archivo de bloques separado por espacios con el modelo sintético'''
+    path = tmp_path / 'test.blocks'
+    block_model().to_csv(path, sep=' ', index_label='id')
+    return path
+
+
+@pytest.fixture
+def model(block_file):
+    '''Modelo de la aplicación con el modelo sintético en memoria'''
+    return load_model(block_file)
@@ -0,0 +1,234 @@
+import numpy as np
+import pytest
+
+from model import kernels
+
+# Cota del footprint de las pruebas:
+LEVEL = 37.5
+
+
+def original_cone(data, footprint, slope):
+    '''
+    Envolvente del cono flotante con el bucle original del controlador de
+    envolvente (sin el filtro de altura mínima), usada como referencia
+
+    Argumentos:
+        data (pd.DataFrame): bloques del tramo ordenados por cota
+        footprint (set): coordenadas (x, y) de las columnas del footprint
+        slope (float): ángulo de socavación en grados
+
+    Retorna:
+        set: coordenadas (x, y, z) de los bloques extraídos
+    '''
+    xcoord = data['x'].values.astype(float)
+    ycoord = data['y'].values.astype(float)
+    zcoord = data['z'].values.astype(float)
+    profit = data['profit'].values
+    mined = set()
+
+    # Recorrer cada cota del modelo de bloques:
+    for z in np.unique(zcoord):
+        cond1 = (zcoord == z) & (profit > 0)
+
+        for x, y in zip(xcoord[cond1], ycoord[cond1]):
+
+            # Comprobar que el punto sea parte del footprint:
+            if (x, y) not in footprint:
+                continue
+
+            # Bloques del cono según el ángulo:
+            dx2 = np.power(xcoord - x, 2)
+            dy2 = np.power(ycoord - y, 2)
+            ang = np.degrees(np.arctan2(np.abs(zcoord - z), np.sqrt(dx2 + dy2)))
+            cond2 = (ang >= slope) & (zcoord <= z)
+
+            if np.sum(profit[cond2]) <= 0:
+                continue
+
+            # Guardar los bloques y quitarlos del modelo:
+            mined.update(zip(xcoord[cond2], ycoord[cond2], zcoord[cond2]))
+            keep = ~cond2
+            xcoord, ycoord = xcoord[keep], ycoord[keep]
+            zcoord, profit = zcoord[keep], profit[keep]
+
+    return mined
+
+
+def footprint_columns(model):
+    '''Coordenadas (x, y) de las columnas del footprint compartido'''
+    i, j = model.fp_raster.columns()
+    x, y = model.grid.coords[0][i], model.grid.coords[1][j]
+    return set(zip(x.astype(float), y.astype(float)))
+
+
+@pytest.fixture
+def envelope(model):
+    '''Modelo con el footprint calculado en la cota LEVEL'''
+    model.footprint.get_footprint(LEVEL, 0.1, 150, 2000)
+    yield model
+    kernels.set_backend('auto')
+
+
+@pytest.mark.parametrize('backend', kernels.BACKENDS)
+@pytest.mark.parametrize('slope', [45, 60, 75])
+def test_floating_cone_matches_original_loop(envelope, backend, slope):
+    '''El cono flotante con plantilla extrae los mismos bloques'''
+    kernels.set_backend(backend)
+    env = envelope.envelope
+    assert not envelope.fp_raster.empty
+
+    x, y, z, v = env.floating_cone(LEVEL, 'profit', 90, slope)
+    expected = original_cone(
+        env.filter_data(LEVEL, 90), footprint_columns(envelope), slope
+    )
+
+    assert len(x) > 0
+    assert set(zip(x.astype(float), y.astype(float), z.astype(float))) == \
+        expected
+    assert len(x) == len(expected)
+
+
+
+def closure_problem(seed, shape=(3, 2, 3)):
+    '''
+    Modelo pequeño con footprint aleatorio para comparar la clausura máxima
+    con la enumeración de todos los conjuntos de bloques
+    '''
+    from conftest import block_model
+    from model.envelope import EnvelopeModel
+    from model.grid import GridModel
+
+    rng = np.random.default_rng(seed)
+    data = block_model(shape, (10.0, 10.0, 10.0), seed, missing=0.15)
+    data['profit'] = np.round(rng.normal(30, 100, len(data)), 2)
+    names = {'x': 'x', 'y': 'y', 'z': 'z'}
+
+    grid = GridModel(data, names)
+    grid.build()
+    column = np.arange(shape[0] * shape[1])
+    grid.fp_raster.update(grid, column, rng.normal(0.5, 1, len(column)), 0, 5)
+
+    return EnvelopeModel(data, names, grid, grid.fp_raster)
+
+
+@pytest.mark.parametrize('backend', kernels.BACKENDS)
+@pytest.mark.parametrize('seed', range(6))
+def test_max_closure_is_optimal(seed, backend):
+    '''La clausura máxima alcanza el mejor conjunto cerrado de bloques'''
+    kernels.set_backend(backend)
+    env = closure_problem(seed)
+    data, grid = env.data, env.grid
+    i, j, k = grid.index.T.astype(np.int64)
+
+    # Bloques que exige cada bloque (su cono inferior, sin el vértice):
+    si, sj, sk = env.cone_stencil(45, 20)
+    offsets = {o for o in zip(si, sj, sk) if o != (0, 0, 0)}
+    bits = 1 << np.arange(len(data), dtype=np.int64)
+    required = np.array([
+        bits[[(i[q] - i[b], j[q] - j[b], k[q] - k[b]) in offsets
+              for q in range(len(data))]].sum()
+        for b in range(len(data))
+    ], dtype=np.int64)
+
+    # Los bloques fuera del footprint no se extraen por sí solos:
+    weight = data['profit'].values.copy()
+    outside = ~env.fp_raster.contains(i, j)
+    weight[outside] = np.minimum(weight[outside], 0)
+
+    # Enumerar todos los conjuntos cerrados:
+    subsets = np.arange(2 ** len(data), dtype=np.int64)
+    closed = np.ones(len(subsets), dtype=bool)
+    for b in range(len(data)):
+        has = (subsets & bits[b]) != 0
+        closed &= ~has | ((subsets & required[b]) == required[b])
+    chosen = (subsets[closed, None] & bits[None, :]) != 0
+    best = (chosen * weight).sum(axis=1).max()
+
+    # Valor de la clausura entregada por el modelo:
+    x, y, z, _ = env.max_closure(5, 'profit', 20, 45)
+    mined = {(a, b, c) for a, b, c in zip(x, y, z)}
+    mask = np.array([(a, b, c) in mined for a, b, c in
+                     zip(data['x'], data['y'], data['z'])])
+    assert closed[(bits * mask).sum()]
+    assert weight[mask].sum() == pytest.approx(best, abs=1e-6)
+    kernels.set_backend('auto')
+
+
+@pytest.mark.parametrize('backend', kernels.BACKENDS)
+def test_floating_cone_steps_end_in_final_result(envelope, backend):
+    '''El resultado parcial de la última cota es la envolvente final'''
+    kernels.set_backend(backend)
+    env = envelope.envelope
+
+    steps = list(env.floating_cone_steps(LEVEL, 'profit', 90, 45))
+    assert [step[1] for step in steps] == list(range(1, len(steps) + 1))
+
+    final = env.floating_cone(LEVEL, 'profit', 90, 45)
+    for partial, result in zip(steps[-1][3], final):
+        np.testing.assert_array_equal(partial, result)
+
+
+def test_empty_slab_gives_empty_envelope(envelope):
+    '''Una cota sobre el techo del modelo entrega una envolvente vacía'''
+    env = envelope.envelope
+
+    steps = list(env.floating_cone_steps(500, 'profit', 90, 45))
+    assert len(steps) == 1
+    assert steps[0][1:3] == (1, 1)
+    assert all(len(values) == 0 for values in steps[0][3])
+
+    for result in [env.floating_cone(500, 'profit', 90, 45),
+                   env.max_closure(500, 'profit', 90, 45)]:
+        assert all(len(values) == 0 for values in result)
+
+    level = env.envelope_level(500, 'profit', 0.1, 150, 2000, 30, 90, 45)
+    assert level[1:] == (0, 0, 0, 0)
+
+
+def test_level_table_sums_block_tonnage(envelope):
+    '''El tonelaje de cada cota es la suma de la columna de tonelaje'''
+    env = envelope.envelope
+    levels = [LEVEL, 52.5]
+
+    # Tonelaje de los bloques de la envolvente de cada cota:
+    expected = {}
+    for level in levels:
+        envelope.footprint.get_footprint(level, 0.1, 150, 2000)
+        x, y, z, _, _ = env.filter_min_height(
+            level, 30, *env.floating_cone(level, 'profit', 90, 60)
+        )
+        blocks = set(zip(x, y, z))
+        inside = [block in blocks for block in
+                  zip(env.data['x'], env.data['y'], env.data['z'])]
+        expected[level] = (env.data['tonn'][inside].sum(), len(blocks))
+
+    table = env.evaluate_levels(levels, 'profit', 0.1, 150, 2000, 30, 90, 60,
+                                2.7, 'tonn')
+    estimate = env.evaluate_levels(levels, 'profit', 0.1, 150, 2000, 30, 90,
+                                   60, 2.7)
+    env.batch.close()
+
+    for row, rough in zip(table.itertuples(), estimate.itertuples()):
+        tonnage, blocks = expected[row.level]
+        assert row.tonnage == pytest.approx(tonnage, rel=1e-9)
+        assert rough.tonnage == pytest.approx(blocks * 1500 * 2.7)
+
+
+def test_footprint_is_cleared_with_the_grid(envelope, block_file):
+    '''Importar otro modelo descarta el footprint compartido'''
+    assert not envelope.envelope.fp_raster.empty
+
+    envelope.block.read_file(str(block_file), ' ', 0)
+    assert envelope.fp_raster.empty
+    assert envelope.envelope.fp_raster is envelope.fp_raster
+
+
+def test_footprint_of_another_grid_is_rejected(envelope):
+    '''Un footprint calculado sobre otra grilla no se usa en la envolvente'''
+    raster = envelope.fp_raster
+    raster.mask, raster.value = raster.mask[:-1], raster.value[:-1]
+
+    with pytest.raises(ValueError):
+        envelope.envelope.floating_cone(LEVEL, 'profit', 90, 60)
+    with pytest.raises(ValueError):
+        envelope.envelope.max_closure(LEVEL, 'profit', 90, 60)
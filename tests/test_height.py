@@ -0,0 +1,75 @@
+import numpy as np
+import pytest
+
+
+def floor_value(data, height, discount, rate, inv_cost):
+    '''
+    Valor económico del piso calculado cota por cota (versión original de
+    HeightModel.floor_value, usada como referencia)
+    '''
+
+    # Filtrar modelo de bloques y ordenar valor Z:
+    model = data[data['z'] >= height].copy()
+    model = model.sort_values(by='z', ascending=True)
+
+    # Actualizar el valor de cada bloque (la versión original leía las
+    # cotas en float64):
+    dz = model['z'].astype(float) - height
+    model['discounted'] = model['profit'] / (1 + discount) ** (dz / rate)
+
+    # Máximo valor acumulado de cada columna:
+    model['cumulative'] = model.groupby(['x', 'y'])['discounted'].cumsum()
+    max_values = model.groupby(['x', 'y'])['cumulative'].max()
+
+    # Sumar aquellas columnas que pagan la inversión del PE:
+    return max_values[max_values > inv_cost].sum()
+
+
+@pytest.mark.parametrize('mode', ['serial', 'parallel'])
+def test_value_by_height_matches_floor_value(model, mode):
+    '''El barrido de todas las cotas entrega el valor de cada piso'''
+    heights = np.sort(model.height.levels())
+
+    for discount, rate, inv_cost in [(0.1, 150, 2000), (0.08, 100, 0)]:
+        values = model.height.value_by_height(
+            heights, discount, rate, inv_cost, mode=mode
+        )
+        expected = [
+            floor_value(model.data, h, discount, rate, inv_cost)
+            for h in heights
+        ]
+        np.testing.assert_allclose(values, expected, rtol=1e-9)
+
+    if model.height.parallel is not None:
+        model.height.parallel.close()
+
+
+def test_floor_value_uses_cached_columns(model):
+    '''Cambiar el costo de inversión reutiliza los máximos por columna'''
+    heights = np.sort(model.height.levels())
+    model.height.value_by_height(heights, 0.1, 150, 2000)
+    assert model.grid.is_cached('profit', heights, 0.1, 150)
+
+    value = model.height.floor_value(heights[2], 0.1, 150, 5000)
+    assert value == pytest.approx(
+        floor_value(model.data, heights[2], 0.1, 150, 5000), rel=1e-9
+    )
+
+
+@pytest.mark.parametrize('stride', [None, 2, 4])
+@pytest.mark.parametrize('inv_cost', [0, 2000, 20000])
+def test_search_optimum_matches_exhaustive(model, stride, inv_cost):
+    '''La búsqueda por intervalos entrega el óptimo del barrido completo'''
+    heights = np.sort(model.height.levels())
+    values = model.height.value_by_height(heights, 0.1, 150, inv_cost)
+    expected = model.height.find_optimum(heights, values)
+
+    opt_height, opt_value, levels, found, bound = \
+        model.height.search_optimum(heights, 0.1, 150, inv_cost,
+                                    stride=stride, tol=0)
+
+    assert (opt_height, opt_value) == pytest.approx(expected, rel=1e-9)
+    assert bound == 0
+    np.testing.assert_allclose(
+        found, np.asarray(values)[np.searchsorted(heights, levels)], rtol=1e-9
+    )
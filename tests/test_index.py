@@ -0,0 +1,57 @@
+import numpy as np
+
+
+def plot_data(data, vname, vrange, xrange, yrange, zrange):
+    '''
+    Bloques de la visualización filtrando todo el modelo (versión original
+    de BlockModel.get_plot_data, usada como referencia)
+    '''
+    filtered_data = data.loc[
+        data[vname].between(vrange[0], vrange[1]) &
+        data['x'].between(xrange[0], xrange[1]) &
+        data['y'].between(yrange[0], yrange[1]) &
+        data['z'].between(zrange[0], zrange[1])
+    ]
+    return sorted(zip(filtered_data['x'], filtered_data['y'],
+                      filtered_data['z'], filtered_data[vname]))
+
+
+def random_ranges(rng, bounds):
+    '''Rangos aleatorios que a veces exceden los límites del modelo'''
+    ranges = list(bounds)
+    for axis in rng.choice(4, rng.integers(1, 4), replace=False):
+        lo, hi = bounds[axis]
+        margin = (hi - lo) * 0.1
+        ranges[axis] = tuple(np.sort(rng.uniform(lo - margin, hi + margin, 2)))
+    return ranges
+
+
+def test_query_matches_full_filter(model):
+    '''Las consultas por el índice de rangos equivalen al filtro completo'''
+    rng = np.random.default_rng(1)
+    bounds = [(model.data[col].min(), model.data[col].max())
+              for col in ['cu', 'x', 'y', 'z']]
+
+    for _ in range(50):
+        ranges = random_ranges(rng, bounds)
+        result = model.block.get_plot_data('cu', *ranges)
+        assert sorted(zip(result['x'], result['y'], result['z'],
+                          result['cu'])) == plot_data(model.data, 'cu', *ranges)
+
+
+def test_live_selection_matches_full_filter(model):
+    '''La selección incremental equivale a repetir el filtro completo'''
+    rng = np.random.default_rng(2)
+    bounds = [(model.data[col].min(), model.data[col].max())
+              for col in ['cu', 'x', 'y', 'z']]
+    total = 0
+
+    for step in range(200):
+        ranges = bounds if step % 10 == 0 else random_ranges(rng, bounds)
+        result, entering, leaving = model.block.live_plot_data('cu', *ranges)
+        selected = sorted(zip(result['x'], result['y'], result['z'],
+                              result['cu']))
+
+        assert selected == plot_data(model.data, 'cu', *ranges)
+        assert total + entering - leaving == len(selected)
+        total = len(selected)
@@ -0,0 +1,66 @@
+import numpy as np
+import pytest
+
+from conftest import load_model
+
+
+@pytest.fixture
+def models(block_file):
+    '''Modelo sintético en memoria y fuera de memoria, con tiles pequeños'''
+    memory = load_model(block_file)
+    tiled = load_model(block_file, out_of_core=True, budget=0.002)
+    yield memory, tiled
+
+    for model in [memory, tiled]:
+        if model.envelope.batch is not None:
+            model.envelope.batch.close()
+
+
+def results(model):
+    '''Resultados de cada menú que no dependen de dónde está el modelo'''
+    levels = np.sort(np.asarray(model.height.levels(), dtype=float))
+    x, y, v, _ = model.footprint.get_footprint(37.5, 0.1, 150, 2000)
+    table = model.envelope.evaluate_levels(
+        [37.5, 52.5, 500], 'profit', 0.1, 150, 2000, 30, 90, 60, 2.7, 'tonn'
+    )
+    plot = model.block.get_plot_data('cu', (0.2, 0.8), (0, 60), (10, 70),
+                                     (20, 100))
+
+    return {
+        'stats': model.block.describe().loc[['count', 'mean', 'min', 'max'],
+                                            ['cu', 'profit']].values,
+        'levels': levels,
+        'values': model.height.value_by_height(levels, 0.1, 150, 2000),
+        'optimum': model.height.search_optimum(levels, 0.1, 150, 2000)[:2],
+        'sensitivity': model.height.sensitivity(
+            levels, [0.08, 0.1], [150], [2000, 5000]
+        ).values,
+        'footprint': (x, y, v),
+        'cone': model.envelope.floating_cone(37.5, 'profit', 90, 60)[3].sum(),
+        'closure': model.envelope.max_closure(37.5, 'profit', 90, 60)[3].sum(),
+        'table': table.values,
+        'plot': [np.sort(plot[name]) for name in ['x', 'y', 'z', 'cu']],
+        'volume': list(model.block.get_volume_data(
+            'cu', (0.2, 0.8), (0, 90), (10, 70), (20, 130), 60
+        ).values()),
+        'range': model.block.value_range('cu')
+    }
+
+
+def test_tiled_grid_matches_memory(models):
+    '''El modelo fuera de memoria entrega los mismos resultados'''
+    memory, tiled = models
+    assert tiled.grid.store is not None
+    assert len(list(tiled.grid.store.tiles(1))) > 1
+
+    expected, result = results(memory), results(tiled)
+    for key in expected:
+        parts = expected[key]
+        if not isinstance(parts, (tuple, list)):
+            parts, result[key] = [parts], [result[key]]
+
+        for a, b in zip(parts, result[key]):
+            np.testing.assert_allclose(
+                np.asarray(a, dtype=float), np.asarray(b, dtype=float),
+                rtol=1e-9, equal_nan=True, err_msg=key
+            )